@@ -6,13 +6,16 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from agno.agent import Agent
 from agno.tools.reasoning import ReasoningTools
 from agno.tools.mcp import MCPTools
-from agno.storage.sqlite import SqliteStorage
 from utils.helper import parse_salesforce_data
+from utils.salesforce_tools import describe_salesforce_object
 from agno.models.anthropic import Claude
 from typing import Dict, Optional, AsyncIterator, Any
 from datetime import datetime
 from dataclasses import asdict
 from config.agents import AGENT_INSTRUCTIONS, COMMON_AGENT_SETTINGS
+from core.agent_history import WindowedMemory
+from core.agent_storage import agent_storage
+from core.event_writer import tee_session_events
 import anthropic
 from agno.reasoning.step import NextAction
 
@@ -21,6 +24,7 @@ TOOL_NAME_TO_UI_NAME = {
     "analyze": "Analyzed the data",
     "salesforce_search_objects": "Searched Salesforce objects",
     "salesforce_describe_object": "Described Salesforce object schema",
+    "describe_salesforce_object": "Described Salesforce object schema",
     "salesforce_query_records": "Queried Salesforce records",
     "salesforce_aggregate_query": "Executed aggregate query",
     "salesforce_dml_records": "Performed data operations",
@@ -49,6 +53,9 @@ async def get_account_intel(account: Optional[str], query: str, session_id: str)
     4. ``artifact``                                  – the full response once the run finishes.
     5. ``run_completed``                             – marks the very end of the run.
     
+    Every event is also persisted to the session as it streams, so the run
+    history survives a closed tab and the client does not need to save it.
+    
     Args:
         account: The account name to gather intelligence on (optional)
         query: The specific query or request about the account
@@ -57,6 +64,17 @@ async def get_account_intel(account: Optional[str], query: str, session_id: str)
     Yields:
         Dict[str, Any]: Streaming events for the frontend
     """
+    events = _stream_account_intel(account, query, session_id)
+    if not session_id:
+        async for event in events:
+            yield event
+        return
+    async for event in tee_session_events(session_id, query, events):
+        yield event
+
+
+async def _stream_account_intel(account: Optional[str], query: str, session_id: str) -> AsyncIterator[Dict[str, Any]]:
+    """Translate agent run events into UI events; see ``get_account_intel``."""
     if not session_id:
         yield {
             "type": "error",
@@ -84,7 +102,9 @@ async def get_account_intel(account: Optional[str], query: str, session_id: str)
 
     async with MCPTools(
         command="npx -y @tsmztech/mcp-server-salesforce",
-        env=salesforce_env
+        env=salesforce_env,
+        # Described from the local schema cache instead, see describe_salesforce_object
+        exclude_tools=["salesforce_describe_object"],
     ) as mcp_tools:# Configure agent with session-specific storage if session_id provided
         session_agent = Agent(
             name="Account Intelligence Agent",
@@ -98,13 +118,16 @@ async def get_account_intel(account: Optional[str], query: str, session_id: str)
                     "name": "web_search",
                     "max_uses": 5
                 },
-                mcp_tools
+                mcp_tools,
+                describe_salesforce_object
             ],
-            storage=SqliteStorage(
-                table_name=f"session_{session_id}", 
-                db_file=COMMON_AGENT_SETTINGS["storage_db"]
-            ),
+            session_id=session_id,
+            storage=agent_storage(),
+            memory=WindowedMemory(),
             add_history_to_messages=COMMON_AGENT_SETTINGS["add_history_to_messages"],
+            num_history_runs=COMMON_AGENT_SETTINGS["num_history_runs"],
+            enable_session_summaries=True,
+            add_session_summary_references=True,
             add_datetime_to_instructions=COMMON_AGENT_SETTINGS["add_datetime_to_instructions"],
             show_tool_calls=COMMON_AGENT_SETTINGS["show_tool_calls"],
             markdown=True
@@ -178,6 +201,7 @@ async def get_account_intel(account: Optional[str], query: str, session_id: str)
                     yield {
                         "type": "tool_called",
                         "tool": TOOL_NAME_TO_UI_NAME[tool_name],
+                        "input": tool_data.get("tool_args"),
                         "timestamp": datetime.now().isoformat()
                     }
                 continue
@@ -249,4 +273,5 @@ async def get_account_intel(account: Optional[str], query: str, session_id: str)
                 }
                 
                 yield {"type": "run_completed"}
-                break
\ No newline at end of file
+                # Don't break: agno writes the run to agent storage after this event
+                continue
\ No newline at end of file
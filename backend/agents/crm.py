@@ -8,16 +8,19 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from agno.agent import Agent
 from agno.models.anthropic import Claude
-from agno.storage.sqlite import SqliteStorage
 from agno.tools.reasoning import ReasoningTools
 from typing import Dict, Any, AsyncIterator
 from datetime import datetime
 from config.agents import AGENT_INSTRUCTIONS, COMMON_AGENT_SETTINGS
+from core.agent_history import WindowedMemory
+from core.agent_storage import agent_storage
+from core.event_writer import tee_session_events
 from utils import (
     query_salesforce_sync, 
     create_salesforce_record_sync, 
     update_salesforce_record_sync, 
     delete_salesforce_record_sync,
+    describe_salesforce_object,
     query_salesforce_and_chart,
     parse_chart_result
 )
@@ -30,6 +33,7 @@ TOOL_NAME_TO_UI_NAME = {
     "create_salesforce_record_sync": "Created Salesforce Record",
     "update_salesforce_record_sync": "Updated Salesforce Record",
     "delete_salesforce_record_sync": "Deleted Salesforce Record",
+    "describe_salesforce_object": "Described Salesforce object schema",
     "analyze": "Analyzed the data",
     "query_salesforce_and_chart": "Queried Salesforce and Created a Chart"
 }
@@ -47,6 +51,9 @@ async def get_crm_response(query: str, session_id: str) -> AsyncIterator[Dict[st
     4. ``artifact``                                  – the full response once the run finishes.
     5. ``run_completed``                             – marks the very end of the run.
     
+    Every event is also persisted to the session as it streams, so the run
+    history survives a closed tab and the client does not need to save it.
+    
     Args:
         query: The specific query or request about the account
         session_id: The session ID to associate with this agent run (optional)
@@ -54,6 +61,17 @@ async def get_crm_response(query: str, session_id: str) -> AsyncIterator[Dict[st
     Yields:
         Dict[str, Any]: Streaming events for the frontend
     """
+    events = _stream_crm_response(query, session_id)
+    if not session_id:
+        async for event in events:
+            yield event
+        return
+    async for event in tee_session_events(session_id, query, events):
+        yield event
+
+
+async def _stream_crm_response(query: str, session_id: str) -> AsyncIterator[Dict[str, Any]]:
+    """Translate agent run events into UI events; see ``get_crm_response``."""
     if not session_id:
         yield {
             "type": "error",
@@ -86,13 +104,18 @@ async def get_crm_response(query: str, session_id: str) -> AsyncIterator[Dict[st
             create_salesforce_record_sync,
             update_salesforce_record_sync,
             delete_salesforce_record_sync,
+            describe_salesforce_object,
+            # The bulk and graph tools are left out: their confirmation
+            # prompts on the server console, which the web UI cannot answer
             query_salesforce_and_chart
         ],
-        storage=SqliteStorage(
-            table_name=f"session_{session_id}", 
-            db_file=COMMON_AGENT_SETTINGS["storage_db"]
-        ),
+        session_id=session_id,
+        storage=agent_storage(),
+        memory=WindowedMemory(),
         add_history_to_messages=COMMON_AGENT_SETTINGS["add_history_to_messages"],
+        num_history_runs=COMMON_AGENT_SETTINGS["num_history_runs"],
+        enable_session_summaries=True,
+        add_session_summary_references=True,
         add_datetime_to_instructions=COMMON_AGENT_SETTINGS["add_datetime_to_instructions"],
         show_tool_calls=COMMON_AGENT_SETTINGS["show_tool_calls"],
         markdown=True
@@ -168,6 +191,7 @@ async def get_crm_response(query: str, session_id: str) -> AsyncIterator[Dict[st
                 yield {
                     "type": "tool_called",
                     "tool": TOOL_NAME_TO_UI_NAME[tool_name],
+                    "input": tool_data.get("tool_args"),
                     "timestamp": datetime.now().isoformat()
                 }
             continue
@@ -270,4 +294,5 @@ async def get_crm_response(query: str, session_id: str) -> AsyncIterator[Dict[st
             }
             
             yield {"type": "run_completed"}
-            break
+            # Don't break: agno writes the run to agent storage after this event
+            continue
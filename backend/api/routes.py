@@ -1,26 +1,41 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Union
 from uuid import uuid4
 from datetime import datetime
+import hashlib
 import json
 
-from fastapi import APIRouter, HTTPException, Query, Body
+from fastapi import APIRouter, HTTPException, Query, Body, Header, Response
 from fastapi.responses import StreamingResponse
 
 from api.schemas import (
     SessionCreate,
     SessionUpdate,
+    SessionDelta,
+    JsonPatchOperation,
     SessionResponse,
+    SessionSummaryResponse,
+    SessionSearchResultResponse,
     BaseResponse,
     UserResponse,
     UserUpdate,
     OpportunityResponse,
+    CatalogMatchResponse,
 )
 from utils import query_salesforce
+from utils.salesforce_cache import soql_cache
+from utils.salesforce_concurrency import salesforce_call_limit, salesforce_flights
+from utils.salesforce_metadata import metadata_cache
 from agents.account_intel import get_account_intel
 from agents.crm import get_crm_response
 from database_async import get_async_db
-from core.services_async import AsyncSessionService, AsyncUserService
-from core.models import Session, User
+from core.services_async import AsyncSessionService, AsyncUserService, AsyncArtifactService
+from core.repositories_async import ConcurrentUpdateError
+from core.session_patch import SessionPatch, PatchError, PatchConflict
+from core.maintenance import StorageMaintenance, storage_maintenance
+from core.name_catalog import name_catalog
+from core.session_cache import SessionPayload, session_cache
+from core.write_behind import PendingWriteError, session_write_buffer
+from core.models import Session, SessionSummary, SessionVersion, User
 from pydantic import BaseModel
 from fastapi import Depends
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -47,11 +62,46 @@ def _now():
     return datetime.utcnow()
 
 
+def _etag(*parts: Any) -> str:
+    """Strong ETag identifying the representation described by ``parts``."""
+    digest = hashlib.sha1("|".join(str(part) for part in parts).encode("utf-8")).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def _session_etag(representation: str, session: Union[Session, SessionVersion, SessionPayload]) -> str:
+    """ETag of a session representation, derived from its version and update date."""
+    return _etag(representation, session.id, session.version, session.updated_date.isoformat())
+
+
+def _page_etag(representation: str, items: List[Union[SessionSummary, SessionVersion]], *params: Any) -> str:
+    """ETag of a page of sessions, derived from the versions of its items."""
+    return _etag(representation, *params, *(f"{s.id}:{s.version}:{s.updated_date.isoformat()}" for s in items))
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an ``If-None-Match`` header matches ``etag`` (weak comparison)."""
+    if not if_none_match:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+
+def _session_cache_control(access_level: str) -> str:
+    # Caches must revalidate, which costs one indexed lookup while the session
+    # is unchanged; only shared sessions may be kept by shared caches
+    return "public, no-cache" if access_level == "public" else "private, no-cache"
+
+
 def _serialize_session(sess: Session) -> SessionResponse:
     """Convert domain model to API schema."""
     return SessionResponse(**sess.dict())
 
 
+def _serialize_summary(summary: SessionSummary) -> SessionSummaryResponse:
+    """Convert session summary read model to API schema."""
+    return SessionSummaryResponse(**summary.dict())
+
+
 # ---------------------------------------------------------------------------
 # Session endpoints
 # ---------------------------------------------------------------------------
@@ -67,70 +117,161 @@ async def create_session(session: SessionCreate, db: AsyncSession = Depends(get_
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.get("/sessions/", response_model=List[SessionResponse])
+@router.get("/sessions/", response_model=List[SessionSummaryResponse])
 async def list_sessions(
+    response: Response,
     sort: str = Query("-updated_date", description="Sort order"),
-    limit: int = Query(50, description="Number of results to return"),
+    limit: int = Query(50, ge=1, le=200, description="Number of results to return"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from X-Next-Cursor"),
+    if_none_match: Optional[str] = Header(None),
     db: AsyncSession = Depends(get_async_db)
 ):
     try:
         session_service = AsyncSessionService(db)
-        all_sessions = await session_service.repository.find_all()
-        reverse = sort.startswith("-")
-        sort_key = sort.lstrip("-")
-        
-        # Sort sessions
-        if sort_key == "updated_date":
-            sorted_sessions = sorted(all_sessions, key=lambda s: s.updated_date, reverse=reverse)
-        else:
-            sorted_sessions = sorted(all_sessions, key=lambda s: getattr(s, sort_key, _now()), reverse=reverse)
-        
-        return [_serialize_session(s) for s in sorted_sessions[:limit]]
+        if if_none_match:
+            versions, next_cursor = await session_service.list_session_versions(sort, limit, cursor)
+            etag = _page_etag("sessions", versions, sort, limit, cursor, next_cursor)
+            if _etag_matches(if_none_match, etag):
+                headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+                if next_cursor:
+                    headers["X-Next-Cursor"] = next_cursor
+                return Response(status_code=304, headers=headers)
+        sessions, next_cursor = await session_service.list_sessions(sort, limit, cursor)
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+        response.headers["ETag"] = _page_etag("sessions", sessions, sort, limit, cursor, next_cursor)
+        response.headers["Cache-Control"] = "private, no-cache"
+        return [_serialize_summary(s) for s in sessions]
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.get("/sessions/filter/", response_model=List[SessionResponse])
-async def filter_sessions(id: Optional[str] = Query(None), db: AsyncSession = Depends(get_async_db)):
+@router.get("/sessions/filter/", response_model=List[SessionSummaryResponse])
+async def filter_sessions(
+    response: Response,
+    id: Optional[str] = Query(None),
+    sort: str = Query("-updated_date", description="Sort order"),
+    limit: int = Query(50, ge=1, le=200, description="Number of results to return"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from X-Next-Cursor"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Sessions matching the filter; without one, pages through all sessions like ``/sessions/``."""
     try:
         session_service = AsyncSessionService(db)
         if id:
-            sess = await session_service.get_session_by_id(id)
-            if not sess:
+            summary = await session_service.get_session_summary(id)
+            if not summary:
                 return []
-            return [_serialize_session(sess)]
-        all_sessions = await session_service.repository.find_all()
-        return [_serialize_session(s) for s in all_sessions]
+            return [_serialize_summary(summary)]
+        sessions, next_cursor = await session_service.list_sessions(sort, limit, cursor)
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+        return [_serialize_summary(s) for s in sessions]
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except PendingWriteError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/sessions/search", response_model=List[SessionSearchResultResponse])
+async def search_sessions(
+    q: str = Query(..., min_length=1, description="Words to search for; the last one matches as a prefix"),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Ranked full-text search over session titles, messages and artifacts."""
+    session_service = AsyncSessionService(db)
+    try:
+        results = await session_service.search_sessions(q, limit, offset)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return [SessionSearchResultResponse(**result.dict()) for result in results]
+
+
 @router.get("/sessions/{session_id}", response_model=SessionResponse)
-async def get_session(session_id: str, db: AsyncSession = Depends(get_async_db)):
+async def get_session(
+    session_id: str,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get a full session, served from the in-process session cache when possible.
+
+    ``If-None-Match`` is answered without loading the session's content.
+    """
     session_service = AsyncSessionService(db)
-    sess = await session_service.get_session_by_id(session_id)
-    if not sess:
+    if if_none_match:
+        current = await session_service.get_session_version(session_id)
+        if not current:
+            raise HTTPException(status_code=404, detail="Session not found")
+        etag = _session_etag("session", current)
+        if _etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers={
+                "ETag": etag, "Cache-Control": _session_cache_control(current.access_level)
+            })
+    payload = await session_service.get_session_payload(session_id)
+    if not payload:
         raise HTTPException(status_code=404, detail="Session not found")
-    return _serialize_session(sess)
+    return Response(content=payload.body, media_type="application/json", headers={
+        "ETag": _session_etag("session", payload),
+        "Cache-Control": _session_cache_control(payload.access_level),
+    })
 
 
 @router.put("/sessions/{session_id}", response_model=SessionResponse)
 async def update_session(session_id: str, session: SessionUpdate, db: AsyncSession = Depends(get_async_db)):
+    changes = session.model_dump(exclude_none=True)
+    expected_version = changes.pop("version", None)
     try:
         session_service = AsyncSessionService(db)
-        updated = await session_service.update_session(session_id, session.model_dump(exclude_none=True))
-        if not updated:
-            raise HTTPException(status_code=404, detail="Session not found")
-        return _serialize_session(updated)
+        updated = await session_service.update_session(session_id, changes, expected_version)
+    except ConcurrentUpdateError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except PendingWriteError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    if not updated:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return _serialize_session(updated)
+
+
+@router.patch("/sessions/{session_id}", response_model=SessionSummaryResponse)
+async def patch_session(
+    session_id: str,
+    delta: Union[List[JsonPatchOperation], SessionDelta] = Body(...),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Apply an RFC 6902 JSON Patch (a list of operations) or an append/merge delta."""
+    try:
+        if isinstance(delta, list):
+            patch = SessionPatch.from_json_patch([op.model_dump(exclude_unset=True) for op in delta])
+        else:
+            patch = SessionPatch.from_delta(delta.append, delta.merge)
+        session_service = AsyncSessionService(db)
+        updated = await session_service.patch_session(session_id, patch)
+    except PatchConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except PatchError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except PendingWriteError:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if not updated:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return _serialize_summary(updated)
 
 
 @router.delete("/sessions/{session_id}", response_model=BaseResponse)
 async def delete_session(session_id: str, db: AsyncSession = Depends(get_async_db)):
     try:
         session_service = AsyncSessionService(db)
-        deleted = await session_service.repository.delete(session_id)
+        deleted = await session_service.delete_session(session_id)
         if not deleted:
             raise HTTPException(status_code=404, detail="Session not found")
         return BaseResponse(success=True, message="Session deleted successfully")
@@ -155,31 +296,35 @@ class MessageSendResponse(BaseResponse):
 @router.post("/sessions/{session_id}/messages", response_model=MessageSendResponse)
 async def send_message_to_session(session_id: str, message: MessageSendRequest, db: AsyncSession = Depends(get_async_db)):
     session_service = AsyncSessionService(db)
-    sess = await session_service.get_session_by_id(session_id)
-    if not sess:
+    msg_record = await session_service.add_message(
+        session_id, message.message_type, message.content, message.metadata
+    )
+    if not msg_record:
         raise HTTPException(status_code=404, detail="Session not found")
 
-    msg_id = sess.add_message(message.message_type, message.content, message.metadata)
-    updated_session = await session_service.update_session(session_id, {"messages": sess.messages, "updated_date": _now()})
-    
-    msg_record = {
-        "id": msg_id,
-        "type": message.message_type,
-        "content": message.content,
-        "timestamp": _now().isoformat(),
-        "metadata": message.metadata or {},
-    }
-
-    return MessageSendResponse(success=True, message_id=msg_id, session_id=session_id, message=msg_record)
+    return MessageSendResponse(success=True, message_id=msg_record["id"], session_id=session_id, message=msg_record)
 
 
 @router.get("/sessions/{session_id}/messages", response_model=List[Dict[str, Any]])
-async def get_session_messages(session_id: str, db: AsyncSession = Depends(get_async_db)):
+async def get_session_messages(
+    session_id: str,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db)
+):
     session_service = AsyncSessionService(db)
-    sess = await session_service.get_session_by_id(session_id)
-    if not sess:
+    # Every message append bumps the session version, so it validates the list too
+    current = await session_service.get_session_version(session_id)
+    if not current:
+        raise HTTPException(status_code=404, detail="Session not found")
+    headers = {"ETag": _session_etag("messages", current), "Cache-Control": _session_cache_control(current.access_level)}
+    if _etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    messages = await session_service.get_messages(session_id)
+    if messages is None:
         raise HTTPException(status_code=404, detail="Session not found")
-    return sess.messages
+    response.headers.update(headers)
+    return messages
 
 
 # Share settings
@@ -195,52 +340,102 @@ async def update_session_share_settings(session_id: str, access_level: str = Bod
     return _serialize_session(updated)
 
 
+# ---------------------------------------------------------------------------
+# Artifact blobs – immutable, content-addressed
+# ---------------------------------------------------------------------------
+
+@router.get("/artifacts/{content_hash}")
+async def get_artifact_blob(
+    content_hash: str,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Serve artifact content by SHA-256 hash.
+
+    The content of a hash never changes, so it is cacheable forever and the
+    hash itself is the strong ETag.
+    """
+    etag = f'"{content_hash.lower()}"'
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=31536000, immutable"}
+    if _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    artifact_service = AsyncArtifactService(db)
+    blob = await artifact_service.get_blob(content_hash)
+    if not blob:
+        raise HTTPException(status_code=404, detail="Artifact not found")
+    headers["X-Content-Type-Options"] = "nosniff"
+    if blob.media_type == "text/html":
+        # Charts keep their scripts but cannot act on the API's origin
+        headers["Content-Security-Policy"] = "sandbox allow-scripts"
+    return Response(content=blob.content, media_type=f"{blob.media_type}; charset=utf-8", headers=headers)
+
+
 # ---------------------------------------------------------------------------
 # Account intel & CRM – unchanged (they stream data)
 # ---------------------------------------------------------------------------
 
+async def _record_names(object_name: str) -> List[str]:
+    """Names of every record of an sObject, from the name catalog once it is loaded."""
+    names = name_catalog.names(object_name) if name_catalog is not None else None
+    if names is not None:
+        return names
+    result = await query_salesforce(f"SELECT Name FROM {object_name}", format_data=False)
+    records = getattr(result, "data", [])
+    return [rec.get("Name") for rec in records if "Name" in rec]
+
+
+@router.get("/catalog/search", response_model=List[CatalogMatchResponse])
+async def search_catalog(
+    q: str = Query(..., min_length=1, description="Start of the name or of one of its words; close misspellings also match"),
+    object: Optional[str] = Query(None, description="sObject to search, e.g. Account; all catalog objects when omitted"),
+    limit: int = Query(10, ge=1, le=100),
+):
+    """Typeahead over CRM record names, answered from the in-memory name catalog."""
+    if name_catalog is None:
+        raise HTTPException(status_code=503, detail="Name catalog is disabled")
+    object_name = None
+    if object:
+        object_name = name_catalog.object_name(object)
+        if object_name is None:
+            raise HTTPException(status_code=400, detail=f"{object} is not in the name catalog")
+        if not name_catalog.is_loaded(object_name):
+            raise HTTPException(status_code=503, detail=f"{object_name} names are still loading")
+    return name_catalog.search(q, object_name, limit)
+
+
 @router.get("/accounts/names", response_model=List[str])
 async def get_account_names():
     try:
-        result = await query_salesforce("SELECT Name FROM Account", format_data=False)
-        records = getattr(result, "data", [])
-        return [rec.get("Name") for rec in records if "Name" in rec]
+        return await _record_names("Account")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     
 @router.get("/opportunities/names", response_model=List[str])
 async def get_opportunity_names():
     try:
-        result = await query_salesforce("SELECT Name FROM Opportunity", format_data=False)
-        records = getattr(result, "data", [])
-        return [rec.get("Name") for rec in records if "Name" in rec]
+        return await _record_names("Opportunity")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     
 @router.get("/contacts/names", response_model=List[str])
 async def get_contact_names():
     try:
-        result = await query_salesforce("SELECT Name FROM Contact", format_data=False)
-        records = getattr(result, "data", [])
-        return [rec.get("Name") for rec in records if "Name" in rec]
+        return await _record_names("Contact")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     
 @router.get("/products/names", response_model=List[str])
 async def get_product_names():
     try:
-        result = await query_salesforce("SELECT Name FROM Product2", format_data=False)
-        records = getattr(result, "data", [])
-        return [rec.get("Name") for rec in records if "Name" in rec]
+        return await _record_names("Product2")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     
 @router.get("/leads/names", response_model=List[str])
 async def get_lead_names():
     try:
-        result = await query_salesforce("SELECT Name FROM Lead", format_data=False)
-        records = getattr(result, "data", [])
-        return [rec.get("Name") for rec in records if "Name" in rec]
+        return await _record_names("Lead")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -331,7 +526,10 @@ async def update_current_user(user_update: UserUpdate, db: AsyncSession = Depend
     
     if update_data:
         update_data["updated_date"] = _now()
-        updated_user = await user_service.update_user(user.id, update_data)
+        try:
+            updated_user = await user_service.update_user(user.id, update_data, user_update.version)
+        except ConcurrentUpdateError as e:
+            raise HTTPException(status_code=409, detail=str(e))
         return UserResponse(**updated_user.dict())
     
     return UserResponse(**user.dict())
@@ -339,4 +537,43 @@ async def update_current_user(user_update: UserUpdate, db: AsyncSession = Depend
 
 @router.post("/users/logout", response_model=BaseResponse)
 async def logout_user():
-    return BaseResponse(success=True, message="User logged out successfully") 
\ No newline at end of file
+    return BaseResponse(success=True, message="User logged out successfully") 
+
+
+# ---------------------------------------------------------------------------
+# Metrics
+# ---------------------------------------------------------------------------
+
+@router.get("/metrics", response_model=Dict[str, Any])
+async def get_metrics():
+    """Counters of the in-process caches and write buffers."""
+    metrics: Dict[str, Any] = {}
+    if session_write_buffer is not None:
+        metrics["session_writes"] = session_write_buffer.metrics.snapshot()
+    if session_cache is not None:
+        metrics["session_cache"] = {
+            **session_cache.metrics.snapshot(), "entries": len(session_cache), "bytes": session_cache.size
+        }
+    if storage_maintenance is not None:
+        metrics["maintenance"] = storage_maintenance.metrics.snapshot()
+    if soql_cache is not None:
+        metrics["soql_cache"] = {**soql_cache.metrics.snapshot(), "entries": len(soql_cache)}
+    metrics["salesforce_calls"] = {**salesforce_flights.snapshot(), **salesforce_call_limit.snapshot()}
+    if name_catalog is not None:
+        metrics["name_catalog"] = name_catalog.metrics.snapshot()
+    if metadata_cache is not None:
+        metrics["salesforce_metadata"] = {**metadata_cache.metrics.snapshot(), "entries": len(metadata_cache)}
+    return metrics
+
+
+# ---------------------------------------------------------------------------
+# Maintenance
+# ---------------------------------------------------------------------------
+
+@router.get("/maintenance/report", response_model=Dict[str, Any])
+async def get_maintenance_report():
+    """Dry run of the maintenance job: orphaned data it would remove and database sizes."""
+    try:
+        return await (storage_maintenance or StorageMaintenance()).report()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -68,6 +68,24 @@ class SessionUpdate(BaseModel):
     artifacts: Optional[List[Dict[str, Any]]] = None
     event_history: Optional[List[Dict[str, Any]]] = None
     data: Optional[Dict[str, Any]] = None
+    version: Optional[int] = Field(default=None, description="Version the update is based on; stale versions are rejected with 409")
+
+
+class JsonPatchOperation(BaseModel):
+    """RFC 6902 JSON Patch operation."""
+    op: str = Field(..., description="Operation: add, replace, remove or test")
+    path: str = Field(..., description="JSON pointer, e.g. /artifacts/- or /data/account")
+    value: Optional[Any] = None
+
+
+class SessionDelta(BaseModel):
+    """Delta update: items appended to lists and fields merged into the session."""
+    append: Dict[str, List[Dict[str, Any]]] = Field(
+        default_factory=dict, description="New messages, timeline, event_history or artifacts items"
+    )
+    merge: Dict[str, Any] = Field(
+        default_factory=dict, description="Scalar fields to set; data is merged per RFC 7396"
+    )
 
 
 class SessionResponse(SessionBase):
@@ -75,11 +93,50 @@ class SessionResponse(SessionBase):
     user_id: Optional[str] = None
     created_date: datetime
     updated_date: datetime
+    version: int = 1
+
+    class Config:
+        from_attributes = True
+
+
+class SessionSummaryResponse(BaseModel):
+    """Session list item without the messages, timeline, artifacts and event blobs."""
+    id: str
+    title: Optional[str] = None
+    description: Optional[str] = None
+    droid_type: Optional[str] = None
+    status: Optional[str] = None
+    context_entity: Optional[str] = None
+    is_pinned: Optional[bool] = False
+    access_level: Optional[str] = None
+    user_id: Optional[str] = None
+    message_count: int = 0
+    artifact_count: int = 0
+    last_message_preview: Optional[str] = None
+    has_chart: bool = False
+    created_date: datetime
+    updated_date: datetime
+    version: int = 1
 
     class Config:
         from_attributes = True
 
 
+class SessionSearchResultResponse(SessionSummaryResponse):
+    """Session matched by a full-text search."""
+    matched: str = Field(..., description="Where the best match was found: title, message or artifact")
+    snippet: str = Field(..., description="HTML-escaped excerpt with matches wrapped in <mark>")
+    score: float
+
+
+class CatalogMatchResponse(BaseModel):
+    """CRM record found by the name catalog."""
+    id: str
+    name: str
+    object: str
+    match: str = Field(..., description="prefix (of the name), word (prefix of a word) or fuzzy")
+
+
 # Account schemas
 class AccountBase(BaseModel):
     name: str
@@ -127,12 +184,14 @@ class UserUpdate(BaseModel):
     email: Optional[str] = None
     first_name: Optional[str] = None
     last_name: Optional[str] = None
+    version: Optional[int] = Field(default=None, description="Version the update is based on; stale versions are rejected with 409")
 
 
 class UserResponse(UserBase):
     id: str
     created_date: datetime
     updated_date: datetime
+    version: int = 1
 
     class Config:
         from_attributes = True
@@ -0,0 +1,121 @@
+"""Benchmark of connection open time with per-session agent tables vs one table.
+
+Builds an application database holding ``--sessions`` legacy agno
+``session_{id}`` tables, times opening a connection and running a first
+query (which parses the whole schema), consolidates the tables into agent
+storage with the ``0006_consolidate_agent_storage`` migration code, and
+times it again:
+
+    cd backend && python -m benchmarks.agent_storage --sessions 2000
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+from typing import Callable, List
+from uuid import uuid4
+
+from sqlalchemy import create_engine, event
+
+from config.agents import agent_config
+from migrations import run_migrations
+from models.db_models import Base
+from models.types import register_sqlite_functions
+
+
+def _report(name: str, samples: List[float]) -> None:
+    samples = sorted(samples)
+    p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+    print(f"{name:<40} p50 {statistics.median(samples) * 1000:8.3f} ms  p99 {p99 * 1000:8.3f} ms")
+
+
+def _time(iterations: int, run: Callable[[], None]) -> List[float]:
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        run()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def _open(path: str, query: str) -> Callable[[], None]:
+    def run() -> None:
+        conn = sqlite3.connect(path)
+        conn.execute(query).fetchall()
+        conn.close()
+    return run
+
+
+def _create_legacy_tables(path: str, count: int) -> List[str]:
+    """Create ``count`` tables exactly like ``SqliteStorage(table_name=f"session_{id}")`` does."""
+    from agno.storage.sqlite import SqliteStorage
+
+    template_id = str(uuid4())
+    template = SqliteStorage(table_name=f"session_{template_id}", db_file=path)
+    template.create()
+    conn = sqlite3.connect(path)
+    ddl = [sql for (sql,) in conn.execute(
+        "SELECT sql FROM sqlite_master WHERE tbl_name = ? AND sql IS NOT NULL", (template.table_name,)
+    )]
+    conn.execute(f'DROP TABLE "{template.table_name}"')
+    memory = json.dumps({"runs": [{"message": {"role": "user", "content": "x" * 200}}] * 4})
+    session_ids = [str(uuid4()) for _ in range(count)]
+    with conn:
+        for session_id in session_ids:
+            for sql in ddl:
+                conn.execute(sql.replace(template_id, session_id))
+            conn.execute(
+                f'INSERT INTO "session_{session_id}" (session_id, agent_id, memory, created_at, updated_at) '
+                "VALUES (?, 'crm', ?, ?, ?)",
+                (str(uuid4()), memory, int(time.time()), int(time.time())),
+            )
+    conn.close()
+    template.db_engine.dispose()
+    return session_ids
+
+
+def main(sessions: int, iterations: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        app_db = os.path.join(tmp, "app.db")
+        agent_config.STORAGE_DB = os.path.join(tmp, "agent_storage.db")
+        from core.agent_storage import agent_storage, consolidate_legacy_tables
+
+        engine = create_engine(f"sqlite:///{app_db}")
+        event.listen(engine, "connect", register_sqlite_functions)
+        with engine.begin() as conn:
+            Base.metadata.create_all(conn)
+            run_migrations(conn)
+        session_ids = _create_legacy_tables(app_db, sessions)
+        session_id = session_ids[len(session_ids) // 2]
+        print(f"{sessions} sessions, app database {os.path.getsize(app_db) / 1024 / 1024:.2f} MiB")
+
+        query = "SELECT count(*) FROM sessions"
+        _report("open + first query, per-session tables", _time(iterations, _open(app_db, query)))
+        legacy = f'SELECT memory FROM "session_{session_id}"'
+        _report("open + read history, per-session tables", _time(iterations, _open(app_db, legacy)))
+
+        start = time.perf_counter()
+        with engine.begin() as conn:
+            consolidate_legacy_tables(conn)
+        print(f"consolidated in {time.perf_counter() - start:.2f} s, "
+              f"app database {os.path.getsize(app_db) / 1024 / 1024:.2f} MiB "
+              f"({sessions} tables dropped, file not vacuumed)")
+        engine.dispose()
+
+        storage = agent_storage()
+        _report("open + first query, one table", _time(iterations, _open(app_db, query)))
+        consolidated = f"SELECT memory FROM \"{storage.table_name}\" WHERE session_id = '{session_id}'"
+        _report("open + read history, one table", _time(iterations, _open(agent_config.STORAGE_DB, consolidated)))
+        assert storage.read(session_id) is not None, "history was not consolidated"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=2000)
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+    main(args.sessions, args.iterations)
@@ -0,0 +1,117 @@
+"""Synthetic but realistic session corpus shared by the benchmarks.
+
+Sessions look like the ones the agents produce: a user query, markdown
+answers, a few hundred streamed ``content_chunk`` and tool events, a
+markdown brief, a Salesforce data table and a Plotly ``chart-container``.
+"""
+
+import random
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+from uuid import uuid4
+
+import plotly.graph_objects as go
+
+from core.models import Session, build_message
+
+WORDS = (
+    "account pipeline revenue renewal forecast quarter churn expansion opportunity "
+    "stage close risk upsell contract region enterprise segment growth margin "
+    "customer executive sponsor competitor pricing discount onboarding usage"
+).split()
+
+
+def _sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def _markdown(rng: random.Random, paragraphs: int) -> str:
+    sections = []
+    for i in range(paragraphs):
+        sections.append(f"## Section {i + 1}\n\n" + " ".join(_sentence(rng, 14) for _ in range(5)))
+        sections.append("\n".join(f"- **{rng.choice(WORDS)}**: {_sentence(rng, 8)}" for _ in range(4)))
+    return "\n\n".join(sections)
+
+
+def _table(rng: random.Random, rows: int) -> str:
+    lines = ["| Name | Stage | Amount | Close Date |", "|---|---|---|---|"]
+    for i in range(rows):
+        lines.append(
+            f"| {rng.choice(WORDS).title()} Corp {i} | {rng.choice(['Prospecting', 'Negotiation', 'Closed Won'])} "
+            f"| {rng.randint(1, 900) * 1000} | 2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} |"
+        )
+    return "\n".join(lines)
+
+
+def _chart(rng: random.Random, points: int) -> str:
+    fig = go.Figure(go.Bar(
+        x=[f"{rng.choice(WORDS).title()} {i}" for i in range(points)],
+        y=[rng.randint(1, 900) * 1000 for _ in range(points)],
+    ))
+    fig.update_layout(title="Pipeline by account")
+    html = fig.to_html(full_html=False, include_plotlyjs="cdn")
+    return f"<div class='chart-container'>{html}</div>"
+
+
+def _events(rng: random.Random, answer: str) -> List[Dict[str, Any]]:
+    start = datetime.utcnow()
+    events = []
+    words = answer.split(" ")
+    for i in range(0, len(words), 3):
+        events.append({
+            "id": str(uuid4()),
+            "type": "content_chunk",
+            "content": " ".join(words[i:i + 3]) + " ",
+            "timestamp": (start + timedelta(milliseconds=40 * i)).isoformat(),
+        })
+    for tool in ("query_salesforce", "generate_chart"):
+        events.append({
+            "id": str(uuid4()), "type": "toolCall", "name": tool, "toolType": "default",
+            "status": "completed", "output": _sentence(rng, 30), "timestamp": start.isoformat(),
+        })
+    return events
+
+
+def build_session(rng: random.Random) -> Session:
+    """Build one session with messages, events and artifacts."""
+    answers = [_markdown(rng, 2) for _ in range(3)]
+    messages = []
+    events = []
+    for answer in answers:
+        messages.append(build_message("user", _sentence(rng, 12)))
+        messages.append(build_message("assistant", answer))
+        events.extend(_events(rng, answer))
+    return Session(
+        title=_sentence(rng, 6),
+        droid_type=rng.choice(["auto", "crm"]),
+        status="completed",
+        messages=messages,
+        timeline=[{"step": i, "title": _sentence(rng, 4), "status": "completed"} for i in range(4)],
+        event_history=events,
+        artifacts=[
+            {"title": "Account brief", "content": _markdown(rng, 6)},
+            {"title": "Salesforce Data", "type": "data", "content": _table(rng, 40)},
+            {"title": "Interactive Chart", "type": "chart", "content": _chart(rng, 40)},
+        ],
+        data={"query": _sentence(rng, 10), "filters": {"region": rng.choice(WORDS)}},
+    )
+
+
+def build_large_session(target_bytes: int, seed: int = 42) -> Session:
+    """Build one long-running session whose JSON is at least ``target_bytes`` long."""
+    rng = random.Random(seed)
+    session = build_session(rng)
+    size = len(session.model_dump_json())
+    while size < target_bytes:
+        turn = build_session(rng)
+        session.messages.extend(turn.messages)
+        session.event_history.extend(turn.event_history)
+        session.artifacts.extend(turn.artifacts)
+        size += len(turn.model_dump_json())
+    return session
+
+
+def build_corpus(count: int, seed: int = 42) -> List[Session]:
+    """Build ``count`` sessions deterministically."""
+    rng = random.Random(seed)
+    return [build_session(rng) for _ in range(count)]
@@ -0,0 +1,95 @@
+"""Benchmark of compressed JSON columns on a realistic session corpus.
+
+Writes the same corpus into two fresh databases – compression disabled and
+enabled – and reports the database size and read/write latencies:
+
+    cd backend && python -m benchmarks.json_compression --sessions 200
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from typing import Dict, List
+
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from benchmarks.corpus import build_corpus
+from config.settings import settings
+from core.models import Session, build_message
+from core.repositories_async import AsyncSessionRepository
+from migrations import run_migrations
+from models.db_models import Base
+from models.types import register_sqlite_functions
+
+
+def _percentiles(samples: List[float]) -> str:
+    samples = sorted(samples)
+    p95 = samples[int(len(samples) * 0.95) - 1] if len(samples) >= 20 else samples[-1]
+    return f"p50 {statistics.median(samples) * 1000:7.2f} ms  p95 {p95 * 1000:7.2f} ms"
+
+
+async def run(corpus: List[Session], threshold: int, path: str) -> Dict[str, object]:
+    """Write, append to and read back ``corpus`` with the given compression threshold."""
+    settings.JSON_COMPRESSION_THRESHOLD = threshold
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    event.listen(engine.sync_engine, "connect", register_sqlite_functions)
+    session_factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(run_migrations)
+
+    writes, appends, reads = [], [], []
+    for session in corpus:
+        async with session_factory() as db:
+            start = time.perf_counter()
+            await AsyncSessionRepository(db).save(session.model_copy(deep=True))
+            writes.append(time.perf_counter() - start)
+    for session in corpus:
+        async with session_factory() as db:
+            start = time.perf_counter()
+            await AsyncSessionRepository(db).append(
+                session.id, {"messages": [build_message("assistant", session.messages[-1]["content"])]}
+            )
+            appends.append(time.perf_counter() - start)
+    for session in corpus:
+        async with session_factory() as db:
+            start = time.perf_counter()
+            await AsyncSessionRepository(db).find_by_id(session.id)
+            reads.append(time.perf_counter() - start)
+
+    async with engine.connect() as conn:
+        await conn.execute(text("VACUUM"))
+    await engine.dispose()
+    return {
+        "size": os.path.getsize(path),
+        "write": _percentiles(writes),
+        "append": _percentiles(appends),
+        "read": _percentiles(reads),
+    }
+
+
+async def main(sessions: int, threshold: int) -> None:
+    corpus = build_corpus(sessions)
+    with tempfile.TemporaryDirectory() as tmp:
+        results = {
+            "uncompressed": await run(corpus, 0, os.path.join(tmp, "plain.db")),
+            f"zlib >= {threshold} B": await run(corpus, threshold, os.path.join(tmp, "compressed.db")),
+        }
+    print(f"{sessions} sessions")
+    for name, result in results.items():
+        print(f"\n{name}")
+        print(f"  database size  {result['size'] / 1024 / 1024:8.2f} MiB")
+        for metric in ("write", "append", "read"):
+            print(f"  {metric:<14} {result[metric]}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--threshold", type=int, default=settings.JSON_COMPRESSION_THRESHOLD)
+    args = parser.parse_args()
+    asyncio.run(main(args.sessions, args.threshold))
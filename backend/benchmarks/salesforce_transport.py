@@ -0,0 +1,70 @@
+"""Benchmark of per-call overhead of the Salesforce transports.
+
+Runs ``--iterations`` small queries through the REST transport against the
+local stub, once over the pooled client and once opening a connection per
+call, and times what the CLI transport pays before any network I/O:
+starting a shell and ``sf --version`` when the CLI is installed, else a bare
+Node.js process as a lower bound:
+
+    cd backend && python -m benchmarks.salesforce_transport --iterations 200
+"""
+
+import argparse
+import shutil
+import statistics
+import subprocess
+import time
+from typing import Callable, List
+
+from utils.salesforce_rest import SalesforceRestTransport
+from utils.salesforce_stub import SalesforceStub
+
+QUERY = "SELECT Id, Name FROM Account LIMIT 10"
+
+
+def _report(name: str, samples: List[float]) -> None:
+    samples = sorted(samples)
+    p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+    print(f"{name:<40} p50 {statistics.median(samples) * 1000:8.3f} ms  p99 {p99 * 1000:8.3f} ms")
+
+
+def _time(iterations: int, run: Callable[[], None]) -> List[float]:
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        run()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def _spawn(command: str) -> Callable[[], None]:
+    def run() -> None:
+        subprocess.run(command, shell=True, capture_output=True)
+    return run
+
+
+def main(iterations: int) -> None:
+    accounts = [{"Name": f"Account {i}", "Industry": "Technology"} for i in range(100)]
+    with SalesforceStub({"Account": accounts}) as stub:
+        pooled = SalesforceRestTransport("stub", ".", **stub.transport_options())
+        pooled.query(QUERY)
+        _report("REST, pooled connection", _time(iterations, lambda: pooled.query(QUERY)))
+        pooled.close()
+
+        def unpooled() -> None:
+            transport = SalesforceRestTransport("stub", ".", **stub.transport_options())
+            transport.query(QUERY)
+            transport.close()
+        _report("REST, connection per call", _time(iterations, unpooled))
+
+    if shutil.which("sf"):
+        _report("CLI process start (sf --version)", _time(min(iterations, 20), _spawn("sf --version")))
+    elif shutil.which("node"):
+        _report("Node.js process start (no sf CLI)", _time(min(iterations, 20), _spawn("node -e 0")))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+    main(args.iterations)
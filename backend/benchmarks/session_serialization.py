@@ -0,0 +1,88 @@
+"""Benchmark of full session responses: model round trip vs raw JSON passthrough.
+
+Stores one large session and times producing its ``GET /api/sessions/{id}``
+body both ways, with the session cache disabled:
+
+    cd backend && python -m benchmarks.session_serialization --megabytes 5
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+from typing import Awaitable, Callable, List
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from api.schemas import SessionResponse
+from benchmarks.corpus import build_large_session
+from core.services_async import AsyncSessionService
+from migrations import run_migrations
+from models.db_models import Base
+from models.types import register_sqlite_functions
+
+
+def _report(name: str, samples: List[float], size: int) -> None:
+    samples = sorted(samples)
+    p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+    print(
+        f"{name:<22} p50 {statistics.median(samples) * 1000:8.2f} ms  "
+        f"p99 {p99 * 1000:8.2f} ms  body {size / 1024 / 1024:.2f} MiB"
+    )
+
+
+async def _time(iterations: int, produce: Callable[[], Awaitable[bytes]]):
+    samples, body = [], b""
+    for _ in range(iterations):
+        start = time.perf_counter()
+        body = await produce()
+        samples.append(time.perf_counter() - start)
+    return samples, body
+
+
+async def main(megabytes: float, iterations: int) -> None:
+    session = build_large_session(int(megabytes * 1024 * 1024))
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.db')}")
+        event.listen(engine.sync_engine, "connect", register_sqlite_functions)
+        session_factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.run_sync(run_migrations)
+        async with session_factory() as db:
+            await AsyncSessionService(db, write_buffer=None, cache=None).create_session(session)
+
+        async def model_round_trip() -> bytes:
+            # What get_session did before: build Session, revalidate it into
+            # SessionResponse and encode it with the standard json module
+            async with session_factory() as db:
+                sess = await AsyncSessionService(db, write_buffer=None, cache=None).get_session_by_id(session.id)
+                response = SessionResponse(**sess.dict())
+                return json.dumps(response.model_dump(mode="json"), separators=(",", ":")).encode("utf-8")
+
+        async def passthrough() -> bytes:
+            async with session_factory() as db:
+                service = AsyncSessionService(db, write_buffer=None, cache=None)
+                return (await service.get_session_payload(session.id)).body
+
+        print(f"{len(session.messages)} messages, {len(session.event_history)} events, {len(session.artifacts)} artifacts")
+        results = {}
+        for name, produce in (("model round trip", model_round_trip), ("raw JSON passthrough", passthrough)):
+            await produce()  # warm up
+            results[name] = await _time(iterations, produce)
+            _report(name, results[name][0], len(results[name][1]))
+        bodies = [json.loads(body) for _, body in results.values()]
+        assert bodies[0] == bodies[1], "responses differ"
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--megabytes", type=float, default=5)
+    parser.add_argument("--iterations", type=int, default=100)
+    args = parser.parse_args()
+    asyncio.run(main(args.megabytes, args.iterations))
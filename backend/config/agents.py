@@ -17,8 +17,8 @@ class AgentConfig:
     MAX_TOKENS: int = 4096
     
     # Storage settings
-    STORAGE_TABLE: str = "sessions"
-    STORAGE_DB: str = "db.sqlite3"
+    STORAGE_TABLE: str = "agent_sessions"  # one row per chat session, keyed by session_id
+    STORAGE_DB: str = settings.AGENT_STORAGE_DB
     
     # Agent behavior settings
     ADD_HISTORY_TO_MESSAGES: bool = True
@@ -26,6 +26,14 @@ class AgentConfig:
     SHOW_TOOL_CALLS: bool = True
     STREAM_INTERMEDIATE_STEPS: bool = True
     
+    # History settings: the last HISTORY_TURNS runs are replayed verbatim, within
+    # HISTORY_TOKEN_BUDGET; older runs are folded into a rolling summary
+    HISTORY_TURNS: int = 3
+    HISTORY_TOKEN_BUDGET: int = 12000
+    HISTORY_TOOL_RESULT_MAX_CHARS: int = 2000
+    HISTORY_SUMMARY_MODEL: str = "claude-3-5-haiku-latest"
+    HISTORY_SUMMARY_MAX_TOKENS: int = 1024
+    
     # Reasoning settings
     SHOW_FULL_REASONING: bool = True
     MAX_REASONING_STEPS: int = 10
@@ -45,6 +53,11 @@ class AgentConfig:
             "add_datetime_to_instructions": self.ADD_DATETIME_TO_INSTRUCTIONS,
             "show_tool_calls": self.SHOW_TOOL_CALLS,
             "stream_intermediate_steps": self.STREAM_INTERMEDIATE_STEPS,
+            "history_turns": self.HISTORY_TURNS,
+            "history_token_budget": self.HISTORY_TOKEN_BUDGET,
+            "history_tool_result_max_chars": self.HISTORY_TOOL_RESULT_MAX_CHARS,
+            "history_summary_model": self.HISTORY_SUMMARY_MODEL,
+            "history_summary_max_tokens": self.HISTORY_SUMMARY_MAX_TOKENS,
             "show_full_reasoning": self.SHOW_FULL_REASONING,
             "max_reasoning_steps": self.MAX_REASONING_STEPS,
             "web_search_max_uses": self.WEB_SEARCH_MAX_USES
@@ -224,6 +237,7 @@ COMMON_AGENT_SETTINGS = {
     "storage_table": agent_config.STORAGE_TABLE,
     "storage_db": agent_config.STORAGE_DB,
     "add_history_to_messages": agent_config.ADD_HISTORY_TO_MESSAGES,
+    "num_history_runs": agent_config.HISTORY_TURNS,
     "add_datetime_to_instructions": agent_config.ADD_DATETIME_TO_INSTRUCTIONS,
     "show_tool_calls": agent_config.SHOW_TOOL_CALLS
 }
@@ -29,10 +29,22 @@ class Settings(BaseSettings):
     
     # Database settings
     DATABASE_URL: str = "sqlite:///./db.sqlite3"
+    AGENT_STORAGE_DB: str = "agent_storage.sqlite3"  # agno run history, kept out of the app database
     
     # Salesforce settings
     SALESFORCE_ORG: str = "my-org"
     SFDX_DIR: str = str(Path(__file__).parent.parent.parent)
+    SALESFORCE_TRANSPORT: str = "rest"  # "rest" calls the REST API directly, "cli" spawns the sf CLI per call
+    SALESFORCE_INSTANCE_URL: Optional[str] = None  # with SALESFORCE_ACCESS_TOKEN, used instead of `sf org display`
+    SALESFORCE_ACCESS_TOKEN: Optional[str] = None
+    SALESFORCE_API_VERSION: str = "61.0"  # when the org does not report one
+    SALESFORCE_HTTP2: bool = True  # needs the h2 package
+    SALESFORCE_MAX_CONNECTIONS: int = 20
+    SALESFORCE_TIMEOUT_SECONDS: float = 120
+    SALESFORCE_MAX_CONCURRENT_CALLS: int = 8  # CLI processes or REST requests at a time (0 = unlimited)
+    SALESFORCE_QUERY_BATCH_SIZE: int = 2000  # records per page of streamed queries, 200 to 2000
+    SALESFORCE_BULK_THRESHOLD: int = 2000  # bulk writes of more records go through Bulk API 2.0 jobs
+    SALESFORCE_BULK_TIMEOUT_SECONDS: float = 1800  # ingest jobs still running then are aborted
     
     # AI/ML settings
     OPENAI_API_KEY: Optional[str] = None
@@ -47,6 +59,46 @@ class Settings(BaseSettings):
     # Session settings
     SESSION_TIMEOUT: int = 3600  # 1 hour
     
+    # Streamed workflow event persistence
+    EVENT_FLUSH_EVERY: int = 20  # events buffered before a flush
+    EVENT_FLUSH_INTERVAL_MS: int = 500  # max time an event waits in the buffer
+    
+    # Compression of large JSON columns (0 disables it). Values smaller than a
+    # database page gain little from it and pay zlib on every read
+    JSON_COMPRESSION_THRESHOLD: int = 4096  # bytes
+    JSON_COMPRESSION_LEVEL: int = 6  # zlib level, 1-9
+    
+    # Write-behind buffer committing session writes in batches (group commit)
+    WRITE_BEHIND_ENABLED: bool = False
+    WRITE_BEHIND_WINDOW_MS: int = 50  # max time a write waits before its batch is committed
+    WRITE_BEHIND_MAX_SESSIONS: int = 100  # sessions with pending writes that trigger an early commit
+    
+    # In-process cache of serialized session responses (0 disables it)
+    SESSION_CACHE_SIZE: int = 256  # sessions
+    SESSION_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    SESSION_CACHE_TTL_SECONDS: float = 30  # bounds staleness from writes by other processes
+    
+    # Background removal of orphaned data, incremental VACUUM and ANALYZE (0 disables it)
+    MAINTENANCE_INTERVAL_SECONDS: int = 6 * 3600
+    MAINTENANCE_BATCH_SIZE: int = 100  # rows or tables removed per transaction
+    MAINTENANCE_GRACE_SECONDS: int = 3600  # data younger than this is never collected
+    MAINTENANCE_VACUUM_PAGES: int = 2000  # free pages returned to the OS per run and database
+    
+    # In-process cache of SOQL query results (0 disables it)
+    SOQL_CACHE_SIZE: int = 512  # queries
+    SOQL_CACHE_TTL_SECONDS: float = 60
+    SOQL_CACHE_OBJECT_TTL_SECONDS: Dict[str, float] = {}  # per sObject, e.g. {"Product2": 3600}
+    SOQL_CACHE_STALE_SECONDS: float = 300  # after the TTL, served while a background refresh runs
+    
+    # In-memory catalog of CRM record names for typeahead (0 disables it)
+    CATALOG_REFRESH_SECONDS: int = 300  # fetches records whose SystemModstamp moved
+    CATALOG_FULL_RELOAD_SECONDS: int = 6 * 3600  # also drops deleted records
+    CATALOG_OBJECTS: List[str] = ["Account", "Opportunity", "Contact", "Product2", "Lead"]
+    
+    # Persistent cache of sObject describes, warmed at startup (0 disables it)
+    SALESFORCE_METADATA_DB: str = "salesforce_metadata.sqlite3"
+    SALESFORCE_METADATA_TTL_SECONDS: int = 24 * 3600  # then revalidated in the background with If-Modified-Since
+    
     @validator('CORS_ORIGINS', pre=True)
     def parse_cors_origins(cls, v):
         """Parse CORS origins from environment variable."""
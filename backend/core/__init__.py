@@ -1,11 +1,11 @@
 """Core domain models and business logic."""
 
-from .models import Session, User, Account, Opportunity
-from .services import SessionService, UserService
-from .repositories import SessionRepository, UserRepository
+from .models import Session, SessionSummary, SessionVersion, SessionSearchResult, ArtifactBlob, User, Account, Opportunity
+from .services import UserService
+from .repositories import UserRepository
 
 __all__ = [
-    "Session", "User", "Account", "Opportunity",
-    "SessionService", "UserService", "AccountService", 
-    "SessionRepository", "UserRepository", "AccountRepository"
+    "Session", "SessionSummary", "SessionVersion", "SessionSearchResult", "ArtifactBlob", "User", "Account", "Opportunity",
+    "UserService", "AccountService", 
+    "UserRepository", "AccountRepository"
 ]
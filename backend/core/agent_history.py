@@ -0,0 +1,195 @@
+"""Bounded agent history: recent turns verbatim, older ones as a rolling summary.
+
+With ``add_history_to_messages`` agno replays the messages of previous runs
+on every follow-up, so the prompt, and with it latency and cost, grows with
+the session. ``WindowedMemory`` replays only the last ``HISTORY_TURNS``
+runs, fewer if they exceed ``HISTORY_TOKEN_BUDGET``, and cuts large tool
+results down to ``HISTORY_TOOL_RESULT_MAX_CHARS``. Runs leaving the window
+are folded into a rolling session summary, which agno adds to the system
+prompt, and then dropped from the stored history: each run is summarized
+once, and the agent storage row stops growing. Paused, cancelled and errored
+runs are neither replayed nor summarized; they are dropped once they are
+older than the window.
+"""
+
+import logging
+from datetime import datetime
+from typing import List, Optional
+
+import anthropic
+from agno.memory.v2.memory import Memory, SessionSummary
+from agno.models.message import Message
+from agno.run.base import RunStatus
+
+from config.agents import agent_config
+
+logger = logging.getLogger(__name__)
+
+# Rough token count of English text and JSON, good enough for budgeting
+CHARS_PER_TOKEN = 4
+
+SUMMARY_PROMPT = """You maintain the running summary of a conversation between a user and a CRM assistant working on Salesforce data.
+
+Update the summary with the new turns below. Keep what later questions may refer to: accounts, contacts, opportunities and their record ids, figures, decisions, records created, updated or deleted, and open questions. Drop pleasantries and formatting. Write at most a few short paragraphs and return only the updated summary.
+
+<current_summary>
+{summary}
+</current_summary>
+
+<new_turns>
+{turns}
+</new_turns>"""
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def compact_tool_result(message: Message, max_chars: int) -> Message:
+    """Return ``message``, or a copy with its tool result cut to ``max_chars``."""
+    content = message.content
+    if message.role != "tool" or not isinstance(content, str) or len(content) <= max_chars:
+        return message
+    omitted = len(content) - max_chars
+    return message.model_copy(update={"content": f"{content[:max_chars]}\n[{omitted} characters omitted from history]"})
+
+
+class WindowedMemory(Memory):
+    """agno ``Memory`` replaying a token-budgeted window of recent runs.
+
+    Agents using it must set ``enable_session_summaries`` and
+    ``add_session_summary_references``: agno then calls
+    ``acreate_session_summary`` after every run, which folds the runs that
+    left the window into the summary it adds to the system prompt.
+    """
+
+    def __init__(
+        self,
+        turns: int = agent_config.HISTORY_TURNS,
+        token_budget: int = agent_config.HISTORY_TOKEN_BUDGET,
+        tool_result_max_chars: int = agent_config.HISTORY_TOOL_RESULT_MAX_CHARS,
+        summary_model: str = agent_config.HISTORY_SUMMARY_MODEL,
+        summary_max_tokens: int = agent_config.HISTORY_SUMMARY_MAX_TOKENS,
+        **kwargs,
+    ):
+        super().__init__(**kwargs)
+        self.turns = turns
+        self.token_budget = token_budget
+        self.tool_result_max_chars = tool_result_max_chars
+        self.summary_model = summary_model
+        self.summary_max_tokens = summary_max_tokens
+
+    def get_messages_from_last_n_runs(
+        self,
+        session_id: str,
+        agent_id: Optional[str] = None,
+        team_id: Optional[str] = None,
+        last_n: Optional[int] = None,
+        skip_role: Optional[str] = None,
+        skip_status: Optional[List[RunStatus]] = None,
+        skip_history_messages: bool = True,
+    ) -> List[Message]:
+        """Messages of the runs in the history window, with large tool results cut."""
+        window = self._window(session_id, last_n)
+        if not window:
+            return []
+        messages = super().get_messages_from_last_n_runs(
+            session_id,
+            agent_id=agent_id,
+            team_id=team_id,
+            last_n=len(window),
+            skip_role=skip_role,
+            skip_status=skip_status,
+            skip_history_messages=skip_history_messages,
+        )
+        return [compact_tool_result(message, self.tool_result_max_chars) for message in messages]
+
+    async def acreate_session_summary(self, session_id: str, user_id: Optional[str] = None) -> Optional[SessionSummary]:
+        """Fold the runs that left the history window into the session summary."""
+        folded = self._runs_to_fold(session_id)
+        if not folded:
+            self._drop_runs(session_id, [])
+            return self.get_session_summary(session_id, user_id)
+        prompt = self._summary_prompt(session_id, user_id, folded)
+        response = await anthropic.AsyncAnthropic().messages.create(
+            model=self.summary_model,
+            max_tokens=self.summary_max_tokens,
+            messages=[{"role": "user", "content": prompt}],
+        )
+        return self._store_summary(session_id, user_id, folded, response.content[0].text.strip())
+
+    def create_session_summary(self, session_id: str, user_id: Optional[str] = None) -> Optional[SessionSummary]:
+        """Synchronous ``acreate_session_summary``, used by ``Agent.run``."""
+        folded = self._runs_to_fold(session_id)
+        if not folded:
+            self._drop_runs(session_id, [])
+            return self.get_session_summary(session_id, user_id)
+        prompt = self._summary_prompt(session_id, user_id, folded)
+        response = anthropic.Anthropic().messages.create(
+            model=self.summary_model,
+            max_tokens=self.summary_max_tokens,
+            messages=[{"role": "user", "content": prompt}],
+        )
+        return self._store_summary(session_id, user_id, folded, response.content[0].text.strip())
+
+    def _completed_runs(self, session_id: str) -> list:
+        return [run for run in (self.runs or {}).get(session_id, []) if not _skipped(run)]
+
+    def _window(self, session_id: str, turns: Optional[int] = None) -> list:
+        """The most recent runs that fit in ``turns`` and the token budget, oldest first.
+
+        The latest run is always kept, however large it is.
+        """
+        window, tokens = [], 0
+        for run in reversed(self._completed_runs(session_id)[-(turns or self.turns):]):
+            tokens += sum(
+                estimate_tokens(compact_tool_result(message, self.tool_result_max_chars).get_content_string())
+                for message in run.messages or []
+                if message.role != "system" and not message.from_history
+            )
+            if window and tokens > self.token_budget:
+                break
+            window.append(run)
+        return window[::-1]
+
+    def _runs_to_fold(self, session_id: str) -> list:
+        window = {id(run) for run in self._window(session_id)}
+        return [run for run in self._completed_runs(session_id) if id(run) not in window]
+
+    def _summary_prompt(self, session_id: str, user_id: Optional[str], runs: list) -> str:
+        summary = self.get_session_summary(session_id, user_id)
+        turns = []
+        for run in runs:
+            for message in run.messages or []:
+                if message.role == "system" or message.from_history:
+                    continue
+                content = compact_tool_result(message, self.tool_result_max_chars).get_content_string()
+                if content:
+                    turns.append(f"{message.role}: {content}")
+        return SUMMARY_PROMPT.format(summary=summary.summary if summary else "(none yet)", turns="\n\n".join(turns))
+
+    def _store_summary(self, session_id: str, user_id: Optional[str], folded: list, text: str) -> SessionSummary:
+        summary = SessionSummary(summary=text, last_updated=datetime.now())
+        self.summaries.setdefault(user_id or "default", {})[session_id] = summary
+        # Summarized runs are not replayed anymore: stop storing them
+        self._drop_runs(session_id, folded)
+        logger.info(f"Folded {len(folded)} runs of session {session_id} into its history summary")
+        return summary
+
+    def _drop_runs(self, session_id: str, folded: list) -> None:
+        """Remove folded runs, and skipped runs older than the window, from the stored history.
+
+        Without a window, the latest run is kept, so a paused run can still be continued.
+        """
+        runs = (self.runs or {}).get(session_id, [])
+        window = self._window(session_id)
+        start = next(i for i, run in enumerate(runs) if run is window[0]) if window else len(runs) - 1
+        dropped = {id(run) for run in folded} | {id(run) for run in runs[:start] if _skipped(run)}
+        if dropped:
+            self.runs[session_id] = [run for run in runs if id(run) not in dropped]
+
+
+def _skipped(run) -> bool:
+    """Whether a run is left out of the history: paused, cancelled or failed."""
+    return getattr(run, "status", None) in (RunStatus.paused, RunStatus.cancelled, RunStatus.error)
+
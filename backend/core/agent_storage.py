@@ -0,0 +1,130 @@
+"""Storage of agent run history.
+
+The agents used to give every chat session its own agno ``SqliteStorage``
+table, ``session_{id}``, in the application database. Thousands of tables
+bloat the SQLite schema, which every new connection parses, and were never
+cleaned up. All run history now lives in one table, ``STORAGE_TABLE``,
+whose primary key is the chat session id, in a database file of its own.
+"""
+
+import logging
+from contextlib import nullcontext
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+from agno.storage.sqlite import SqliteStorage
+from sqlalchemy import event, func, inspect, select, text
+from sqlalchemy.engine import Connection, Engine
+
+from config.agents import agent_config
+from models.types import enable_incremental_vacuum
+
+logger = logging.getLogger(__name__)
+
+# Prefix of the per-session tables created by older versions
+LEGACY_TABLE_PREFIX = "session_"
+
+# One storage, and so one connection pool, per mode for the whole process
+_storages: Dict[str, SqliteStorage] = {}
+
+
+def agent_storage(mode: str = "agent") -> SqliteStorage:
+    """Return the agno storage holding the run history of every chat session.
+
+    Agents using it must be created with ``session_id`` set to the chat
+    session id, which is the key of their row.
+    """
+    storage = _storages.get(mode)
+    if storage is None:
+        # Not ``db_engine``: agno 1.7 replaces it with an in-memory database
+        storage = _storages[mode] = SqliteStorage(
+            table_name=agent_config.STORAGE_TABLE,
+            db_file=agent_config.STORAGE_DB,
+            mode=mode,
+        )
+        event.listen(storage.db_engine, "connect", enable_incremental_vacuum)
+        storage.db_engine.dispose()  # agno already opened a connection without it
+    return storage
+
+
+def delete_agent_history(session_ids: Sequence[str]) -> int:
+    """Delete the run history of chat sessions; returns the number of rows deleted."""
+    storage = agent_storage()
+    table = storage.table
+    with storage.db_engine.begin() as conn:
+        if not session_ids or not inspect(conn).has_table(table.name):
+            return 0
+        return conn.execute(table.delete().where(table.c.session_id.in_(session_ids))).rowcount
+
+
+# Columns every agno storage table has, and no application table
+AGNO_COLUMNS = {"session_id", "memory", "session_data", "extra_data"}
+
+
+def agent_history_session_ids(updated_before: int) -> List[str]:
+    """Ids of the sessions whose run history was last written before ``updated_before`` (epoch seconds)."""
+    storage = agent_storage()
+    table = storage.table
+    with storage.db_engine.connect() as conn:
+        if not inspect(conn).has_table(table.name):
+            return []
+        updated = func.coalesce(table.c.updated_at, table.c.created_at)
+        return list(conn.execute(select(table.c.session_id).where(updated < updated_before)).scalars())
+
+
+def legacy_session_tables(conn: Connection) -> List[str]:
+    """Names of the per-session agno tables in the database of ``conn``."""
+    names = conn.execute(text(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE 'session\\_%' ESCAPE '\\'"
+    )).scalars().all()
+    inspector = inspect(conn)
+    return [
+        name for name in names
+        if AGNO_COLUMNS <= {col["name"] for col in inspector.get_columns(name)}
+    ]
+
+
+def _same_database(conn: Connection, engine: Engine) -> bool:
+    database = conn.engine.url.database
+    return bool(database) and Path(database).resolve() == Path(engine.url.database)
+
+
+def consolidate_legacy_tables(conn: Connection, tables: Optional[Sequence[str]] = None) -> int:
+    """Move the per-session agno tables of ``conn``'s database into agent storage.
+
+    Each table holds the rows of the runs made in one chat session, under
+    ids agno generated per run: the latest one becomes the session's row.
+    Sessions that already have a row keep it. The legacy tables are dropped
+    with ``conn``'s transaction. Returns the number of tables consolidated.
+    """
+    if tables is None:
+        tables = legacy_session_tables(conn)
+    if not tables:
+        return 0
+    storage = agent_storage()
+    # With both in one file, a second connection would wait on ``conn``'s lock
+    same_database = _same_database(conn, storage.db_engine)
+    with nullcontext(conn) if same_database else storage.db_engine.begin() as target:
+        storage.table.create(target, checkfirst=True)
+        columns = {column.name for column in storage.table.columns}
+        for name in tables:
+            legacy = [col["name"] for col in inspect(conn).get_columns(name) if col["name"] in columns]
+            row = conn.execute(text(
+                f'SELECT {", ".join(legacy)} FROM "{name}" '
+                "ORDER BY coalesce(updated_at, created_at) DESC LIMIT 1"
+            )).mappings().first()
+            if row is None:
+                continue
+            values = {**row, "session_id": name[len(LEGACY_TABLE_PREFIX):]}
+            # Copied as stored: binding JSON text to the JSON columns would encode it again
+            target.execute(
+                text(
+                    f'INSERT OR IGNORE INTO "{storage.table_name}" ({", ".join(values)}) '
+                    f'VALUES ({", ".join(":" + column for column in values)})'
+                ),
+                values,
+            )
+    for name in tables:
+        conn.execute(text(f'DROP TABLE "{name}"'))
+    logger.info(f"Consolidated {len(tables)} per-session agent tables into {storage.table_name}")
+    return len(tables)
@@ -0,0 +1,198 @@
+"""Server-side persistence of streamed workflow events.
+
+The agent generators stream NDJSON events to the browser. ``SessionEventWriter``
+tees those events into the session as they happen – buffering them and
+flushing every ``EVENT_FLUSH_EVERY`` events or ``EVENT_FLUSH_INTERVAL_MS``
+milliseconds – so the run history survives a closed tab and the client no
+longer has to PUT the whole session back afterwards. With the write-behind
+buffer enabled the records go through it, like the client's own writes, so
+neither can overwrite the other.
+"""
+
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional
+from uuid import uuid4
+
+from config.settings import settings
+from database_async import AsyncSessionLocal
+from .models import build_message
+from .repositories_async import AsyncSessionRepository
+from .session_cache import session_cache
+from .write_behind import SessionWriteBuffer, session_write_buffer
+
+logger = logging.getLogger(__name__)
+
+
+class SessionEventWriter:
+    """Buffered, asynchronous writer projecting stream events onto a session.
+
+    Events are mapped to the same records the frontend used to build:
+    ``content_chunk`` text accumulates into an assistant message, tool and
+    artifact events go to ``event_history`` and artifacts to ``artifacts``,
+    and workflow steps, with the tools called during them, to ``timeline``.
+    Timeline items are only appended, so a step is written once it completes
+    or the run ends.
+    """
+
+    def __init__(
+        self,
+        session_id: str,
+        flush_every: int = settings.EVENT_FLUSH_EVERY,
+        flush_interval_ms: int = settings.EVENT_FLUSH_INTERVAL_MS,
+        session_factory=AsyncSessionLocal,
+        write_buffer: Optional[SessionWriteBuffer] = session_write_buffer,
+    ):
+        self.session_id = session_id
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval_ms / 1000
+        self.session_factory = session_factory
+        self.write_buffer = write_buffer
+
+        self._messages: List[Dict[str, Any]] = []
+        self._events: List[Dict[str, Any]] = []
+        self._timeline: List[Dict[str, Any]] = []
+        self._artifacts: List[Dict[str, Any]] = []
+        self._steps: List[Dict[str, Any]] = []  # started and not completed yet
+        self._values: Dict[str, Any] = {}
+        self._assistant_content = ""
+        self._lock = asyncio.Lock()
+        self._timer: Optional[asyncio.Task] = None
+
+    @property
+    def pending(self) -> int:
+        """Number of buffered records waiting to be flushed."""
+        return len(self._messages) + len(self._events) + len(self._timeline) + len(self._artifacts)
+
+    async def start(self, query: str) -> None:
+        """Record the user query that starts a run and begin periodic flushing."""
+        async with self.session_factory() as db:
+            messages = await AsyncSessionRepository(db).find_items(self.session_id, "messages")
+        if messages is None:
+            logger.warning(f"Session {self.session_id} not found; stream events will not be persisted")
+        else:
+            last = messages[-1] if messages else {}
+            # The first run's query is stored when the session is created
+            if not (last.get("type") == "user" and last.get("content") == query):
+                self._messages.append(build_message("user", query))
+            self._values["status"] = "running"
+        self._timer = asyncio.create_task(self._flush_periodically())
+
+    async def record(self, event: Dict[str, Any]) -> None:
+        """Project one stream event into buffered session records."""
+        event_type = event.get("type")
+        timestamp = event.get("timestamp") or datetime.utcnow().isoformat()
+
+        if event_type == "content_chunk":
+            self._assistant_content += event.get("content", "")
+            self._events.append(self._event("content_chunk", timestamp, content=event.get("content", "")))
+        elif event_type == "tool_called":
+            self._events.append(self._event(
+                "toolCall", timestamp, name=event.get("tool"), toolType="default",
+                input=event.get("input"), status="running"
+            ))
+            if self._steps:
+                self._steps[-1]["tool_calls"].append({"type": "tool", "name": event.get("tool")})
+        elif event_type == "tool_completed":
+            self._events.append(self._event(
+                "toolCall", timestamp, name=event.get("tool"), toolType="default",
+                output=event.get("output"), status="completed"
+            ))
+            self._close_assistant_message()
+        elif event_type == "artifact":
+            artifact = event.get("artifact") or {}
+            self._artifacts.append(artifact)
+            self._events.append(self._event(
+                "artifact", timestamp, title=artifact.get("title"),
+                content=artifact.get("content"), artifact_type=artifact.get("type")
+            ))
+        elif event_type == "step_started":
+            self._steps.append({"step": event.get("step_name"), "status": "running", "timestamp": timestamp, "tool_calls": []})
+        elif event_type == "step_completed":
+            step = next((step for step in self._steps if step["step"] == event.get("step_name")), None)
+            if step is not None:
+                self._steps.remove(step)
+                self._timeline.append({**step, "status": "completed", "timestamp": timestamp})
+        elif event_type == "workflow_completed":
+            self._values["status"] = "completed"
+        elif event_type == "error":
+            self._messages.append(build_message("system", f"Error: {event.get('error')}"))
+            self._values["status"] = "failed"
+
+        if self.pending >= self.flush_every:
+            await self.flush()
+
+    async def flush(self) -> None:
+        """Write all buffered records to the session in one transaction."""
+        async with self._lock:
+            if not self.pending and not self._values:
+                return
+            items = {"messages": self._messages, "event_history": self._events, "timeline": self._timeline}
+            artifacts, values = self._artifacts, self._values
+            self._messages, self._events, self._timeline, self._artifacts, self._values = [], [], [], [], {}
+            try:
+                await self._write(items, artifacts, values)
+            except Exception as e:
+                logger.error(f"Failed to persist events for session {self.session_id}: {e}")
+            finally:
+                if session_cache is not None:
+                    session_cache.invalidate(self.session_id)
+
+    async def _write(self, items: Dict[str, List[Dict[str, Any]]], artifacts: List[Dict[str, Any]], values: Dict[str, Any]) -> None:
+        if self.write_buffer is None:
+            async with self.session_factory() as db:
+                await AsyncSessionRepository(db).append(self.session_id, items, artifacts=artifacts, **values)
+            return
+        # Coalesced with the client's pending writes, in the order they were accepted
+        for name, new_items in {**items, "artifacts": artifacts}.items():
+            if new_items:
+                await self.write_buffer.append(self.session_id, name, new_items)
+        if values:
+            await self.write_buffer.update(self.session_id, values)
+
+    async def close(self, failed: bool = False) -> None:
+        """Stop periodic flushing and commit the final state of the run."""
+        if self._timer:
+            self._timer.cancel()
+        self._close_assistant_message()
+        # Steps still running when the run ends are kept as they are
+        self._timeline.extend(self._steps)
+        self._steps = []
+        if failed and self._values.get("status") != "completed":
+            self._values["status"] = "failed"
+        await self.flush()
+
+    async def _flush_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def _close_assistant_message(self) -> None:
+        if self._assistant_content:
+            self._messages.append(build_message("assistant", self._assistant_content))
+            self._assistant_content = ""
+
+    @staticmethod
+    def _event(event_type: str, timestamp: str, **fields: Any) -> Dict[str, Any]:
+        return {"id": str(uuid4()), "type": event_type, "timestamp": timestamp, **fields}
+
+
+async def tee_session_events(
+    session_id: str, query: str, events: AsyncIterator[Dict[str, Any]]
+) -> AsyncIterator[Dict[str, Any]]:
+    """Yield ``events`` unchanged while persisting them to the session."""
+    writer = SessionEventWriter(session_id)
+    await writer.start(query)
+    failed = False
+    try:
+        async for event in events:
+            await writer.record(event)
+            yield event
+    except BaseException:
+        # Includes cancellation when the client disconnects mid-run
+        failed = True
+        raise
+    finally:
+        # Shielded so a client disconnect cannot cancel the final commit
+        await asyncio.shield(writer.close(failed=failed))
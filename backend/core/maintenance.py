@@ -0,0 +1,310 @@
+"""Background garbage collection and compaction of the databases.
+
+Deleting a session also deletes its agent run history, but data can still
+be left without a session: per-session agno tables and history of sessions
+deleted by older versions, rows of a process that died between two writes,
+and content-addressed artifact blobs that outlived the last session
+referring to them. ``StorageMaintenance`` periodically finds such data and
+removes it in small transactions, so writers never wait long on the lock,
+then hands free pages back to the OS and refreshes planner statistics.
+"""
+
+import asyncio
+import logging
+import sqlite3
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import DateTime, bindparam, text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from config.settings import settings
+from database_async import AsyncSessionLocal, engine
+from models.db_models import SESSION_ITEM_MODELS, SessionSearchDocModel
+from .agent_storage import (
+    LEGACY_TABLE_PREFIX,
+    agent_history_session_ids,
+    agent_storage,
+    consolidate_legacy_tables,
+    delete_agent_history,
+    legacy_session_tables,
+)
+
+logger = logging.getLogger(__name__)
+
+# Tables whose rows belong to a session through their ``session_id``
+SESSION_ROW_TABLES = [model.__tablename__ for model in SESSION_ITEM_MODELS.values()] + [
+    SessionSearchDocModel.__tablename__
+]
+
+# Pause between two batches, letting queued writers take the database lock
+BATCH_PAUSE_SECONDS = 0.05
+
+# Keys listed per kind of orphaned data in reports
+REPORT_SAMPLE_SIZE = 20
+
+AUTO_VACUUM_MODES = {0: "none", 1: "full", 2: "incremental"}
+
+# Blobs no session artifact refers to. Deletes check it again, in the same
+# statement, as a session may have started sharing the blob meanwhile
+_UNREFERENCED_BLOB = (
+    "hash NOT IN (SELECT json_extract(artifact.value, '$.content_hash') "
+    "FROM sessions, json_each(coalesce(sessions.artifacts, '[]')) AS artifact "
+    "WHERE json_extract(artifact.value, '$.content_hash') IS NOT NULL)"
+)
+
+
+def database_stats(path: str) -> Dict[str, Any]:
+    """Size and free space of the SQLite database at ``path``."""
+    conn = sqlite3.connect(path)
+    try:
+        return _stats(conn)
+    finally:
+        conn.close()
+
+
+def compact_database(path: str, pages: int) -> Dict[str, Any]:
+    """Hand up to ``pages`` free pages back to the OS and refresh planner statistics.
+
+    Free pages are only released by databases created with
+    ``auto_vacuum = INCREMENTAL``; older ones need a full ``VACUUM`` once.
+    """
+    conn = sqlite3.connect(path, timeout=30)
+    try:
+        before = _stats(conn)
+        if before["auto_vacuum"] == "incremental" and pages > 0:
+            # Each step of the pragma frees one page, and execute() only
+            # takes the first step: executescript() runs it to completion
+            conn.executescript(f"PRAGMA incremental_vacuum({int(pages)});")
+        conn.executescript("PRAGMA analysis_limit = 400; ANALYZE;")
+        after = _stats(conn)
+    finally:
+        conn.close()
+    return {**after, "freed_pages": before["freelist_count"] - after["freelist_count"]}
+
+
+def _stats(conn: sqlite3.Connection) -> Dict[str, Any]:
+    def pragma(name: str) -> int:
+        return conn.execute(f"PRAGMA {name}").fetchone()[0]
+
+    page_size = pragma("page_size")
+    page_count = pragma("page_count")
+    return {
+        "auto_vacuum": AUTO_VACUUM_MODES.get(pragma("auto_vacuum"), "unknown"),
+        "page_size": page_size,
+        "page_count": page_count,
+        "freelist_count": pragma("freelist_count"),
+        "size_bytes": page_size * page_count,
+    }
+
+
+@dataclass
+class MaintenanceMetrics:
+    """Counters describing what the maintenance job removed."""
+    runs: int = 0
+    failed_runs: int = 0
+    removed: Dict[str, int] = field(default_factory=dict)
+    freed_pages: int = 0
+    last_run: Optional[datetime] = None
+    last_run_seconds: float = 0.0
+
+    def record_run(self, report: Dict[str, Any]) -> None:
+        self.runs += 1
+        for kind, count in report["removed"].items():
+            self.removed[kind] = self.removed.get(kind, 0) + count
+        self.freed_pages += sum(db["freed_pages"] for db in report["databases"].values())
+        self.last_run = datetime.utcnow()
+        self.last_run_seconds = report["seconds"]
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "runs": self.runs,
+            "failed_runs": self.failed_runs,
+            "removed": dict(self.removed),
+            "freed_pages": self.freed_pages,
+            "last_run": self.last_run.isoformat() if self.last_run else None,
+            "last_run_seconds": self.last_run_seconds,
+        }
+
+
+class StorageMaintenance:
+    """Periodic removal of orphaned data followed by incremental VACUUM and ANALYZE.
+
+    Orphaned data, by kind:
+
+    - ``agent_tables``: per-session agno tables of deleted sessions, dropped.
+    - ``legacy_agent_tables``: per-session agno tables of live sessions,
+      moved into agent storage.
+    - ``agent_sessions``: agent run history of deleted sessions.
+    - ``session_messages``, ``session_timeline``, ``session_events`` and
+      ``session_search_docs``: rows of deleted sessions, by session id.
+    - ``artifact_blobs``: blobs no session refers to.
+
+    Nothing written less than ``grace_seconds`` ago is collected. Child rows
+    carry no date: they are collected once earlier runs have seen them
+    orphaned for ``grace_seconds``.
+    """
+
+    def __init__(
+        self,
+        interval_seconds: float = settings.MAINTENANCE_INTERVAL_SECONDS,
+        batch_size: int = settings.MAINTENANCE_BATCH_SIZE,
+        grace_seconds: float = settings.MAINTENANCE_GRACE_SECONDS,
+        vacuum_pages: int = settings.MAINTENANCE_VACUUM_PAGES,
+        session_factory=AsyncSessionLocal,
+        database_path: str = engine.url.database,
+    ):
+        self.interval = interval_seconds
+        self.batch_size = batch_size
+        self.grace = grace_seconds
+        self.vacuum_pages = vacuum_pages
+        self.session_factory = session_factory
+        self.database_path = database_path
+        self.metrics = MaintenanceMetrics()
+
+        self._lock = asyncio.Lock()
+        self._timer: Optional[asyncio.Task] = None
+        # (table, session id) -> when its rows were first seen orphaned
+        self._orphan_rows_seen: Dict[Tuple[str, str], float] = {}
+
+    async def start(self) -> None:
+        """Begin running maintenance every ``interval_seconds``."""
+        if self._timer is None or self._timer.done():
+            self._timer = asyncio.create_task(self._run_periodically())
+
+    async def close(self) -> None:
+        """Stop periodic maintenance; a run in progress is cancelled between batches."""
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+
+    async def report(self) -> Dict[str, Any]:
+        """Report what a run would remove, without changing anything."""
+        return await self.run(dry_run=True)
+
+    async def run(self, dry_run: bool = False) -> Dict[str, Any]:
+        """Remove orphaned data, then compact and analyze both databases."""
+        async with self._lock:
+            start = time.perf_counter()
+            async with self.session_factory() as db:
+                orphans = await self._find_orphans(await db.connection())
+            report: Dict[str, Any] = {
+                "dry_run": dry_run,
+                "orphans": {
+                    kind: {"count": len(keys), "sample": keys[:REPORT_SAMPLE_SIZE]}
+                    for kind, keys in orphans.items()
+                },
+            }
+            if dry_run:
+                report["databases"] = await self._database_stats()
+                return report
+            report["removed"] = {kind: await self._remove(kind, keys) for kind, keys in orphans.items() if keys}
+            report["databases"] = await self._compact()
+            report["seconds"] = round(time.perf_counter() - start, 3)
+            self.metrics.record_run(report)
+            logger.info(f"Storage maintenance removed {report['removed'] or 'nothing'} in {report['seconds']} s")
+            return report
+
+    async def _find_orphans(self, conn: AsyncConnection) -> Dict[str, List[str]]:
+        orphans: Dict[str, List[str]] = {}
+
+        legacy = await conn.run_sync(legacy_session_tables)
+        deleted = await self._missing_sessions(conn, (name[len(LEGACY_TABLE_PREFIX):] for name in legacy))
+        orphans["agent_tables"] = [name for name in legacy if name[len(LEGACY_TABLE_PREFIX):] in deleted]
+        orphans["legacy_agent_tables"] = [name for name in legacy if name[len(LEGACY_TABLE_PREFIX):] not in deleted]
+
+        history = await asyncio.to_thread(agent_history_session_ids, int(time.time() - self.grace))
+        orphans["agent_sessions"] = sorted(await self._missing_sessions(conn, history))
+
+        now, seen = time.monotonic(), {}
+        for table in SESSION_ROW_TABLES:
+            result = await conn.execute(text(
+                f"SELECT DISTINCT session_id FROM {table} WHERE session_id NOT IN (SELECT id FROM sessions)"
+            ))
+            for session_id in result.scalars():
+                seen[table, session_id] = self._orphan_rows_seen.get((table, session_id), now)
+            orphans[table] = [
+                session_id for (kind, session_id), since in seen.items() if kind == table and now - since >= self.grace
+            ]
+        self._orphan_rows_seen = seen
+
+        query = text(f"SELECT hash FROM artifact_blobs WHERE created_date < :cutoff AND {_UNREFERENCED_BLOB}")
+        result = await conn.execute(
+            query.bindparams(bindparam("cutoff", type_=DateTime)),
+            {"cutoff": datetime.utcnow() - timedelta(seconds=self.grace)},
+        )
+        orphans["artifact_blobs"] = list(result.scalars())
+        return orphans
+
+    @staticmethod
+    async def _missing_sessions(conn: AsyncConnection, session_ids: Iterable[str], chunk: int = 500) -> Set[str]:
+        """The ``session_ids`` that have no session row."""
+        missing: Set[str] = set()
+        session_ids = list(session_ids)
+        query = text("SELECT id FROM sessions WHERE id IN :ids").bindparams(bindparam("ids", expanding=True))
+        for start in range(0, len(session_ids), chunk):
+            ids = session_ids[start:start + chunk]
+            existing = set((await conn.execute(query, {"ids": ids})).scalars())
+            missing.update(id for id in ids if id not in existing)
+        return missing
+
+    async def _remove(self, kind: str, keys: List[str]) -> int:
+        removed = 0
+        for start in range(0, len(keys), self.batch_size):
+            removed += await self._remove_batch(kind, keys[start:start + self.batch_size])
+            await asyncio.sleep(BATCH_PAUSE_SECONDS)
+        return removed
+
+    async def _remove_batch(self, kind: str, keys: List[str]) -> int:
+        """Remove one batch of orphaned data in its own transaction."""
+        if kind == "agent_sessions":
+            return await asyncio.to_thread(delete_agent_history, keys)
+        async with self.session_factory() as db:
+            conn = await db.connection()
+            if kind == "agent_tables":
+                for name in keys:
+                    await conn.execute(text(f'DROP TABLE IF EXISTS "{name}"'))
+                removed = len(keys)
+            elif kind == "legacy_agent_tables":
+                removed = await conn.run_sync(consolidate_legacy_tables, keys)
+            elif kind == "artifact_blobs":
+                query = text(f"DELETE FROM artifact_blobs WHERE hash IN :keys AND {_UNREFERENCED_BLOB}")
+                result = await conn.execute(query.bindparams(bindparam("keys", expanding=True)), {"keys": keys})
+                removed = result.rowcount
+            else:
+                query = text(
+                    f"DELETE FROM {kind} WHERE session_id IN :keys AND session_id NOT IN (SELECT id FROM sessions)"
+                )
+                result = await conn.execute(query.bindparams(bindparam("keys", expanding=True)), {"keys": keys})
+                removed = result.rowcount
+            await db.commit()
+        return removed
+
+    def _databases(self) -> Dict[str, str]:
+        return {"app": self.database_path, "agent_storage": agent_storage().db_engine.url.database}
+
+    async def _compact(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            name: await asyncio.to_thread(compact_database, path, self.vacuum_pages)
+            for name, path in self._databases().items()
+        }
+
+    async def _database_stats(self) -> Dict[str, Dict[str, Any]]:
+        return {name: await asyncio.to_thread(database_stats, path) for name, path in self._databases().items()}
+
+    async def _run_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run()
+            except Exception as e:
+                self.metrics.failed_runs += 1
+                logger.error(f"Storage maintenance failed: {e}")
+
+
+# Process-wide maintenance job started with the app; ``None`` when disabled
+storage_maintenance: Optional[StorageMaintenance] = (
+    StorageMaintenance() if settings.MAINTENANCE_INTERVAL_SECONDS > 0 else None
+)
@@ -1,17 +1,65 @@
 """Core domain models."""
 
-from typing import Dict, List, Optional, Any
+import hashlib
+from typing import Dict, List, Optional, Any, Tuple
 from datetime import datetime
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, computed_field
 from uuid import UUID, uuid4
 
 
+# Maximum length of the last message preview shown in session lists
+MESSAGE_PREVIEW_LENGTH = 200
+
+
+def build_message(message_type: str, content: str, metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Build a session message record."""
+    return {
+        "id": str(uuid4()),
+        "type": message_type,
+        "content": content,
+        "timestamp": datetime.utcnow().isoformat(),
+        "metadata": metadata or {}
+    }
+
+
+def is_chart_artifact(artifact: Dict[str, Any]) -> bool:
+    """Whether an artifact holds a chart."""
+    return (
+        artifact.get("type") == "chart"
+        or bool(artifact.get("chart"))
+        or "chart-container" in str(artifact.get("content") or "")
+    )
+
+
+def externalize_artifact(artifact: Dict[str, Any]) -> Tuple[Dict[str, Any], Optional[Dict[str, Any]]]:
+    """Split an artifact into a reference and the content-addressed blob of its content.
+    
+    The reference keeps every field but ``content``, which is replaced by its
+    SHA-256 ``content_hash`` and ``size``. Artifacts without inline text
+    content are already references and are returned with no blob.
+    """
+    content = artifact.get("content")
+    if not isinstance(content, str):
+        return artifact, None
+    data = content.encode("utf-8")
+    digest = hashlib.sha256(data).hexdigest()
+    ref = {key: value for key, value in artifact.items() if key != "content"}
+    ref.update(content_hash=digest, size=len(data))
+    media_type = "text/markdown"
+    if is_chart_artifact(artifact):
+        # Remember that the content is a chart now that it is no longer inline
+        ref["chart"] = True
+        media_type = "text/html"
+    return ref, {"hash": digest, "content": content, "size": len(data), "media_type": media_type}
+
+
 class BaseEntity(BaseModel):
     """Base entity with common fields."""
     
     id: str = Field(default_factory=lambda: str(uuid4()))
     created_date: datetime = Field(default_factory=datetime.utcnow)
     updated_date: datetime = Field(default_factory=datetime.utcnow)
+    version: int = 1
     
     class Config:
         orm_mode = True
@@ -54,19 +102,40 @@ class Session(BaseEntity):
     event_history: List[Dict[str, Any]] = Field(default_factory=list)
     data: Dict[str, Any] = Field(default_factory=dict)
     
+    # Summary counters, persisted alongside the session for cheap list views
+    @computed_field
+    @property
+    def message_count(self) -> int:
+        """Number of messages in the session."""
+        return len(self.messages)
+    
+    @computed_field
+    @property
+    def artifact_count(self) -> int:
+        """Number of artifacts in the session."""
+        return len(self.artifacts)
+    
+    @computed_field
+    @property
+    def last_message_preview(self) -> Optional[str]:
+        """Truncated content of the most recent message."""
+        if not self.messages:
+            return None
+        content = self.messages[-1].get("content") or ""
+        return str(content)[:MESSAGE_PREVIEW_LENGTH]
+    
+    @computed_field
+    @property
+    def has_chart(self) -> bool:
+        """Whether any artifact holds a chart."""
+        return any(is_chart_artifact(artifact) for artifact in self.artifacts)
+    
     def add_message(self, message_type: str, content: str, metadata: Optional[Dict[str, Any]] = None) -> str:
         """Add a message to the session."""
-        message_id = str(uuid4())
-        message = {
-            "id": message_id,
-            "type": message_type,
-            "content": content,
-            "timestamp": datetime.utcnow().isoformat(),
-            "metadata": metadata or {}
-        }
+        message = build_message(message_type, content, metadata)
         self.messages.append(message)
         self.updated_date = datetime.utcnow()
-        return message_id
+        return message["id"]
     
     def add_artifact(self, artifact_type: str, title: str, content: str, metadata: Optional[Dict[str, Any]] = None) -> str:
         """Add an artifact to the session."""
@@ -84,6 +153,55 @@ class Session(BaseEntity):
         return artifact_id
 
 
+class SessionSummary(BaseModel):
+    """Lightweight session read model for list views, without the JSON blobs."""
+    
+    id: str
+    title: Optional[str] = None
+    description: Optional[str] = None
+    droid_type: str = "auto"
+    status: str = "running"
+    context_entity: Optional[str] = None
+    is_pinned: bool = False
+    access_level: str = "public"
+    user_id: Optional[str] = None
+    message_count: int = 0
+    artifact_count: int = 0
+    last_message_preview: Optional[str] = None
+    has_chart: bool = False
+    created_date: datetime
+    updated_date: datetime
+    version: int = 1
+
+
+class SessionVersion(BaseModel):
+    """Version of a session, read from its row alone to validate cached copies."""
+    
+    id: str
+    version: int = 1
+    access_level: str = "public"
+    created_date: datetime
+    updated_date: datetime
+
+
+class SessionSearchResult(SessionSummary):
+    """Session summary matched by a full-text search."""
+    
+    matched: str  # "title", "message" or "artifact"
+    snippet: str  # HTML-escaped excerpt with matches wrapped in <mark>
+    score: float  # BM25 relevance, higher is better
+
+
+class ArtifactBlob(BaseModel):
+    """Immutable artifact content addressed by its SHA-256 hash."""
+    
+    hash: str
+    content: str
+    size: int
+    media_type: str = "text/markdown"
+    created_date: Optional[datetime] = None
+
+
 class Account(BaseEntity):
     """Account domain model."""
     
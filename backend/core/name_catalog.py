@@ -0,0 +1,331 @@
+"""In-memory catalog of CRM record names for typeahead.
+
+The ``/…/names`` routes used to run ``SELECT Name FROM <object>`` without a
+limit on every call and return the whole list. ``NameCatalog`` loads the
+Ids and names of ``CATALOG_OBJECTS`` once at startup, then every
+``CATALOG_REFRESH_SECONDS`` fetches only the records whose
+``SystemModstamp`` moved. Deleted records are not visible to that query:
+a full reload of the object every ``CATALOG_FULL_RELOAD_SECONDS`` drops
+them. An object failing to load is retried on the next refresh without
+holding up the others.
+
+Each object is indexed for search without touching the org:
+
+- sorted full names and sorted name words, searched by prefix with bisect;
+- a trigram index, used for fuzzy matches when prefixes don't fill
+  ``limit``.
+"""
+
+import asyncio
+import logging
+import math
+import re
+import time
+import unicodedata
+from bisect import bisect_left, insort
+from dataclasses import dataclass, field
+from itertools import islice
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from config.settings import settings
+from utils.salesforce_async_client import AsyncSalesforceClient
+
+logger = logging.getLogger(__name__)
+
+# Fuzzy matches need at least this share of trigrams in common (Jaccard)
+FUZZY_MIN_SIMILARITY = 0.3
+
+# Names scored per fuzzy search, bounding its cost when trigrams are common
+FUZZY_MAX_CANDIDATES = 250
+
+_WORD = re.compile(r"\w+")
+
+
+def normalize_name(name: str) -> str:
+    """Case- and accent-insensitive form of a name, words separated by one space."""
+    decomposed = unicodedata.normalize("NFKD", name.casefold())
+    return " ".join(_WORD.findall("".join(c for c in decomposed if not unicodedata.combining(c))))
+
+
+def trigrams(normalized: str) -> Set[str]:
+    padded = f"  {normalized} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def soql_datetime(modstamp: str) -> str:
+    """A ``SystemModstamp`` value as a SOQL datetime literal, to the second."""
+    return datetime.fromisoformat(modstamp).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class _ObjectIndex:
+    """Names of one sObject with their prefix and trigram indexes."""
+
+    def __init__(self):
+        self.names: Dict[str, str] = {}  # Id -> name
+        self.modstamp: Optional[str] = None  # latest SystemModstamp seen
+        self._normalized: Dict[str, str] = {}
+        self._full: List[Tuple[str, str]] = []  # sorted (normalized name, Id)
+        self._words: List[Tuple[str, str]] = []  # sorted (normalized word, Id)
+        self._trigrams: Dict[str, Set[str]] = {}
+        self._trigram_counts: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def load(self, records: Iterable[Dict[str, Any]]) -> None:
+        """Fill an empty index, sorting once rather than inserting in order."""
+        for record in records:
+            self._track_modstamp(record)
+            if record.get("Id") and record.get("Name"):
+                self._add(record["Id"], record["Name"], keep_sorted=False)
+        self._full.sort()
+        self._words.sort()
+
+    def upsert(self, records: Iterable[Dict[str, Any]]) -> int:
+        """Add or rename records; returns how many changed."""
+        count = 0
+        for record in records:
+            self._track_modstamp(record)
+            record_id, name = record.get("Id"), record.get("Name")
+            if not record_id or self.names.get(record_id) == name:
+                continue
+            self.remove(record_id)
+            if name:
+                self._add(record_id, name)
+            count += 1
+        return count
+
+    def _track_modstamp(self, record: Dict[str, Any]) -> None:
+        # Salesforce formats every timestamp alike, so they sort as text
+        modstamp = record.get("SystemModstamp")
+        if modstamp and (self.modstamp is None or modstamp > self.modstamp):
+            self.modstamp = modstamp
+
+    def _add(self, record_id: str, name: str, keep_sorted: bool = True) -> None:
+        add = insort if keep_sorted else list.append
+        normalized = normalize_name(name)
+        self.names[record_id] = name
+        self._normalized[record_id] = normalized
+        add(self._full, (normalized, record_id))
+        for word in set(normalized.split()):
+            add(self._words, (word, record_id))
+        grams = trigrams(normalized)
+        for gram in grams:
+            self._trigrams.setdefault(gram, set()).add(record_id)
+        self._trigram_counts[record_id] = len(grams)
+
+    def remove(self, record_id: str) -> None:
+        if record_id not in self.names:
+            return
+        del self.names[record_id]
+        normalized = self._normalized.pop(record_id)
+        self._discard(self._full, (normalized, record_id))
+        for word in set(normalized.split()):
+            self._discard(self._words, (word, record_id))
+        for gram in trigrams(normalized):
+            ids = self._trigrams.get(gram)
+            if ids is not None:
+                ids.discard(record_id)
+                if not ids:
+                    del self._trigrams[gram]
+        del self._trigram_counts[record_id]
+
+    @staticmethod
+    def _discard(entries: List[Tuple[str, str]], entry: Tuple[str, str]) -> None:
+        i = bisect_left(entries, entry)
+        if i < len(entries) and entries[i] == entry:
+            del entries[i]
+
+    def search(self, query: str, limit: int) -> List[Tuple[str, str]]:
+        """``(Id, match)`` of the best matches: whole-name prefixes, word prefixes, then fuzzy."""
+        matches: Dict[str, str] = {}
+        for entries, kind in ((self._full, "prefix"), (self._words, "word")):
+            i = bisect_left(entries, (query, ""))
+            while i < len(entries) and len(matches) < limit and entries[i][0].startswith(query):
+                matches.setdefault(entries[i][1], kind)
+                i += 1
+        if len(matches) < limit and len(query) >= 3:
+            for record_id in self._fuzzy(query, limit - len(matches), exclude=matches):
+                matches[record_id] = "fuzzy"
+        return list(matches.items())
+
+    def _fuzzy(self, query: str, limit: int, exclude: Dict[str, str]) -> List[str]:
+        grams = sorted(trigrams(query), key=lambda gram: len(self._trigrams.get(gram, ())))
+        postings = [self._trigrams.get(gram, set()) for gram in grams]
+        # A similar name shares at least ``min_common`` trigrams with the
+        # query, so it has one of the rarest ``len - min_common + 1``
+        min_common = math.ceil(FUZZY_MIN_SIMILARITY * len(grams))
+        candidates: Set[str] = set()
+        for ids in postings[:len(grams) - min_common + 1]:
+            candidates.update(islice(ids, FUZZY_MAX_CANDIDATES - len(candidates)))
+        scored = []
+        for record_id in candidates:
+            if record_id in exclude:
+                continue
+            common = sum(1 for ids in postings if record_id in ids)
+            similarity = common / (len(grams) + self._trigram_counts[record_id] - common)
+            if similarity >= FUZZY_MIN_SIMILARITY:
+                scored.append((-similarity, self._normalized[record_id], record_id))
+        scored.sort()
+        return [record_id for _, _, record_id in scored[:limit]]
+
+    def sorted_names(self) -> List[str]:
+        return [self.names[record_id] for _, record_id in self._full]
+
+
+@dataclass
+class NameCatalogMetrics:
+    """Counters describing catalog loads and searches."""
+    full_loads: int = 0  # per object
+    refreshes: int = 0
+    failed_refreshes: int = 0  # per object
+    updated_records: int = 0
+    searches: int = 0
+    last_refresh: Optional[datetime] = None
+    last_refresh_seconds: float = 0.0
+    records: Dict[str, int] = field(default_factory=dict)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "full_loads": self.full_loads,
+            "refreshes": self.refreshes,
+            "failed_refreshes": self.failed_refreshes,
+            "updated_records": self.updated_records,
+            "searches": self.searches,
+            "last_refresh": self.last_refresh.isoformat() if self.last_refresh else None,
+            "last_refresh_seconds": self.last_refresh_seconds,
+            "records": dict(self.records),
+        }
+
+
+class NameCatalog:
+    """Ids and names of CRM records, refreshed in the background and searchable in memory.
+
+    Queries go through a client of their own without the SOQL cache, which
+    would answer a full reload with the previous one.
+    """
+
+    def __init__(
+        self,
+        objects: List[str] = settings.CATALOG_OBJECTS,
+        refresh_seconds: float = settings.CATALOG_REFRESH_SECONDS,
+        full_reload_seconds: float = settings.CATALOG_FULL_RELOAD_SECONDS,
+        client: Optional[AsyncSalesforceClient] = None,
+    ):
+        self.objects = list(objects)
+        self.refresh_interval = refresh_seconds
+        self.full_reload_interval = full_reload_seconds
+        self.client = client or AsyncSalesforceClient(cache=None)
+        self.metrics = NameCatalogMetrics()
+
+        self._indexes: Dict[str, _ObjectIndex] = {}
+        self._object_names = {name.lower(): name for name in self.objects}
+        self._last_full_loads: Dict[str, float] = {}  # sObject -> time.monotonic() of its last full load
+        self._lock = asyncio.Lock()
+        self._timer: Optional[asyncio.Task] = None
+
+    def object_name(self, name: str) -> Optional[str]:
+        """Catalog spelling of an sObject name, or ``None`` if it is not in the catalog."""
+        return self._object_names.get(name.lower())
+
+    def is_loaded(self, object_name: str) -> bool:
+        return object_name in self._indexes
+
+    async def start(self) -> None:
+        """Load the catalog in the background, then keep it up to date."""
+        if self._timer is None or self._timer.done():
+            self._timer = asyncio.create_task(self._run_periodically())
+
+    async def close(self) -> None:
+        """Stop refreshing, cancelling a refresh in progress, and close the Salesforce client."""
+        timer, self._timer = self._timer, None
+        if timer:
+            timer.cancel()
+            await asyncio.gather(timer, return_exceptions=True)
+        await self.client.close()
+
+    async def refresh(self, full: bool = False) -> Dict[str, int]:
+        """Fetch names changed since the last refresh, or all of them; returns the records updated per object.
+
+        Objects never loaded, or not fully loaded for ``full_reload_interval``,
+        are loaded in full. An object that fails is logged and left out of
+        the result.
+        """
+        async with self._lock:
+            start = time.perf_counter()
+            updated = {}
+            for object_name in self.objects:
+                last_full_load = self._last_full_loads.get(object_name)
+                reload = full or last_full_load is None or time.monotonic() - last_full_load >= self.full_reload_interval
+                index = None if reload else self._indexes.get(object_name)
+                try:
+                    updated[object_name] = await self._refresh_object(object_name, index)
+                except Exception as e:
+                    self.metrics.failed_refreshes += 1
+                    logger.error(f"Refreshing {object_name} in the name catalog failed: {e}")
+                    continue
+                if index is None:
+                    self._last_full_loads[object_name] = time.monotonic()
+                    self.metrics.full_loads += 1
+            self.metrics.refreshes += 1
+            self.metrics.updated_records += sum(updated.values())
+            self.metrics.records = {name: len(index) for name, index in self._indexes.items()}
+            self.metrics.last_refresh = datetime.utcnow()
+            self.metrics.last_refresh_seconds = round(time.perf_counter() - start, 3)
+            return updated
+
+    async def _refresh_object(self, object_name: str, index: Optional[_ObjectIndex]) -> int:
+        soql = f"SELECT Id, Name, SystemModstamp FROM {object_name}"
+        if index is not None and index.modstamp:
+            # Seconds only: records of the last second seen are fetched again, which is harmless
+            soql += f" WHERE SystemModstamp >= {soql_datetime(index.modstamp)}"
+        result = await self.client.query(soql)
+        if not result.success:
+            raise RuntimeError(f"Loading {object_name} names failed: {result.error}")
+        if index is None:
+            # Built aside and swapped in, so searches never see a half-loaded object
+            index = _ObjectIndex()
+            index.load(result.data)
+            self._indexes[object_name] = index
+            return len(index)
+        return index.upsert(result.data)
+
+    def search(self, query: str, object_name: Optional[str] = None, limit: int = 10) -> List[Dict[str, str]]:
+        """Records whose name starts with, contains a word starting with, or resembles ``query``."""
+        self.metrics.searches += 1
+        normalized = normalize_name(query)
+        if not normalized:
+            return []
+        names = [object_name] if object_name else self.objects
+        matches = []
+        for name in names:
+            index = self._indexes.get(name)
+            if index is None:
+                continue
+            for record_id, match in index.search(normalized, limit):
+                matches.append({"id": record_id, "name": index.names[record_id], "object": name, "match": match})
+        if len(names) > 1:
+            rank = {"prefix": 0, "word": 1, "fuzzy": 2}
+            matches.sort(key=lambda match: rank[match["match"]])
+        return matches[:limit]
+
+    def names(self, object_name: str) -> Optional[List[str]]:
+        """All names of an sObject sorted, or ``None`` until it is loaded."""
+        index = self._indexes.get(object_name)
+        return index.sorted_names() if index is not None else None
+
+    async def _run_periodically(self) -> None:
+        delay = 0.0
+        while True:
+            await asyncio.sleep(delay)
+            delay = self.refresh_interval
+            try:
+                await self.refresh()
+            except Exception as e:
+                self.metrics.failed_refreshes += 1
+                logger.error(f"Refreshing the name catalog failed: {e}")
+
+
+# Process-wide catalog started with the app; ``None`` when disabled
+name_catalog: Optional[NameCatalog] = NameCatalog() if settings.CATALOG_REFRESH_SECONDS > 0 else None
@@ -7,10 +7,10 @@ from datetime import datetime
 from uuid import uuid4
 
 # Import domain models
-from .models import Session, User
+from .models import User
 
 # Import database models
-from models.db_models import SessionModel, UserModel
+from models.db_models import UserModel
 
 
 class BaseRepository(ABC):
@@ -40,72 +40,6 @@ class BaseRepository(ABC):
         pass
 
 
-class SessionRepository(BaseRepository):
-    """Repository for Session entities."""
-    
-    def find_by_id(self, session_id: str) -> Optional[Session]:
-        """Find a session by ID."""
-        db_session = self.db.query(SessionModel).filter(SessionModel.id == session_id).first()
-        if db_session:
-            return self._to_domain_model(db_session)
-        return None
-    
-    def find_all(self) -> List[Session]:
-        """Find all sessions."""
-        db_sessions = self.db.query(SessionModel).all()
-        return [self._to_domain_model(db_session) for db_session in db_sessions]
-    
-    def save(self, session: Session) -> Session:
-        """Save a session."""
-        db_session = self.db.query(SessionModel).filter(SessionModel.id == session.id).first()
-        
-        if db_session:
-            # Update existing session
-            for field, value in session.dict().items():
-                if hasattr(db_session, field):
-                    setattr(db_session, field, value)
-            db_session.updated_date = datetime.utcnow()
-        else:
-            # Create new session
-            db_session = SessionModel(**session.dict())
-            self.db.add(db_session)
-        
-        self.db.commit()
-        self.db.refresh(db_session)
-        return self._to_domain_model(db_session)
-    
-    def delete(self, session_id: str) -> bool:
-        """Delete a session by ID."""
-        db_session = self.db.query(SessionModel).filter(SessionModel.id == session_id).first()
-        if db_session:
-            self.db.delete(db_session)
-            self.db.commit()
-            return True
-        return False
-    
-    def _to_domain_model(self, db_session: SessionModel) -> Session:
-        """Convert database model to domain model."""
-        return Session(
-            id=db_session.id,
-            title=db_session.title,
-            description=db_session.description,
-            instruction=db_session.instruction,
-            droid_type=db_session.droid_type,
-            status=db_session.status,
-            context_entity=db_session.context_entity,
-            is_pinned=db_session.is_pinned,
-            access_level=db_session.access_level,
-            user_id=db_session.user_id,
-            created_date=db_session.created_date,
-            updated_date=db_session.updated_date,
-            messages=db_session.messages or [],
-            timeline=db_session.timeline or [],
-            artifacts=db_session.artifacts or [],
-            event_history=db_session.event_history or [],
-            data=db_session.data or {}
-        )
-
-
 class UserRepository(BaseRepository):
     """Repository for User entities."""
     
@@ -1,14 +1,127 @@
 """Async repository layer managing database interactions with SQLAlchemy."""
 
-from typing import Optional, List, Type, TypeVar
+import base64
+import html
+import json
+import re
+from typing import Any, Dict, Optional, List, Sequence, Tuple, Type, TypeVar
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, tuple_, update, delete, func, literal, literal_column, union_all, text, column, bindparam, Float, Integer, String
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import load_only, selectinload
 from datetime import datetime
-from .models import Session, User
-from models.db_models import SessionModel, UserModel
+import orjson
+from .models import (
+    Session, SessionSummary, SessionVersion, SessionSearchResult, ArtifactBlob, User,
+    MESSAGE_PREVIEW_LENGTH, externalize_artifact,
+)
+from .serialization import SESSION_DOCUMENT_FIELDS, json_array, splice_session_document
+from .session_patch import SessionPatch, JsonEdit, PatchError, PatchConflict, ITEM_FIELDS
+from models.db_models import SessionModel, UserModel, ArtifactBlobModel, SESSION_ITEM_MODELS
+from models.types import CompressedJSON
 
 T = TypeVar('T')
 
+# Columns that may be used for keyset pagination. Each one must be backed by a
+# composite ``(column, id)`` index on the table.
+SORTABLE_COLUMNS = ("updated_date", "created_date")
+
+
+# SQL fragments recomputing summary columns inside an UPDATE of ``sessions``;
+# they mirror ``is_chart_artifact`` and ``Session.last_message_preview``.
+_HAS_CHART_SQL = (
+    "EXISTS (SELECT 1 FROM json_each(sessions.artifacts) "
+    "WHERE json_extract(value, '$.type') = 'chart' OR json_extract(value, '$.chart') "
+    "OR instr(json_extract(value, '$.content'), 'chart-container') > 0)"
+)
+_LAST_MESSAGE_PREVIEW_SQL = (
+    f"(SELECT substr(json_extract(payload, '$.content'), 1, {MESSAGE_PREVIEW_LENGTH}) "
+    "FROM session_messages WHERE session_messages.session_id = sessions.id "
+    "ORDER BY seq DESC LIMIT 1)"
+)
+
+
+
+def _deflate(column, expr):
+    """Compress the result of ``expr`` if it is stored in a ``CompressedJSON`` column."""
+    return func.json_deflate(expr) if isinstance(column.type, CompressedJSON) else expr
+
+
+# Best match per session in the ``session_search`` FTS5 index; title matches
+# weigh double. ``doc_id`` is the matching document of the minimum rank.
+# The matches are materialized because FTS5 functions cannot run inside
+# the aggregate.
+_SEARCH_SQL = """
+WITH matches AS MATERIALIZED (
+    SELECT rowid, bm25(session_search) AS rank FROM session_search WHERE session_search MATCH :match
+)
+SELECT d.session_id AS session_id, d.kind AS kind, d.id AS doc_id,
+       min(matches.rank * CASE d.kind WHEN 'title' THEN 2.0 ELSE 1.0 END) AS rank
+FROM matches JOIN session_search_docs AS d ON d.id = matches.rowid
+GROUP BY d.session_id
+"""
+# Snippets are only built for the returned page. They are delimited with
+# control characters so they can be HTML-escaped before <mark> is added.
+_SNIPPET_SQL = (
+    "SELECT rowid, snippet(session_search, 0, char(2), char(3), '…', 16) FROM session_search "
+    "WHERE session_search MATCH :match AND rowid IN :doc_ids"
+)
+
+
+# JSON paths of a whole artifact and of its content, as built by ``SessionPatch``
+_ARTIFACT_PATH = re.compile(r'\$\[(?:\d+|#)\]')
+_ARTIFACT_CONTENT_PATH = re.compile(r'(\$\[\d+\])\."content"')
+
+
+def to_fts_query(query: str) -> str:
+    """Turn free text into an FTS5 query matching all words, the last one as a prefix.
+
+    Raises:
+        ValueError: If the query contains no searchable words.
+    """
+    words = re.findall(r"\w+", query)
+    if not words:
+        raise ValueError("Search query must contain at least one word")
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+def _highlight(snippet: str) -> str:
+    return html.escape(snippet or "").replace("\x02", "<mark>").replace("\x03", "</mark>")
+
+
+class ConcurrentUpdateError(Exception):
+    """Raised when a write is based on a stale ``version`` of an object."""
+    
+    def __init__(self, id: str, expected_version: int):
+        super().__init__(f"Object {id} was modified concurrently (expected version {expected_version})")
+        self.id = id
+        self.expected_version = expected_version
+
+
+def encode_cursor(sort_key: str, value: datetime, id: str) -> str:
+    """Encode the last row of a page as an opaque keyset cursor."""
+    payload = json.dumps({"k": sort_key, "v": value.isoformat(), "id": id})
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_key: str) -> Tuple[datetime, str]:
+    """Decode a keyset cursor into its ``(value, id)`` pair.
+
+    Raises:
+        ValueError: If the cursor is malformed or was issued for another sort key.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        value, id = datetime.fromisoformat(payload["v"]), str(payload["id"])
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+    if payload.get("k") != sort_key:
+        raise ValueError("Cursor does not match sort order")
+    return value, id
+
 
 class AsyncBaseRepository:
     """Base async repository with common CRUD operations."""
@@ -17,6 +130,21 @@ class AsyncBaseRepository:
         self.db_session = db_session
         self.model_class = model_class
         self.db_model_class = db_model_class
+        # When False the caller owns the transaction: writes are neither
+        # committed nor rolled back, so several can share one commit
+        self.autocommit = True
+    
+    async def _commit(self) -> None:
+        if self.autocommit:
+            await self.db_session.commit()
+    
+    async def _rollback(self) -> None:
+        if self.autocommit:
+            await self.db_session.rollback()
+    
+    def _load_options(self) -> list:
+        """Loader options needed to build a complete domain object."""
+        return []
     
     async def _to_domain(self, db_obj):
         """Convert database model to domain model."""
@@ -24,50 +152,201 @@ class AsyncBaseRepository:
             return None
         return self.model_class(**db_obj.__dict__)
     
-    async def _to_db(self, domain_obj):
-        """Convert domain model to database model."""
-        return self.db_model_class(**domain_obj.dict())
+    def _to_projection(self, db_obj, projection: Type[T]):
+        """Convert a partially loaded database model to a read model."""
+        return projection(**{field: getattr(db_obj, field) for field in projection.model_fields})
+    
+    def _row_values(self, obj) -> Dict[str, Any]:
+        """Column values of a domain object, ignoring fields that are not columns."""
+        columns = self.db_model_class.__table__.columns
+        return {key: value for key, value in obj.dict().items() if key in columns}
+    
+    async def _from_row(self, row, obj=None):
+        """Build a domain object from a ``RETURNING`` row of the table."""
+        return self.model_class(**row._mapping)
+    
+    async def _save_children(self, obj, inserted: bool) -> None:
+        """Hook persisting data stored outside the main table, inside ``save``'s transaction."""
     
     async def save(self, obj: T) -> T:
-        """Save or update an object."""
-        # Check if object already exists
-        existing = await self.db_session.execute(
-            select(self.db_model_class).where(self.db_model_class.id == obj.id)
-        )
-        existing_obj = existing.scalar_one_or_none()
-        
-        if existing_obj:
-            # Update existing object
-            for key, value in obj.dict().items():
-                if hasattr(existing_obj, key):
-                    setattr(existing_obj, key, value)
-            # Update the updated_date field
-            if hasattr(existing_obj, 'updated_date'):
-                existing_obj.updated_date = datetime.utcnow()
-            db_obj = existing_obj
-        else:
-            # Create new object
-            db_obj = await self._to_db(obj)
-            self.db_session.add(db_obj)
+        """Insert or update an object in a single round trip.
         
-        await self.db_session.commit()
-        await self.db_session.refresh(db_obj)
-        return await self._to_domain(db_obj)
+        The write is one ``INSERT ... ON CONFLICT DO UPDATE ... RETURNING``
+        statement guarded by the optimistic ``version`` column: an existing
+        row is only overwritten when its version still matches ``obj.version``.
+        
+        Raises:
+            ConcurrentUpdateError: If the stored row has a different version.
+        """
+        table = self.db_model_class.__table__
+        values = self._row_values(obj)
+        stmt = insert(table).values(**values)
+        changes = {
+            key: stmt.excluded[key] for key in values
+            if key not in ("id", "created_date", "version")
+        }
+        changes["version"] = table.c.version + 1
+        changes["updated_date"] = datetime.utcnow()
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.id],
+            set_=changes,
+            where=table.c.version == obj.version,
+        ).returning(*table.c)
+        
+        row = (await self.db_session.execute(stmt)).first()
+        if row is None:
+            await self._rollback()
+            raise ConcurrentUpdateError(obj.id, obj.version)
+        # An updated row has its version bumped; a fresh insert keeps ``obj.version``
+        await self._save_children(obj, inserted=row.version == obj.version)
+        await self._commit()
+        return await self._from_row(row, obj)
+    
+    async def _update_row(
+        self, id: str, changes: Dict[str, Any], expected_version: Optional[int], version_step: int = 1
+    ):
+        """Run a versioned ``UPDATE ... RETURNING`` without committing.
+        
+        ``version_step`` is added to the version, e.g. once per write when
+        several buffered writes are applied together.
+        
+        Returns:
+            The updated row, or ``None`` if the object does not exist.
+        
+        Raises:
+            ConcurrentUpdateError: If ``expected_version`` no longer matches.
+        """
+        table = self.db_model_class.__table__
+        conditions = [table.c.id == id]
+        if expected_version is not None:
+            conditions.append(table.c.version == expected_version)
+        values = {key: value for key, value in changes.items() if key in table.c and key != "version"}
+        values["version"] = table.c.version + version_step
+        values.setdefault("updated_date", datetime.utcnow())
+        row = (await self.db_session.execute(
+            update(table).where(*conditions).values(**values).returning(*table.c)
+        )).first()
+        if row is None:
+            await self._rollback()
+            if expected_version is not None and await self.exists(id):
+                raise ConcurrentUpdateError(id, expected_version)
+        return row
+    
+    async def update(
+        self, id: str, changes: Dict[str, Any], expected_version: Optional[int] = None, version_step: int = 1
+    ) -> Optional[T]:
+        """Update only the given columns of an object in a single round trip.
+        
+        Args:
+            id: The object to update
+            changes: New values keyed by column name
+            expected_version: When given, the update only applies if the stored
+                version still matches, otherwise ``ConcurrentUpdateError`` is raised
+            version_step: Amount added to the version
+        
+        Returns:
+            The updated object, or ``None`` if it does not exist.
+        """
+        row = await self._update_row(id, changes, expected_version, version_step)
+        if row is None:
+            return None
+        await self._commit()
+        return await self._from_row(row)
+    
+    async def exists(self, id: str) -> bool:
+        """Check whether an object exists."""
+        result = await self.db_session.execute(
+            select(self.db_model_class.id).where(self.db_model_class.id == id)
+        )
+        return result.scalar_one_or_none() is not None
     
     async def find_by_id(self, id: str) -> Optional[T]:
         """Find object by ID."""
         result = await self.db_session.execute(
-            select(self.db_model_class).where(self.db_model_class.id == id)
+            select(self.db_model_class)
+            .options(*self._load_options())
+            .where(self.db_model_class.id == id)
+            .execution_options(populate_existing=True)
         )
         db_obj = result.scalar_one_or_none()
         return await self._to_domain(db_obj)
     
     async def find_all(self) -> List[T]:
         """Find all objects."""
-        result = await self.db_session.execute(select(self.db_model_class))
+        result = await self.db_session.execute(
+            select(self.db_model_class).options(*self._load_options())
+        )
         db_objs = result.scalars().all()
         return [await self._to_domain(obj) for obj in db_objs]
     
+    async def find_page(
+        self,
+        sort_key: str = "updated_date",
+        descending: bool = True,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        projection: Optional[Type[T]] = None,
+    ) -> Tuple[List[T], Optional[str]]:
+        """Find one page of objects ordered by ``sort_key`` using keyset pagination.
+
+        Ordering, filtering and limiting all happen in SQL on ``(sort_key, id)``,
+        so the cost of a page does not depend on how deep into the table it is.
+        When ``projection`` is given, only its columns are loaded and rows are
+        returned as that read model instead of the full domain model.
+
+        Returns:
+            The page of objects and the cursor for the next page, or ``None``
+            when there are no more rows.
+        """
+        if sort_key not in SORTABLE_COLUMNS:
+            raise ValueError(f"Unsupported sort key: {sort_key}")
+
+        sort_col = getattr(self.db_model_class, sort_key)
+        id_col = self.db_model_class.id
+        stmt = select(self.db_model_class)
+        if projection is not None:
+            stmt = stmt.options(self._load_only(projection))
+        else:
+            stmt = stmt.options(*self._load_options())
+
+        if cursor:
+            value, last_id = decode_cursor(cursor, sort_key)
+            key = tuple_(sort_col, id_col)
+            stmt = stmt.where(key < (value, last_id) if descending else key > (value, last_id))
+
+        if descending:
+            stmt = stmt.order_by(sort_col.desc(), id_col.desc())
+        else:
+            stmt = stmt.order_by(sort_col.asc(), id_col.asc())
+
+        # Fetch one extra row to learn whether another page exists
+        result = await self.db_session.execute(stmt.limit(limit + 1))
+        db_objs = result.scalars().all()
+
+        next_cursor = None
+        if len(db_objs) > limit:
+            db_objs = db_objs[:limit]
+            last = db_objs[-1]
+            next_cursor = encode_cursor(sort_key, getattr(last, sort_key), last.id)
+
+        if projection is not None:
+            return [self._to_projection(obj, projection) for obj in db_objs], next_cursor
+        return [await self._to_domain(obj) for obj in db_objs], next_cursor
+    
+    async def find_by_id_projected(self, id: str, projection: Type[T]) -> Optional[T]:
+        """Find object by ID, loading only the columns of ``projection``."""
+        result = await self.db_session.execute(
+            select(self.db_model_class)
+            .options(self._load_only(projection))
+            .where(self.db_model_class.id == id)
+        )
+        db_obj = result.scalar_one_or_none()
+        return self._to_projection(db_obj, projection) if db_obj else None
+    
+    def _load_only(self, projection: Type[T]):
+        """Build a loader option restricted to the columns of ``projection``."""
+        return load_only(*(getattr(self.db_model_class, field) for field in projection.model_fields))
+    
     async def delete(self, id: str) -> bool:
         """Delete object by ID."""
         result = await self.db_session.execute(
@@ -76,16 +355,497 @@ class AsyncBaseRepository:
         db_obj = result.scalar_one_or_none()
         if db_obj:
             await self.db_session.delete(db_obj)
-            await self.db_session.commit()
+            await self._commit()
             return True
         return False
 
 
+class AsyncArtifactBlobRepository:
+    """Repository for content-addressed artifact blobs.
+    
+    Blobs are written inside the caller's transaction and never updated:
+    identical content shared by many artifacts or sessions is stored once.
+    """
+    
+    def __init__(self, db_session: AsyncSession):
+        self.db_session = db_session
+    
+    async def put_many(self, blobs: Sequence[Dict[str, Any]]) -> None:
+        """Store blobs that are not stored yet. Does not commit."""
+        unique = {blob["hash"]: blob for blob in blobs}
+        if unique:
+            await self.db_session.execute(
+                insert(ArtifactBlobModel).on_conflict_do_nothing(index_elements=["hash"]),
+                list(unique.values()),
+            )
+    
+    async def get(self, hash: str) -> Optional[ArtifactBlob]:
+        """Find a blob by its SHA-256 hash."""
+        db_obj = await self.db_session.get(ArtifactBlobModel, hash)
+        if not db_obj:
+            return None
+        return ArtifactBlob(**{field: getattr(db_obj, field) for field in ArtifactBlob.model_fields})
+    
+    async def externalize(self, artifacts: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Move inline artifact content into the blob store and return the references."""
+        refs, blobs = [], []
+        for artifact in artifacts:
+            ref, blob = externalize_artifact(artifact)
+            refs.append(ref)
+            if blob:
+                blobs.append(blob)
+        await self.put_many(blobs)
+        return refs
+    
+    async def hydrate(self, artifacts: Optional[Sequence[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """Fill the ``content`` of artifact references from the blob store in one query."""
+        artifacts = list(artifacts or [])
+        hashes = {a["content_hash"] for a in artifacts if "content_hash" in a and "content" not in a}
+        if not hashes:
+            return artifacts
+        result = await self.db_session.execute(
+            select(ArtifactBlobModel.hash, ArtifactBlobModel.content).where(ArtifactBlobModel.hash.in_(hashes))
+        )
+        contents = dict(result.all())
+        return [
+            {**artifact, "content": contents.get(artifact["content_hash"])}
+            if artifact.get("content_hash") in contents and "content" not in artifact else artifact
+            for artifact in artifacts
+        ]
+
+
 class AsyncSessionRepository(AsyncBaseRepository):
-    """Repository for managing Session entities."""
+    """Repository for managing Session entities.
+    
+    ``messages``, ``timeline`` and ``event_history`` live in append-only child
+    tables and are only loaded when a full ``Session`` is requested. The
+    ``artifacts`` column only holds references; their content lives in the
+    artifact blob store and is filled in when a full ``Session`` is built.
+    """
     
     def __init__(self, db_session: AsyncSession):
         super().__init__(db_session, Session, SessionModel)
+        self.blobs = AsyncArtifactBlobRepository(db_session)
+    
+    def _load_options(self) -> list:
+        return [
+            selectinload(SessionModel.message_rows),
+            selectinload(SessionModel.timeline_rows),
+            selectinload(SessionModel.event_rows),
+        ]
+    
+    async def _to_domain(self, db_obj):
+        """Convert database model to domain model, assembling the child items."""
+        if not db_obj:
+            return None
+        fields = dict(db_obj.__dict__)
+        for field in SESSION_ITEM_MODELS:
+            fields[field] = getattr(db_obj, field)
+        fields["artifacts"] = await self.blobs.hydrate(db_obj.artifacts)
+        return self.model_class(**fields)
+    
+    async def _from_row(self, row, obj=None):
+        """Build a session from a ``RETURNING`` row.
+        
+        Child items are taken from ``obj`` when it was just written and
+        otherwise loaded in a single query.
+        """
+        fields = dict(row._mapping)
+        if obj is not None:
+            fields.update({field: getattr(obj, field) for field in ITEM_FIELDS})
+        else:
+            fields.update(await self._find_all_items(row.id, ITEM_FIELDS))
+        fields["artifacts"] = await self.blobs.hydrate(row.artifacts)
+        return self.model_class(**fields)
+    
+    async def save(self, obj: Session) -> Session:
+        """Insert or update a session, storing artifact content in the blob store."""
+        refs = await self.blobs.externalize(obj.artifacts)
+        return await super().save(obj.model_copy(update={"artifacts": refs}))
+    
+    async def _save_children(self, obj, inserted: bool) -> None:
+        """Write the child item rows of a saved session."""
+        for field in ITEM_FIELDS:
+            items = getattr(obj, field)
+            if not inserted:
+                await self._sync_items(obj.id, field, items)
+            elif items:
+                await self.db_session.execute(
+                    insert(SESSION_ITEM_MODELS[field]),
+                    [{"session_id": obj.id, "seq": seq, "payload": item} for seq, item in enumerate(items)],
+                )
+    
+    async def update(
+        self, id: str, changes: Dict[str, Any], expected_version: Optional[int] = None, version_step: int = 1
+    ) -> Optional[Session]:
+        """Update the given fields of a session in a single transaction.
+        
+        Scalar and JSON columns are written with one versioned ``UPDATE ...
+        RETURNING``; replaced item lists only touch the child rows whose
+        payload changed. Summary counters are derived from the new values.
+        """
+        changes = dict(changes)
+        items = {field: changes.pop(field) for field in ITEM_FIELDS if field in changes}
+        if changes.get("artifacts") is not None:
+            changes["artifacts"] = await self.blobs.externalize(changes["artifacts"])
+        summary = Session(messages=items.get("messages") or [], artifacts=changes.get("artifacts") or [])
+        if "messages" in items:
+            changes["message_count"] = summary.message_count
+            changes["last_message_preview"] = summary.last_message_preview
+        if "artifacts" in changes:
+            changes["artifact_count"] = summary.artifact_count
+            changes["has_chart"] = summary.has_chart
+        
+        row = await self._update_row(id, changes, expected_version, version_step)
+        if row is None:
+            return None
+        for field, new_items in items.items():
+            await self._sync_items(id, field, new_items)
+        await self._commit()
+        
+        fields = dict(row._mapping)
+        fields.update(items)
+        fields.update(await self._find_all_items(id, [f for f in ITEM_FIELDS if f not in items]))
+        fields["artifacts"] = await self.blobs.hydrate(row.artifacts)
+        return self.model_class(**fields)
+    
+    async def _find_all_items(self, session_id: str, fields: Sequence[str]) -> Dict[str, List[dict]]:
+        """Load several child item lists of a session with one ``UNION ALL`` query."""
+        found: Dict[str, List[dict]] = {field: [] for field in fields}
+        if not fields:
+            return found
+        queries = [
+            select(literal(field).label("field"), item_model.seq, item_model.payload)
+            .where(item_model.session_id == session_id)
+            for field, item_model in ((field, SESSION_ITEM_MODELS[field]) for field in fields)
+        ]
+        result = await self.db_session.execute(union_all(*queries).order_by("field", "seq"))
+        for field, _, payload in result.all():
+            found[field].append(payload)
+        return found
+    
+    async def _sync_items(self, session_id: str, field: str, items: List[dict]) -> None:
+        """Make a child item list match ``items``, writing only rows that differ."""
+        item_model = SESSION_ITEM_MODELS[field]
+        result = await self.db_session.execute(
+            select(item_model.seq, item_model.payload).where(item_model.session_id == session_id)
+        )
+        stored = dict(result.all())
+        items = list(items or [])
+        for seq, item in enumerate(items):
+            if seq not in stored:
+                await self.db_session.execute(
+                    insert(item_model).values(session_id=session_id, seq=seq, payload=item)
+                )
+            elif stored[seq] != item:
+                await self.db_session.execute(
+                    update(item_model)
+                    .where(item_model.session_id == session_id, item_model.seq == seq)
+                    .values(payload=item)
+                )
+        if len(stored) > len(items):
+            await self.db_session.execute(
+                delete(item_model).where(item_model.session_id == session_id, item_model.seq >= len(items))
+            )
+    
+    async def search(self, query: str, limit: int = 20, offset: int = 0) -> List[SessionSearchResult]:
+        """Full-text search over session titles, messages and artifacts.
+        
+        Matching and ranking happen in the FTS5 index, so the JSON blobs are
+        never scanned. Each session appears once, with its best match.
+        
+        Raises:
+            ValueError: If the query contains no searchable words.
+        """
+        match = to_fts_query(query)
+        hits = (
+            text(_SEARCH_SQL)
+            .bindparams(match=match)
+            .columns(column("session_id", String), column("kind", String), column("doc_id", Integer), column("rank", Float))
+            .subquery("hits")
+        )
+        result = await self.db_session.execute(
+            select(SessionModel)
+            .options(self._load_only(SessionSummary))
+            .join(hits, hits.c.session_id == SessionModel.id)
+            .add_columns(hits.c.kind, hits.c.doc_id, hits.c.rank)
+            .order_by(hits.c.rank, SessionModel.id)
+            .limit(limit)
+            .offset(offset)
+        )
+        rows = result.all()
+        if not rows:
+            return []
+        snippets = dict((await self.db_session.execute(
+            text(_SNIPPET_SQL).bindparams(bindparam("doc_ids", expanding=True)),
+            {"match": match, "doc_ids": [doc_id for _, _, doc_id, _ in rows]},
+        )).all())
+        return [
+            SessionSearchResult(
+                **self._to_projection(db_obj, SessionSummary).dict(),
+                matched=kind,
+                score=-rank,
+                snippet=_highlight(snippets.get(doc_id)),
+            )
+            for db_obj, kind, doc_id, rank in rows
+        ]
+    
+    async def find_document(self, session_id: str) -> Optional[Tuple[SessionVersion, bytes]]:
+        """Load a session as the JSON text of its response document.
+        
+        The stored JSON of the child items and of ``data`` is spliced into
+        the document without being decoded; only the small artifact
+        references are decoded, to fill in their content from the blob store.
+        
+        Returns:
+            The session's version and its document, or ``None`` if it does not exist.
+        """
+        table = SessionModel.__table__
+        scalars = [c for c in table.c if c.name in SESSION_DOCUMENT_FIELDS and c.name not in ("artifacts", "data")]
+        row = (await self.db_session.execute(
+            select(
+                *scalars,
+                func.coalesce(func.json_inflate(table.c.data), "{}").label("data"),
+                func.coalesce(table.c.artifacts, "[]", type_=String).label("artifacts"),
+            ).where(table.c.id == session_id)
+        )).first()
+        if row is None:
+            return None
+        values = dict(row._mapping)
+        raw = {
+            "data": values.pop("data").encode("utf-8"),
+            "artifacts": orjson.dumps(await self.blobs.hydrate(json.loads(values.pop("artifacts")))),
+        }
+        
+        items: Dict[str, List[str]] = {field: [] for field in ITEM_FIELDS}
+        queries = [
+            select(literal(field).label("field"), item_model.seq, func.json_inflate(item_model.payload))
+            .where(item_model.session_id == session_id)
+            for field, item_model in SESSION_ITEM_MODELS.items()
+        ]
+        result = await self.db_session.execute(union_all(*queries).order_by("field", "seq"))
+        for field, _, payload in result.all():
+            items[field].append(payload)
+        raw.update({field: json_array(texts) for field, texts in items.items()})
+        return SessionVersion(**values), splice_session_document(values, raw)
+    
+    async def find_items(self, session_id: str, field: str) -> Optional[List[dict]]:
+        """Load one child item list of a session, or ``None`` if the session is missing."""
+        if not await self.exists(session_id):
+            return None
+        item_model = SESSION_ITEM_MODELS[field]
+        result = await self.db_session.execute(
+            select(item_model.payload)
+            .where(item_model.session_id == session_id)
+            .order_by(item_model.seq)
+        )
+        return list(result.scalars().all())
+    
+    async def append_items(self, session_id: str, field: str, items: List[dict]) -> bool:
+        """Append items to one child list of a session in O(len(items))."""
+        return await self.append(session_id, {field: items})
+    
+    async def append(
+        self,
+        session_id: str,
+        items: Dict[str, List[dict]],
+        artifacts: Sequence[dict] = (),
+        version_step: int = 1,
+        **values: Any,
+    ) -> bool:
+        """Append child items and artifacts to a session in a single transaction.
+        
+        Args:
+            session_id: The session to append to
+            items: New child items keyed by ``messages``, ``timeline`` or ``event_history``
+            artifacts: New artifacts to add to the session
+            version_step: Amount added to the version
+            **values: Extra scalar columns to set, e.g. ``status``
+        
+        Returns:
+            False if the session does not exist.
+        """
+        appends = {field: list(new_items) for field, new_items in items.items() if new_items}
+        if artifacts:
+            appends["artifacts"] = list(artifacts)
+        return await self.apply_patch(session_id, SessionPatch(appends=appends, values=values), version_step)
+    
+    async def apply_patch(self, session_id: str, patch: SessionPatch, version_step: int = 1) -> bool:
+        """Apply a delta update in a single transaction without loading the session.
+        
+        JSON columns are edited in place with SQLite JSON1 functions and new
+        list items are inserted as child rows, so only the changed values
+        travel between the application and the database. The session row is
+        updated first so the transaction holds SQLite's write lock before the
+        next sequence numbers are read; concurrent appenders are serialized
+        instead of overwriting each other.
+        
+        Returns:
+            False if the session does not exist.
+        
+        Raises:
+            PatchConflict: If a ``test`` operation fails.
+            PatchError: If an edited item or value does not exist.
+        """
+        await self._externalize_patch_artifacts(patch)
+        values: Dict[str, Any] = dict(patch.values)
+        values.setdefault("updated_date", datetime.utcnow())
+        values["version"] = SessionModel.version + version_step
+        
+        messages = patch.appends.get("messages")
+        if messages:
+            values["message_count"] = SessionModel.message_count + len(messages)
+            values["last_message_preview"] = str(messages[-1].get("content") or "")[:MESSAGE_PREVIEW_LENGTH]
+        
+        checks: List[Tuple[Any, JsonEdit]] = []
+        artifacts = self._json_column_expr(SessionModel.artifacts, "[]", patch, "artifacts", checks)
+        if artifacts is not None:
+            values["artifacts"] = artifacts
+        data = self._json_column_expr(SessionModel.data, "{}", patch, "data", checks)
+        if data is not None:
+            values["data"] = data
+        
+        tests = [getattr(SessionModel, name) == value for name, value in patch.tests]
+        conditions = tests + [condition for condition, _ in checks]
+        result = await self.db_session.execute(
+            update(SessionModel).where(SessionModel.id == session_id, *conditions).values(**values)
+        )
+        if result.rowcount == 0:
+            await self._rollback()
+            if conditions:
+                await self._raise_failed_condition(session_id, tests, checks)
+            return False
+        
+        if artifacts is not None:
+            # Recompute the artifact counters from the edited column, in SQL
+            await self.db_session.execute(
+                update(SessionModel).where(SessionModel.id == session_id).values(
+                    artifact_count=func.json_array_length(SessionModel.artifacts),
+                    has_chart=literal_column(_HAS_CHART_SQL),
+                )
+            )
+        
+        for field in ITEM_FIELDS:
+            new_items = patch.appends.get(field)
+            if not new_items:
+                continue
+            item_model = SESSION_ITEM_MODELS[field]
+            next_seq = (await self.db_session.execute(
+                select(func.coalesce(func.max(item_model.seq) + 1, 0))
+                .where(item_model.session_id == session_id)
+            )).scalar_one()
+            self.db_session.add_all(
+                item_model(session_id=session_id, seq=next_seq + i, payload=item)
+                for i, item in enumerate(new_items)
+            )
+        
+        # Items are appended first, so edits can address the new ones
+        item_edits = [edit for edit in patch.edits if edit.seq is not None]
+        if item_edits:
+            await self.db_session.flush()
+        for edit in item_edits:
+            item_model = SESSION_ITEM_MODELS[edit.field]
+            conditions = [item_model.session_id == session_id, item_model.seq == edit.seq]
+            if edit.target:
+                conditions.append(func.json_type(func.json_inflate(item_model.payload), edit.target).isnot(None))
+            payload = edit.value if edit.path == "$" else _deflate(item_model.payload, func.json_set(
+                func.json_inflate(item_model.payload), edit.path, func.json(json.dumps(edit.value))
+            ))
+            result = await self.db_session.execute(update(item_model).where(*conditions).values(payload=payload))
+            if result.rowcount == 0:
+                await self._rollback()
+                if edit.target:
+                    raise PatchError(f"No item {edit.seq} with a value at {edit.target} in '{edit.field}'")
+                raise PatchError(f"No item {edit.seq} in '{edit.field}'")
+            if edit.field == "messages":
+                await self.db_session.execute(
+                    update(SessionModel).where(SessionModel.id == session_id).values(
+                        last_message_preview=literal_column(_LAST_MESSAGE_PREVIEW_SQL)
+                    )
+                )
+        
+        await self._commit()
+        return True
+    
+    async def _raise_failed_condition(self, session_id: str, tests: List[Any], checks: List[Tuple[Any, JsonEdit]]) -> None:
+        """Raise the error of the first patch condition the stored session fails, if it exists."""
+        conditions = tests + [condition for condition, _ in checks]
+        row = (await self.db_session.execute(
+            select(*(condition.label(f"c{i}") for i, condition in enumerate(conditions)))
+            .where(SessionModel.id == session_id)
+        )).first()
+        if row is None:
+            return
+        for i, passed in enumerate(row):
+            if passed:
+                continue
+            if i < len(tests):
+                raise PatchConflict("Test operation failed")
+            edit = checks[i - len(tests)][1]
+            raise PatchError(f"No value at {edit.target} in '{edit.field}'")
+    
+    async def _externalize_patch_artifacts(self, patch: SessionPatch) -> None:
+        """Replace inline artifact content in a patch with blob references, in place."""
+        if patch.appends.get("artifacts"):
+            patch.appends["artifacts"] = await self.blobs.externalize(patch.appends["artifacts"])
+        edits = []
+        for edit in patch.edits:
+            content_path = _ARTIFACT_CONTENT_PATH.fullmatch(edit.path)
+            if edit.field != "artifacts" or edit.function not in ("set", "insert"):
+                edits.append(edit)
+            elif _ARTIFACT_PATH.fullmatch(edit.path) and isinstance(edit.value, dict):
+                edit.value = (await self.blobs.externalize([edit.value]))[0]
+                edits.append(edit)
+            elif content_path and isinstance(edit.value, str):
+                # Point the artifact at the new blob instead of setting its content
+                artifact = content_path.group(1)
+                ref = (await self.blobs.externalize([{"content": edit.value}]))[0]
+                edits += [JsonEdit("artifacts", "set", f'{artifact}."{key}"', value) for key, value in ref.items()]
+                edits += [JsonEdit("artifacts", "remove", f'{artifact}."{key}"') for key in ("content", "chart") if key not in ref]
+            else:
+                edits.append(edit)
+        patch.edits = edits
+    
+    @staticmethod
+    def _json_column_expr(column, empty: str, patch: SessionPatch, field: str, checks: List[Tuple[Any, JsonEdit]]):
+        """Build the SQL expression applying a patch's edits and appends to a JSON column.
+        
+        Edits apply in order, each to the result of the previous ones. For
+        every edit with a ``target``, a condition that the target exists at
+        that point is added to ``checks``. The column is inflated for the
+        JSON1 functions and, if it is compressed, the result deflated again,
+        so in-place edits keep large values compressed.
+        """
+        edits = [edit for edit in patch.edits if edit.field == field and edit.seq is None]
+        appended = patch.appends.get(field) or []
+        if not edits and not appended:
+            return None
+        expr = func.coalesce(func.json_inflate(column), empty)
+        for edit in edits:
+            if edit.target:
+                checks.append((func.json_type(expr, edit.target).isnot(None), edit))
+            if edit.function == "merge":
+                expr = func.json_patch(expr, func.json(json.dumps(edit.value)))
+            elif edit.function == "remove":
+                expr = func.json_remove(expr, edit.path)
+            elif edit.function == "insert":
+                expr = func.json_insert(expr, edit.path, func.json(json.dumps(edit.value)))
+            else:
+                expr = func.json_set(expr, edit.path, func.json(json.dumps(edit.value)))
+        if appended:
+            args = []
+            for item in appended:
+                args += ["$[#]", func.json(json.dumps(item))]
+            expr = func.json_insert(expr, *args)
+        return _deflate(column, expr)
+    
+    async def delete(self, id: str) -> bool:
+        """Delete a session together with its child items."""
+        for item_model in SESSION_ITEM_MODELS.values():
+            await self.db_session.execute(delete(item_model).where(item_model.session_id == id))
+        result = await self.db_session.execute(delete(SessionModel).where(SessionModel.id == id))
+        await self._commit()
+        return result.rowcount > 0
 
 
 class AsyncUserRepository(AsyncBaseRepository):
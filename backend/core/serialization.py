@@ -0,0 +1,40 @@
+"""JSON encoding of session documents without revalidating them.
+
+A full session is mostly stored JSON: child item payloads, the ``data``
+column and artifact contents. Instead of decoding that JSON into Python
+objects, validating it into ``Session`` and ``SessionResponse`` and encoding
+it again, responses splice the stored JSON text between the scalar fields,
+which are encoded with orjson.
+"""
+
+from typing import Any, Dict, Iterable
+
+import orjson
+
+from .models import Session
+
+# Fields of a session document, in response order; ``SessionResponse`` has the same
+SESSION_DOCUMENT_FIELDS = tuple(Session.model_fields)
+
+
+def json_array(items: Iterable[str]) -> bytes:
+    """Join JSON texts into the text of a JSON array."""
+    return b"[" + ",".join(items).encode("utf-8") + b"]"
+
+
+def splice_session_document(values: Dict[str, Any], raw: Dict[str, bytes]) -> bytes:
+    """Encode a session document from scalar ``values`` and ``raw`` JSON texts.
+
+    ``raw`` holds the already encoded value of fields such as ``messages``;
+    it is copied into the output as is.
+    """
+    parts = []
+    for name in SESSION_DOCUMENT_FIELDS:
+        value = raw[name] if name in raw else orjson.dumps(values.get(name))
+        parts.append(b'"' + name.encode("ascii") + b'":' + value)
+    return b"{" + b",".join(parts) + b"}"
+
+
+def encode_session(session: Session) -> bytes:
+    """Encode a ``Session`` built in memory as a session document."""
+    return orjson.dumps(session.model_dump(include=set(SESSION_DOCUMENT_FIELDS)))
@@ -2,8 +2,8 @@
 
 from typing import Dict, List, Optional
 from sqlalchemy.orm import Session as DBSession
-from .models import Session, User
-from .repositories import SessionRepository, UserRepository
+from .models import User
+from .repositories import UserRepository
 
 
 class UserService:
@@ -29,30 +29,3 @@ class UserService:
             setattr(user, key, value)
         return self.repository.save(user)
 
-
-class SessionService:
-    """Service class for managing sessions."""
-    
-    def __init__(self, db_session: DBSession):
-        self.repository = SessionRepository(db_session)
-    
-    def get_session_by_id(self, session_id: str) -> Optional[Session]:
-        """Retrieve a session by ID."""
-        return self.repository.find_by_id(session_id)
-    
-    def create_session(self, session: Session) -> Session:
-        """Create a new session."""
-        return self.repository.save(session)
-    
-    def update_session(self, session_id: str, data: Dict) -> Optional[Session]:
-        """Update an existing session."""
-        session = self.repository.find_by_id(session_id)
-        if not session:
-            return None
-        for key, value in data.items():
-            setattr(session, key, value)
-        return self.repository.save(session)
-    
-    def delete_session(self, session_id: str) -> bool:
-        """Delete a session."""
-        return self.repository.delete(session_id)
@@ -1,9 +1,18 @@
 """Async service layer managing domain business logic with SQLAlchemy."""
 
-from typing import Dict, List, Optional
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Tuple
 from sqlalchemy.ext.asyncio import AsyncSession
-from .models import Session, User
-from .repositories_async import AsyncSessionRepository, AsyncUserRepository
+from .agent_storage import delete_agent_history
+from .models import Session, SessionSummary, SessionVersion, SessionSearchResult, ArtifactBlob, User, build_message
+from .repositories_async import AsyncSessionRepository, AsyncUserRepository, AsyncArtifactBlobRepository
+from .session_cache import SessionCache, SessionPayload, session_cache
+from .serialization import encode_session
+from .session_patch import SessionPatch
+from .write_behind import SessionWriteBuffer, session_write_buffer
+
+logger = logging.getLogger(__name__)
 
 
 class AsyncUserService:
@@ -20,39 +29,216 @@ class AsyncUserService:
         """Create a new user."""
         return await self.repository.save(user)
     
-    async def update_user(self, user_id: str, data: Dict) -> Optional[User]:
-        """Update an existing user."""
-        user = await self.repository.find_by_id(user_id)
-        if not user:
-            return None
-        for key, value in data.items():
-            setattr(user, key, value)
-        return await self.repository.save(user)
+    async def update_user(self, user_id: str, data: Dict, expected_version: Optional[int] = None) -> Optional[User]:
+        """Update an existing user.
+        
+        Raises:
+            ConcurrentUpdateError: If ``expected_version`` is stale.
+        """
+        return await self.repository.update(user_id, data, expected_version)
 
 
 class AsyncSessionService:
-    """Async service class for managing sessions."""
+    """Async service class for managing sessions.
     
-    def __init__(self, db_session: AsyncSession):
+    With a ``write_buffer``, updates and message appends are committed in
+    batches by the write-behind buffer; reads apply the writes still pending
+    so callers always see their own changes, and raise ``PendingWriteError``
+    while a session's writes keep failing to commit. With a ``cache``, serialized
+    sessions are kept in memory and every write invalidates them.
+    """
+    
+    def __init__(
+        self,
+        db_session: AsyncSession,
+        write_buffer: Optional[SessionWriteBuffer] = session_write_buffer,
+        cache: Optional[SessionCache] = session_cache,
+    ):
         self.repository = AsyncSessionRepository(db_session)
+        self.write_buffer = write_buffer
+        self.cache = cache
+    
+    def _invalidate(self, session_id: str) -> None:
+        if self.cache is not None:
+            self.cache.invalidate(session_id)
+    
+    async def _flush_writes(self, session_id: Optional[str] = None) -> None:
+        """Commit buffered writes before queries that cannot apply them.
+        
+        Raises:
+            PendingWriteError: If writes to ``session_id`` keep failing to commit.
+        """
+        if self.write_buffer is not None and self.write_buffer.pending:
+            await self.write_buffer.flush()
+            if session_id is not None:
+                self.write_buffer.check(session_id)
     
     async def get_session_by_id(self, session_id: str) -> Optional[Session]:
         """Retrieve a session by ID."""
-        return await self.repository.find_by_id(session_id)
+        if self.write_buffer is None:
+            return await self.repository.find_by_id(session_id)
+        session, pending = await self.write_buffer.read(
+            session_id, lambda: self.repository.find_by_id(session_id)
+        )
+        return pending.apply(session) if session and pending else session
+    
+    async def get_session_payload(self, session_id: str) -> Optional[SessionPayload]:
+        """Retrieve a session as response JSON, from the cache when possible.
+        
+        The JSON is spliced from the stored values without building a
+        ``Session``. Concurrent misses for the same session share a single load.
+        """
+        if self.cache is None:
+            return await self._load_payload(session_id)
+        return await self.cache.get_or_load(session_id, lambda: self._load_payload(session_id))
+    
+    async def _load_payload(self, session_id: str) -> Optional[SessionPayload]:
+        if self.write_buffer is None:
+            found = await self.repository.find_document(session_id)
+        else:
+            found, pending = await self.write_buffer.read(
+                session_id, lambda: self.repository.find_document(session_id)
+            )
+            if found and pending:
+                # Pending writes can only be applied to a model, so encode that instead
+                session = await self.get_session_by_id(session_id)
+                if session is None:
+                    return None
+                found = SessionVersion(**session.dict()), encode_session(session)
+        if found is None:
+            return None
+        version, body = found
+        return SessionPayload(**version.dict(), body=body)
+    
+    async def list_sessions(
+        self, sort: str = "-updated_date", limit: int = 50, cursor: Optional[str] = None
+    ) -> Tuple[List[SessionSummary], Optional[str]]:
+        """List one page of session summaries and the cursor for the next page."""
+        await self._flush_writes()
+        descending = sort.startswith("-")
+        return await self.repository.find_page(
+            sort.lstrip("-"), descending, limit, cursor, projection=SessionSummary
+        )
+    
+    async def get_session_summary(self, session_id: str) -> Optional[SessionSummary]:
+        """Retrieve a session summary by ID without loading its JSON blobs."""
+        if self.write_buffer is not None and self.write_buffer.has_pending(session_id):
+            await self._flush_writes(session_id)
+        return await self.repository.find_by_id_projected(session_id, SessionSummary)
+    
+    async def get_session_version(self, session_id: str) -> Optional[SessionVersion]:
+        """Retrieve the current version of a session with a single indexed lookup."""
+        cached = self.cache.get(session_id) if self.cache is not None else None
+        if cached is not None:
+            return SessionVersion(
+                id=cached.id,
+                version=cached.version,
+                access_level=cached.access_level,
+                created_date=cached.created_date,
+                updated_date=cached.updated_date,
+            )
+        if self.write_buffer is None:
+            return await self.repository.find_by_id_projected(session_id, SessionVersion)
+        version, pending = await self.write_buffer.read(
+            session_id, lambda: self.repository.find_by_id_projected(session_id, SessionVersion)
+        )
+        return pending.apply(version) if version and pending else version
+    
+    async def list_session_versions(
+        self, sort: str = "-updated_date", limit: int = 50, cursor: Optional[str] = None
+    ) -> Tuple[List[SessionVersion], Optional[str]]:
+        """List the versions of the sessions on one page of ``list_sessions``."""
+        await self._flush_writes()
+        descending = sort.startswith("-")
+        return await self.repository.find_page(
+            sort.lstrip("-"), descending, limit, cursor, projection=SessionVersion
+        )
+    
+    async def search_sessions(self, query: str, limit: int = 20, offset: int = 0) -> List[SessionSearchResult]:
+        """Search sessions by title, message and artifact content, best matches first."""
+        await self._flush_writes()
+        return await self.repository.search(query, limit, offset)
     
     async def create_session(self, session: Session) -> Session:
         """Create a new session."""
         return await self.repository.save(session)
     
-    async def update_session(self, session_id: str, data: Dict) -> Optional[Session]:
-        """Update an existing session."""
-        session = await self.repository.find_by_id(session_id)
-        if not session:
+    async def update_session(
+        self, session_id: str, data: Dict, expected_version: Optional[int] = None
+    ) -> Optional[Session]:
+        """Update an existing session.
+        
+        Raises:
+            ConcurrentUpdateError: If ``expected_version`` is stale.
+        """
+        if self.write_buffer is None:
+            updated = await self.repository.update(session_id, data, expected_version)
+        elif expected_version is not None:
+            # The version check needs the committed state
+            await self._flush_writes(session_id)
+            updated = await self.repository.update(session_id, data, expected_version)
+        else:
+            await self.write_buffer.update(session_id, data)
+            updated = await self.get_session_by_id(session_id)
+            if updated is None:
+                self.write_buffer.discard(session_id)
+        self._invalidate(session_id)
+        return updated
+    
+    async def patch_session(self, session_id: str, patch: SessionPatch) -> Optional[SessionSummary]:
+        """Apply a delta update to a session without round-tripping unchanged data."""
+        await self._flush_writes(session_id)
+        applied = await self.repository.apply_patch(session_id, patch)
+        self._invalidate(session_id)
+        if not applied:
             return None
-        for key, value in data.items():
-            setattr(session, key, value)
-        return await self.repository.save(session)
+        return await self.get_session_summary(session_id)
+    
+    async def add_message(
+        self, session_id: str, message_type: str, content: str, metadata: Optional[Dict[str, Any]] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Append a message to a session without rewriting its history."""
+        message = build_message(message_type, content, metadata)
+        if self.write_buffer is not None:
+            await self.write_buffer.append(session_id, "messages", [message])
+            self._invalidate(session_id)
+            if not await self.repository.exists(session_id):
+                self.write_buffer.discard(session_id)
+                return None
+            return message
+        appended = await self.repository.append_items(session_id, "messages", [message])
+        self._invalidate(session_id)
+        return message if appended else None
+    
+    async def get_messages(self, session_id: str) -> Optional[List[Dict[str, Any]]]:
+        """Retrieve the messages of a session."""
+        if self.write_buffer is None:
+            return await self.repository.find_items(session_id, "messages")
+        messages, pending = await self.write_buffer.read(
+            session_id, lambda: self.repository.find_items(session_id, "messages")
+        )
+        return pending.apply_items("messages", messages) if messages is not None and pending else messages
     
     async def delete_session(self, session_id: str) -> bool:
-        """Delete a session."""
-        return await self.repository.delete(session_id)
\ No newline at end of file
+        """Delete a session together with its agent run history."""
+        if self.write_buffer is not None:
+            self.write_buffer.discard(session_id)
+        deleted = await self.repository.delete(session_id)
+        self._invalidate(session_id)
+        try:
+            await asyncio.to_thread(delete_agent_history, [session_id])
+        except Exception as e:
+            # Left for the maintenance job, which collects history without a session
+            logger.error(f"Failed to delete agent history of session {session_id}: {e}")
+        return deleted
+
+
+class AsyncArtifactService:
+    """Async service class for content-addressed artifact blobs."""
+    
+    def __init__(self, db_session: AsyncSession):
+        self.repository = AsyncArtifactBlobRepository(db_session)
+    
+    async def get_blob(self, content_hash: str) -> Optional[ArtifactBlob]:
+        """Retrieve artifact content by its SHA-256 hash."""
+        return await self.repository.get(content_hash.lower())
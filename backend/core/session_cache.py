@@ -0,0 +1,181 @@
+"""In-process read-through cache of serialized sessions.
+
+Popular shared sessions are read far more often than they change. Instead
+of loading the session, its child rows and artifact blobs and serializing
+the response on every hit, ``SessionCache`` keeps the response bytes of the
+most recently used sessions. Every write path invalidates the session it
+changed; ``SESSION_CACHE_TTL_SECONDS`` bounds how long writes made by other
+processes can go unnoticed.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from config.settings import settings
+
+
+@dataclass(frozen=True)
+class SessionPayload:
+    """Serialized response of a session, with what is needed to validate it."""
+    id: str
+    version: int
+    access_level: str
+    created_date: datetime
+    updated_date: datetime
+    body: bytes
+
+
+@dataclass
+class SessionCacheMetrics:
+    """Counters describing how effective the cache is."""
+    hits: int = 0
+    misses: int = 0
+    coalesced: int = 0  # misses that waited for another request's load
+    invalidations: int = 0
+    evictions: int = 0
+    expirations: int = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0,
+            "invalidations": self.invalidations,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class SessionCache:
+    """Bounded LRU cache of ``SessionPayload`` with a TTL and single-flight loading.
+
+    Concurrent misses for the same session share one load. A load that was
+    running when the session got invalidated is not stored, and requests
+    arriving after the invalidation start a new load instead of joining it.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = settings.SESSION_CACHE_SIZE,
+        max_bytes: int = settings.SESSION_CACHE_MAX_BYTES,
+        ttl_seconds: float = settings.SESSION_CACHE_TTL_SECONDS,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl_seconds
+        self.metrics = SessionCacheMetrics()
+
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # id -> (expires, payload)
+        self._size = 0
+        self._loading: Dict[str, asyncio.Future] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def size(self) -> int:
+        """Total size of the cached bodies in bytes."""
+        return self._size
+
+    def get(self, session_id: str) -> Optional[SessionPayload]:
+        """Return a cached payload without loading it on a miss."""
+        payload = self._lookup(session_id)
+        if payload is not None:
+            self.metrics.hits += 1
+        return payload
+
+    def _lookup(self, session_id: str) -> Optional[SessionPayload]:
+        item = self._entries.get(session_id)
+        if item is None:
+            return None
+        expires, payload = item
+        if expires < time.monotonic():
+            self._remove(session_id)
+            self.metrics.expirations += 1
+            return None
+        self._entries.move_to_end(session_id)
+        return payload
+
+    async def get_or_load(
+        self, session_id: str, load: Callable[[], Awaitable[Optional[SessionPayload]]]
+    ) -> Optional[SessionPayload]:
+        """Return the cached payload of a session, loading it on a miss.
+
+        ``load`` returns ``None`` for missing sessions, which are not cached.
+        """
+        while True:
+            payload = self.get(session_id)
+            if payload is not None:
+                return payload
+            flight = self._loading.get(session_id)
+            if flight is None:
+                break
+            self.metrics.coalesced += 1
+            try:
+                return await asyncio.shield(flight)
+            except asyncio.CancelledError:
+                # The request running the load went away: load it ourselves
+                if not flight.cancelled():
+                    raise
+
+        self.metrics.misses += 1
+        flight = asyncio.get_running_loop().create_future()
+        self._loading[session_id] = flight
+        try:
+            payload = await load()
+        except asyncio.CancelledError:
+            flight.cancel()
+            raise
+        except Exception as e:
+            flight.set_exception(e)
+            flight.exception()  # waiters re-raise it; don't log it as never retrieved
+            raise
+        finally:
+            # Invalidated while loading when the flight was detached
+            current = self._loading.get(session_id) is flight
+            if current:
+                del self._loading[session_id]
+        flight.set_result(payload)
+        if payload is not None and current:
+            self._store(payload)
+        return payload
+
+    def invalidate(self, session_id: str) -> None:
+        """Forget a session after it changed, including a load in progress."""
+        removed = self._remove(session_id)
+        detached = self._loading.pop(session_id, None) is not None
+        if removed or detached:
+            self.metrics.invalidations += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._loading.clear()
+        self._size = 0
+
+    def _store(self, payload: SessionPayload) -> None:
+        if len(payload.body) > self.max_bytes:
+            return
+        self._remove(payload.id)
+        self._entries[payload.id] = (time.monotonic() + self.ttl, payload)
+        self._size += len(payload.body)
+        while len(self._entries) > self.max_entries or self._size > self.max_bytes:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self._size -= len(evicted.body)
+            self.metrics.evictions += 1
+
+    def _remove(self, session_id: str) -> bool:
+        item = self._entries.pop(session_id, None)
+        if item is None:
+            return False
+        self._size -= len(item[1].body)
+        return True
+
+
+# Process-wide cache used by ``AsyncSessionService``; ``None`` when disabled
+session_cache: Optional[SessionCache] = SessionCache() if settings.SESSION_CACHE_SIZE > 0 else None
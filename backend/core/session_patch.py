@@ -0,0 +1,172 @@
+"""Delta updates for sessions.
+
+A ``SessionPatch`` describes a partial change to a session – items to append,
+scalar fields to set and in-place edits inside JSON values – so it can be
+applied in SQL without round-tripping the blobs that did not change. Patches
+are built either from RFC 6902 JSON Patch operations or from the simpler
+``append`` / ``merge`` delta format.
+"""
+
+import json
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+# Session fields that can be set directly
+SCALAR_FIELDS = (
+    "title", "description", "instruction", "droid_type", "status",
+    "context_entity", "is_pinned", "access_level",
+)
+# Session fields stored as append-only child rows
+ITEM_FIELDS = ("messages", "timeline", "event_history")
+# Session fields stored as JSON columns that can be edited in place
+JSON_FIELDS = ("artifacts", "data")
+
+
+class PatchError(ValueError):
+    """Raised when a patch cannot be applied to a session."""
+
+
+class PatchConflict(PatchError):
+    """Raised when a ``test`` operation does not match the stored session."""
+
+
+@dataclass
+class JsonEdit:
+    """In-place edit of a JSON value, executed with SQLite JSON1 functions.
+
+    ``function`` is ``set``, ``insert`` (append with a ``[#]`` path),
+    ``remove`` or ``merge`` (RFC 7396, ``json_patch``). ``seq`` addresses a
+    child item row; it is ``None`` for JSON columns. ``target`` is a path that
+    must exist when the edit runs: the edited value for ``replace`` and
+    ``remove``, its parent for ``add``.
+    """
+    field: str
+    function: str
+    path: str = "$"
+    value: Any = None
+    seq: Optional[int] = None
+    target: Optional[str] = None
+
+
+@dataclass
+class SessionPatch:
+    """Partial session update."""
+    appends: Dict[str, List[Dict[str, Any]]] = field(default_factory=dict)
+    values: Dict[str, Any] = field(default_factory=dict)
+    edits: List[JsonEdit] = field(default_factory=list)
+    tests: List[Tuple[str, Any]] = field(default_factory=list)
+
+    @classmethod
+    def from_delta(cls, append: Optional[Dict[str, List[Dict[str, Any]]]] = None,
+                   merge: Optional[Dict[str, Any]] = None) -> "SessionPatch":
+        """Build a patch from the ``append`` / ``merge`` delta format.
+
+        ``append`` adds items to ``messages``, ``timeline``, ``event_history``
+        or ``artifacts``. ``merge`` sets scalar fields and merges ``data``
+        following RFC 7396.
+        """
+        patch = cls()
+        for name, items in (append or {}).items():
+            if name not in ITEM_FIELDS and name != "artifacts":
+                raise PatchError(f"Cannot append to '{name}'")
+            if not isinstance(items, list):
+                raise PatchError(f"Items to append to '{name}' must be a list")
+            patch.appends.setdefault(name, []).extend(items)
+        for name, value in (merge or {}).items():
+            if name == "data":
+                if not isinstance(value, dict):
+                    raise PatchError("'data' must be merged with an object")
+                patch.edits.append(JsonEdit("data", "merge", value=value))
+            elif name in SCALAR_FIELDS:
+                patch.values[name] = value
+            else:
+                raise PatchError(f"Cannot merge '{name}'")
+        return patch
+
+    @classmethod
+    def from_json_patch(cls, operations: List[Dict[str, Any]]) -> "SessionPatch":
+        """Build a patch from RFC 6902 operations.
+
+        Supported operations are ``add``, ``replace`` and ``remove`` on scalar
+        fields and inside ``data`` and ``artifacts``; ``add`` with a trailing
+        ``-`` to append to any list; ``replace`` inside an existing message,
+        timeline step or event; and ``test`` on scalar fields and ``version``.
+        Items of the append-only lists cannot be removed, and ``add`` cannot
+        insert before an existing array item. Operations apply in order, and
+        ``replace`` and ``remove`` fail when their target does not exist.
+        """
+        patch = cls()
+        for operation in operations:
+            op, path = operation.get("op"), operation.get("path")
+            if not isinstance(path, str) or not path.startswith("/"):
+                raise PatchError(f"Invalid path: {path!r}")
+            if op in ("add", "replace", "test") and "value" not in operation:
+                raise PatchError(f"Operation '{op}' on {path} requires a value")
+            value = operation.get("value")
+            name, *rest = _parse_pointer(path)
+
+            if op == "test":
+                if rest or name not in SCALAR_FIELDS + ("version",):
+                    raise PatchError(f"'test' is only supported on scalar fields, not {path}")
+                patch.tests.append((name, value))
+            elif op not in ("add", "replace", "remove"):
+                raise PatchError(f"Unsupported operation: {op!r}")
+            elif name in SCALAR_FIELDS and not rest:
+                patch.values[name] = None if op == "remove" else value
+            elif name in ITEM_FIELDS or name == "artifacts":
+                if rest == ["-"] and op == "add" and name == "artifacts":
+                    # An edit rather than an append, to keep its place among the edits
+                    patch.edits.append(JsonEdit("artifacts", "insert", "$[#]", value))
+                elif rest == ["-"] and op == "add":
+                    patch.appends.setdefault(name, []).append(value)
+                elif name == "artifacts" and rest and rest[0].isdigit():
+                    patch.edits.append(_edit("artifacts", op, rest, value))
+                elif name in ITEM_FIELDS and rest and rest[0].isdigit() and op != "remove":
+                    edit = _edit(name, op, rest[1:], value)
+                    edit.seq = int(rest[0])
+                    patch.edits.append(edit)
+                else:
+                    raise PatchError(f"Unsupported '{op}' on {path}")
+            elif name == "data":
+                if not rest and op == "replace":
+                    patch.values["data"] = value
+                elif rest:
+                    patch.edits.append(_edit("data", op, rest, value))
+                else:
+                    raise PatchError(f"Unsupported '{op}' on {path}")
+            else:
+                raise PatchError(f"Unknown path: {path}")
+        return patch
+
+
+def _parse_pointer(pointer: str) -> List[str]:
+    """Split a JSON pointer into unescaped reference tokens."""
+    return [token.replace("~1", "/").replace("~0", "~") for token in pointer[1:].split("/")]
+
+
+def _edit(field_name: str, op: str, tokens: List[str], value: Any) -> JsonEdit:
+    path = _to_json_path(tokens)
+    if op == "remove":
+        if path == "$":
+            raise PatchError(f"Cannot remove the whole '{field_name}' value")
+        return JsonEdit(field_name, "remove", path, target=path)
+    if op == "replace":
+        return JsonEdit(field_name, "set", path, value, target=None if path == "$" else path)
+    if tokens and tokens[-1].isdigit():
+        # json_set would overwrite the item instead of inserting before it
+        raise PatchError(f"Cannot add before an existing item of '{field_name}'; append with '-'")
+    parent = _to_json_path(tokens[:-1])
+    return JsonEdit(field_name, "set", path, value, target=None if parent == "$" else parent)
+
+
+def _to_json_path(tokens: List[str]) -> str:
+    """Convert JSON pointer tokens to a SQLite JSON path."""
+    path = "$"
+    for token in tokens:
+        if token == "-":
+            path += "[#]"
+        elif token.isdigit():
+            path += f"[{token}]"
+        else:
+            path += "." + json.dumps(token)
+    return path
@@ -0,0 +1,331 @@
+"""Group commit for session writes.
+
+Every API write used to commit its own SQLite transaction, so bursts of
+updates serialized on the database write lock and paid one fsync each.
+``SessionWriteBuffer`` sits in front of ``AsyncSessionService`` when
+``WRITE_BEHIND_ENABLED`` is set: updates and message appends are coalesced
+per session and committed for many sessions in one transaction, at most
+``WRITE_BEHIND_WINDOW_MS`` milliseconds after they were accepted.
+
+Reads in the same process see their own writes: pending changes are applied
+on top of what is loaded from the database until they are flushed.
+
+Accepted writes are never dropped. When a batch fails to commit, its
+sessions are written again one per transaction, so a session whose writes
+cannot commit does not hold back the others; it stays queued and is retried
+on every flush. Once its writes failed ``MAX_FLUSH_ATTEMPTS`` times, every
+read or write of that session raises ``PendingWriteError`` until they commit.
+"""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+
+from config.settings import settings
+from database_async import AsyncSessionLocal
+from .repositories_async import AsyncSessionRepository
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Sessions whose writes failed to commit this many times are reported on access
+MAX_FLUSH_ATTEMPTS = 3
+
+
+class PendingWriteError(RuntimeError):
+    """Raised when accepted writes to a session keep failing to commit."""
+
+
+@dataclass
+class PendingWrite:
+    """Writes to one session accepted but not yet committed.
+
+    ``changes`` holds the latest value of every updated field and ``appends``
+    the items added to lists that were not replaced since; ``writes`` counts
+    the coalesced writes, each of which bumps the session version.
+    """
+    changes: Dict[str, Any] = field(default_factory=dict)
+    appends: Dict[str, List[Dict[str, Any]]] = field(default_factory=dict)
+    writes: int = 0
+    updated_date: datetime = field(default_factory=datetime.utcnow)
+    attempts: int = 0  # failed commits of this session alone
+    error: Optional[str] = None  # of the last failed commit
+
+    @property
+    def failing(self) -> bool:
+        return self.attempts >= MAX_FLUSH_ATTEMPTS
+
+    def update(self, changes: Dict[str, Any]) -> None:
+        """Coalesce an update; replaced lists supersede the items appended to them."""
+        for name, value in changes.items():
+            self.changes[name] = value
+            self.appends.pop(name, None)
+        self.updated_date = changes.get("updated_date") or datetime.utcnow()
+
+    def append(self, name: str, items: List[Dict[str, Any]]) -> None:
+        """Coalesce items appended to a list."""
+        if name in self.changes:
+            self.changes[name] = list(self.changes[name] or []) + list(items)
+        else:
+            self.appends.setdefault(name, []).extend(items)
+        self.updated_date = datetime.utcnow()
+
+    def absorb(self, newer: "PendingWrite") -> None:
+        """Coalesce writes accepted after this entry's."""
+        self.update(newer.changes)
+        for name, items in newer.appends.items():
+            self.append(name, items)
+        self.writes += newer.writes
+        self.updated_date = newer.updated_date
+
+    def apply(self, session: T) -> T:
+        """Return ``session``, or a read model of it, as it will be once these writes are committed."""
+        fields = type(session).model_fields
+        values = {name: value for name, value in self.changes.items() if name in fields}
+        for name, items in self.appends.items():
+            if name in fields:
+                values[name] = list(getattr(session, name)) + items
+        values["version"] = session.version + self.writes
+        values["updated_date"] = self.updated_date
+        return session.model_copy(update=values)
+
+    def apply_items(self, name: str, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Return one child item list as it will be once these writes are committed."""
+        if name in self.changes:
+            return list(self.changes[name] or [])
+        return list(items) + self.appends.get(name, [])
+
+
+@dataclass
+class WriteBufferMetrics:
+    """Counters describing how well writes are batched."""
+    writes: int = 0  # writes accepted
+    batches: int = 0  # transactions committed
+    sessions: int = 0  # session rows written by those transactions
+    max_batch_size: int = 0
+    failed_batches: int = 0
+    failing_sessions: int = 0  # sessions whose writes failed MAX_FLUSH_ATTEMPTS times, still retried
+    flush_seconds: float = 0.0
+    # Committed batches keyed by the upper bound of their size: 1, 2, 4, 8...
+    batch_sizes: Dict[int, int] = field(default_factory=dict)
+
+    def record_batch(self, size: int, seconds: float) -> None:
+        self.batches += 1
+        self.sessions += size
+        self.max_batch_size = max(self.max_batch_size, size)
+        self.flush_seconds += seconds
+        bucket = 1 << (size - 1).bit_length()
+        self.batch_sizes[bucket] = self.batch_sizes.get(bucket, 0) + 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "writes": self.writes,
+            "batches": self.batches,
+            "sessions": self.sessions,
+            "avg_batch_size": round(self.sessions / self.batches, 2) if self.batches else 0,
+            "max_batch_size": self.max_batch_size,
+            "writes_per_session": round(self.writes / self.sessions, 2) if self.sessions else 0,
+            "avg_flush_ms": round(self.flush_seconds / self.batches * 1000, 2) if self.batches else 0,
+            "failed_batches": self.failed_batches,
+            "failing_sessions": self.failing_sessions,
+            "batch_sizes": {f"<={size}": count for size, count in sorted(self.batch_sizes.items())},
+        }
+
+
+class SessionWriteBuffer:
+    """Write-behind buffer committing coalesced session writes in batches.
+
+    Writes are accepted without touching the database and committed every
+    ``window_ms`` milliseconds, or as soon as ``max_sessions`` sessions have
+    pending writes, in a single transaction.
+    """
+
+    def __init__(
+        self,
+        window_ms: int = settings.WRITE_BEHIND_WINDOW_MS,
+        max_sessions: int = settings.WRITE_BEHIND_MAX_SESSIONS,
+        session_factory=AsyncSessionLocal,
+    ):
+        self.window = window_ms / 1000
+        self.max_sessions = max_sessions
+        self.session_factory = session_factory
+        self.metrics = WriteBufferMetrics()
+
+        self._pending: Dict[str, PendingWrite] = {}
+        self._lock = asyncio.Lock()
+        self._timer: Optional[asyncio.Task] = None
+        # Odd while a batch is being written; readers retry when it changes
+        self._flush_seq = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    @property
+    def pending(self) -> int:
+        """Number of sessions with writes waiting to be committed."""
+        return len(self._pending)
+
+    def has_pending(self, session_id: str) -> bool:
+        return session_id in self._pending
+
+    def check(self, session_id: str) -> None:
+        """Raise ``PendingWriteError`` if accepted writes to the session keep failing to commit."""
+        entry = self._pending.get(session_id)
+        if entry is not None and entry.failing:
+            raise PendingWriteError(
+                f"{entry.writes} accepted writes to session {session_id} failed to commit "
+                f"{entry.attempts} times and are being retried: {entry.error}"
+            )
+
+    async def start(self) -> None:
+        """Begin committing pending writes periodically."""
+        if self._timer is None or self._timer.done():
+            self._timer = asyncio.create_task(self._flush_periodically())
+
+    async def close(self) -> None:
+        """Stop periodic flushing and commit everything still pending."""
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        await self.flush()
+        for session_id, entry in self._pending.items():
+            logger.error(f"{entry.writes} accepted writes to session {session_id} could not be committed: {entry.error}")
+
+    async def update(self, session_id: str, changes: Dict[str, Any]) -> None:
+        """Accept an update of session fields."""
+        self.check(session_id)
+        self._entry(session_id).update(changes)
+        await self._accepted()
+
+    async def append(self, session_id: str, name: str, items: List[Dict[str, Any]]) -> None:
+        """Accept items appended to ``messages``, ``timeline``, ``event_history`` or ``artifacts``."""
+        self.check(session_id)
+        self._entry(session_id).append(name, items)
+        await self._accepted()
+
+    def discard(self, session_id: str) -> None:
+        """Drop the pending writes of a session, e.g. when it is deleted."""
+        self._pending.pop(session_id, None)
+
+    async def read(self, session_id: str, load: Callable[[], Awaitable[T]]) -> Tuple[T, Optional[PendingWrite]]:
+        """Run ``load`` and return its result with the session's pending writes.
+
+        The pending writes are those not yet visible in the loaded data: a
+        load racing with a flush is retried so writes are never applied twice.
+        """
+        while True:
+            await self._idle.wait()
+            self.check(session_id)
+            seq = self._flush_seq
+            result = await load()
+            if seq == self._flush_seq:
+                return result, self._pending.get(session_id)
+
+    async def flush(self) -> None:
+        """Commit pending writes in one transaction, and those of sessions that failed before in one each."""
+        async with self._lock:
+            if not self._pending:
+                return
+            async with self.session_factory() as db:
+                # Check out a connection before readers start waiting for this
+                # batch: they hold theirs, so a flush waiting for the pool
+                # afterwards could never finish
+                await db.connection()
+                if not self._pending:
+                    return
+                batch, self._pending = self._pending, {}
+                self._flush_seq += 1
+                self._idle.clear()
+                committed = set()
+                try:
+                    groups = [{session_id: entry for session_id, entry in batch.items() if not entry.attempts}]
+                    groups += [{session_id: entry} for session_id, entry in batch.items() if entry.attempts]
+                    for group in groups:
+                        if not group:
+                            continue
+                        if await self._commit(db, group):
+                            committed.update(group)
+                        elif len(group) > 1:
+                            # Find the sessions that cannot commit and write the others
+                            for session_id, entry in group.items():
+                                if await self._commit(db, {session_id: entry}):
+                                    committed.add(session_id)
+                finally:
+                    # Failed, and not attempted if the flush was interrupted
+                    self._requeue({session_id: entry for session_id, entry in batch.items() if session_id not in committed})
+                    self.metrics.failing_sessions = sum(entry.failing for entry in self._pending.values())
+                    self._flush_seq += 1
+                    self._idle.set()
+
+    async def _commit(self, db, group: Dict[str, PendingWrite]) -> bool:
+        """Write a group of sessions in one transaction; returns whether it committed."""
+        start = time.perf_counter()
+        try:
+            repository = AsyncSessionRepository(db)
+            repository.autocommit = False
+            for session_id, entry in group.items():
+                await self._write(repository, session_id, entry)
+            await db.commit()
+        except Exception as e:
+            await db.rollback()
+            self.metrics.failed_batches += 1
+            logger.error(f"Failed to commit writes for {len(group)} sessions: {e}")
+            if len(group) == 1:
+                entry = next(iter(group.values()))
+                entry.attempts += 1
+                entry.error = str(e)
+            return False
+        self.metrics.record_batch(len(group), time.perf_counter() - start)
+        return True
+
+    def _entry(self, session_id: str) -> PendingWrite:
+        entry = self._pending.get(session_id)
+        if entry is None:
+            entry = self._pending[session_id] = PendingWrite()
+        entry.writes += 1
+        self.metrics.writes += 1
+        return entry
+
+    async def _accepted(self) -> None:
+        if self._timer is None:
+            await self.start()
+        if len(self._pending) >= self.max_sessions:
+            await self.flush()
+
+    @staticmethod
+    async def _write(repository: AsyncSessionRepository, session_id: str, entry: PendingWrite) -> None:
+        # Each coalesced write bumps the version once, so clients holding a
+        # version from an intermediate state still get a conflict
+        steps = [entry.writes - bool(entry.changes and entry.appends), 1]
+        if entry.changes:
+            changes = {**entry.changes, "updated_date": entry.updated_date}
+            await repository.update(session_id, changes, version_step=steps.pop(0))
+        if entry.appends:
+            items = {name: items for name, items in entry.appends.items() if name != "artifacts"}
+            await repository.append(
+                session_id, items, artifacts=entry.appends.get("artifacts", ()),
+                version_step=steps.pop(0), updated_date=entry.updated_date,
+            )
+
+    def _requeue(self, batch: Dict[str, PendingWrite]) -> None:
+        """Put uncommitted writes back in front of the writes accepted meanwhile."""
+        pending, self._pending = self._pending, dict(batch)
+        for session_id, entry in pending.items():
+            if session_id in self._pending:
+                self._pending[session_id].absorb(entry)
+            else:
+                self._pending[session_id] = entry
+
+    async def _flush_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.window)
+            await self.flush()
+
+
+# Process-wide buffer used by ``AsyncSessionService``; ``None`` when disabled
+session_write_buffer: Optional[SessionWriteBuffer] = (
+    SessionWriteBuffer() if settings.WRITE_BEHIND_ENABLED else None
+)
@@ -1,10 +1,11 @@
 """Database configuration and session management."""
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, Session
 from contextlib import contextmanager
 from config.settings import settings
 from models.db_models import Base
+from models.types import enable_incremental_vacuum, register_sqlite_functions
 import logging
 
 logger = logging.getLogger(__name__)
@@ -15,6 +16,9 @@ engine = create_engine(
     echo=settings.DEBUG,
     connect_args={"check_same_thread": False}  # For SQLite
 )
+# SQL helpers for compressed columns, used by triggers and in-place JSON edits
+event.listen(engine, "connect", register_sqlite_functions)
+event.listen(engine, "connect", enable_incremental_vacuum)
 
 # Session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -1,10 +1,13 @@
 """Async database configuration and session management."""
 
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import sessionmaker
 from contextlib import asynccontextmanager
 from config.settings import settings
 from models.db_models import Base
+from models.types import enable_incremental_vacuum, register_sqlite_functions
+from migrations import run_migrations
 import logging
 
 logger = logging.getLogger(__name__)
@@ -18,6 +21,9 @@ engine = create_async_engine(
     echo=settings.DEBUG,
     connect_args={"check_same_thread": False}  # For SQLite
 )
+# SQL helpers for compressed columns, used by triggers and in-place JSON edits
+event.listen(engine.sync_engine, "connect", register_sqlite_functions)
+event.listen(engine.sync_engine, "connect", enable_incremental_vacuum)
 
 # Async session factory
 AsyncSessionLocal = async_sessionmaker(
@@ -30,6 +36,7 @@ async def create_tables():
     """Create all database tables."""
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(run_migrations)
     logger.info("Database tables created successfully")
 
 async def get_async_db():
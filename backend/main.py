@@ -1,9 +1,12 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+import asyncio
 import logging
 
 # Import configuration
 from config.settings import settings
+from settings import SALESFORCE_SCHEMA
 
 # Import route modules
 from api.routes import router as api_router
@@ -30,10 +33,16 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
 # Initialize database
 from database_async import init_async_database
+from core.maintenance import storage_maintenance
+from core.name_catalog import name_catalog
+from core.write_behind import PendingWriteError, session_write_buffer
+from utils.salesforce_async_client import default_async_client
+from utils.salesforce_metadata import metadata_cache
 
 @app.on_event("startup")
 async def startup_event():
@@ -41,6 +50,37 @@ async def startup_event():
     logger.info("Initializing database...")
     await init_async_database()
     logger.info("Database initialized successfully")
+    if session_write_buffer is not None:
+        await session_write_buffer.start()
+    if storage_maintenance is not None:
+        await storage_maintenance.start()
+    if name_catalog is not None:
+        await name_catalog.start()
+    if metadata_cache is not None:
+        # In the background: startup does not wait for the org
+        app.state.metadata_warmup = asyncio.create_task(
+            default_async_client.warm_metadata(list(SALESFORCE_SCHEMA["core_objects"]))
+        )
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Commit buffered writes, stop background jobs and close connections before the process exits."""
+    warmup = getattr(app.state, "metadata_warmup", None)
+    if warmup is not None:
+        warmup.cancel()
+        await asyncio.gather(warmup, return_exceptions=True)
+    if storage_maintenance is not None:
+        await storage_maintenance.close()
+    if name_catalog is not None:
+        await name_catalog.close()
+    if session_write_buffer is not None:
+        await session_write_buffer.close()
+    await default_async_client.close()
+
+@app.exception_handler(PendingWriteError)
+async def pending_write_error_handler(request: Request, exc: PendingWriteError):
+    """Accepted writes to the session are not committed yet: report it rather than serve stale data."""
+    return JSONResponse(status_code=503, content={"detail": str(exc)})
 
 # Include routers
 app.include_router(api_router, prefix="/api")
@@ -0,0 +1,310 @@
+"""Lightweight, idempotent schema migrations run at startup.
+
+``Base.metadata.create_all`` only creates tables that do not exist yet, so
+indexes and columns added to existing models never reach databases created
+by an older version of the app. The steps below bring such databases up to
+date and are safe to run on every boot.
+"""
+
+import json
+import logging
+import sqlite3
+from datetime import datetime
+from typing import Callable, List, Tuple
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection
+from config.settings import settings
+from models.db_models import Base
+from models.types import decompress_text
+
+logger = logging.getLogger(__name__)
+
+
+def create_missing_indexes(conn: Connection) -> None:
+    """Create every index declared on the models that is missing in the database."""
+    inspector = inspect(conn)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {ix["name"] for ix in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(conn)
+                logger.info(f"Created index {index.name} on {table.name}")
+
+
+def add_missing_columns(conn: Connection) -> None:
+    """Add every column declared on the models that is missing in the database."""
+    inspector = inspect(conn)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {col["name"] for col in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            ddl = f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column.type.compile(conn.dialect)}'
+            default = column.default.arg if column.default is not None and column.default.is_scalar else None
+            if isinstance(default, bool):
+                ddl += f" DEFAULT {int(default)}"
+            elif isinstance(default, (int, float)):
+                ddl += f" DEFAULT {default}"
+            conn.execute(text(ddl))
+            logger.info(f"Added column {column.name} to {table.name}")
+
+
+# ---------------------------------------------------------------------------
+# Full-text search – an FTS5 index over ``session_search_docs``, kept in sync
+# with sessions and messages by triggers so every write path is covered
+# ---------------------------------------------------------------------------
+
+# Queries producing ``(session_id, kind, seq, content)`` search documents for a
+# session or message row named ``{row}``, read from ``{source}`` (empty inside
+# triggers, where the row is ``new``). The columns they read are stored as
+# plain text: triggers also fire on connections of other SQLite clients, where
+# the app's ``json_inflate()`` function does not exist.
+_TITLE_TEXT = "trim(coalesce({row}.title, '') || ' ' || coalesce({row}.description, ''))"
+_TITLE_DOCS = f"SELECT {{row}}.id, 'title', 0, {_TITLE_TEXT} {{source}} WHERE {_TITLE_TEXT} <> ''"
+_ARTIFACT_DOCS = (
+    "SELECT {row}.id, 'artifact', artifact.key, "
+    "trim(coalesce(json_extract(artifact.value, '$.title'), '') || ' ' || coalesce("
+    "json_extract(artifact.value, '$.content'), "
+    "(SELECT content FROM artifact_blobs WHERE hash = json_extract(artifact.value, '$.content_hash')), '')) "
+    "FROM {source}json_each(coalesce({row}.artifacts, '[]')) AS artifact"
+)
+_MESSAGE_DOCS = (
+    "SELECT {row}.session_id, 'message', {row}.seq, CAST(json_extract({row}.payload, '$.content') AS TEXT) "
+    "{source} WHERE coalesce(json_extract({row}.payload, '$.content'), '') <> ''"
+)
+_INSERT_DOCS = "INSERT INTO session_search_docs (session_id, kind, seq, content) "
+
+SEARCH_INDEX_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS session_search USING fts5("
+    "content, content='session_search_docs', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    # Mirror the external content table into the index
+    "CREATE TRIGGER IF NOT EXISTS session_search_docs_ai AFTER INSERT ON session_search_docs BEGIN "
+    "INSERT INTO session_search (rowid, content) VALUES (new.id, new.content); END",
+    "CREATE TRIGGER IF NOT EXISTS session_search_docs_ad AFTER DELETE ON session_search_docs BEGIN "
+    "INSERT INTO session_search (session_search, rowid, content) VALUES ('delete', old.id, old.content); END",
+    # Sessions: title/description and artifacts
+    "CREATE TRIGGER IF NOT EXISTS sessions_search_ai AFTER INSERT ON sessions BEGIN "
+    f"{_INSERT_DOCS}{_TITLE_DOCS.format(row='new', source='')}; "
+    f"{_INSERT_DOCS}{_ARTIFACT_DOCS.format(row='new', source='')}; END",
+    "CREATE TRIGGER IF NOT EXISTS sessions_search_au_title AFTER UPDATE OF title, description ON sessions "
+    "WHEN old.title IS NOT new.title OR old.description IS NOT new.description BEGIN "
+    "DELETE FROM session_search_docs WHERE session_id = old.id AND kind = 'title'; "
+    f"{_INSERT_DOCS}{_TITLE_DOCS.format(row='new', source='')}; END",
+    "CREATE TRIGGER IF NOT EXISTS sessions_search_au_artifacts AFTER UPDATE OF artifacts ON sessions "
+    "WHEN old.artifacts IS NOT new.artifacts BEGIN "
+    "DELETE FROM session_search_docs WHERE session_id = old.id AND kind = 'artifact'; "
+    f"{_INSERT_DOCS}{_ARTIFACT_DOCS.format(row='new', source='')}; END",
+    "CREATE TRIGGER IF NOT EXISTS sessions_search_ad AFTER DELETE ON sessions BEGIN "
+    "DELETE FROM session_search_docs WHERE session_id = old.id; END",
+    # Messages
+    "CREATE TRIGGER IF NOT EXISTS session_messages_search_ai AFTER INSERT ON session_messages BEGIN "
+    f"{_INSERT_DOCS}{_MESSAGE_DOCS.format(row='new', source='')}; END",
+    "CREATE TRIGGER IF NOT EXISTS session_messages_search_au AFTER UPDATE OF payload ON session_messages BEGIN "
+    "DELETE FROM session_search_docs WHERE session_id = old.session_id AND kind = 'message' AND seq = old.seq; "
+    f"{_INSERT_DOCS}{_MESSAGE_DOCS.format(row='new', source='')}; END",
+    "CREATE TRIGGER IF NOT EXISTS session_messages_search_ad AFTER DELETE ON session_messages BEGIN "
+    "DELETE FROM session_search_docs WHERE session_id = old.session_id AND kind = 'message' AND seq = old.seq; END",
+]
+
+
+def create_search_index(conn: Connection) -> None:
+    """Create the FTS5 session search index and (re)create the triggers maintaining it."""
+    for ddl in SEARCH_INDEX_DDL:
+        if ddl.startswith("CREATE TRIGGER"):
+            # Triggers are dropped first so changed definitions take effect
+            name = ddl.split()[5]
+            conn.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+        conn.execute(text(ddl))
+
+
+# ---------------------------------------------------------------------------
+# Data migrations – each runs once and is recorded in ``schema_migrations``
+# ---------------------------------------------------------------------------
+
+def _load_json(value):
+    value = decompress_text(value)
+    if value is None:
+        return None
+    return json.loads(value) if isinstance(value, str) else value
+
+
+def _column_names(conn: Connection, table: str) -> set:
+    return {col["name"] for col in inspect(conn).get_columns(table)}
+
+
+def backfill_session_summaries(conn: Connection) -> None:
+    """Populate the denormalized summary columns of existing sessions."""
+    from core.models import Session
+
+    if "messages" not in _column_names(conn, "sessions"):
+        # Fresh database: sessions were created with the summary columns
+        return
+    rows = conn.execute(text("SELECT id, messages, artifacts FROM sessions")).mappings().all()
+    for row in rows:
+        session = Session(
+            id=row["id"],
+            messages=_load_json(row["messages"]) or [],
+            artifacts=_load_json(row["artifacts"]) or [],
+        )
+        conn.execute(
+            text(
+                "UPDATE sessions SET message_count = :message_count, artifact_count = :artifact_count, "
+                "last_message_preview = :last_message_preview, has_chart = :has_chart WHERE id = :id"
+            ),
+            {
+                "id": session.id,
+                "message_count": session.message_count,
+                "artifact_count": session.artifact_count,
+                "last_message_preview": session.last_message_preview,
+                "has_chart": session.has_chart,
+            },
+        )
+
+
+def split_session_json_arrays(conn: Connection) -> None:
+    """Move the legacy ``messages``, ``timeline`` and ``event_history`` JSON
+    columns of ``sessions`` into their ``(session_id, seq)`` child tables."""
+    from models.db_models import SESSION_ITEM_MODELS
+
+    legacy = [field for field in SESSION_ITEM_MODELS if field in _column_names(conn, "sessions")]
+    if not legacy:
+        return
+    rows = conn.execute(text(f"SELECT id, {', '.join(legacy)} FROM sessions")).mappings().all()
+    for row in rows:
+        for field in legacy:
+            items = _load_json(row[field]) or []
+            if not items:
+                continue
+            conn.execute(
+                SESSION_ITEM_MODELS[field].__table__.insert(),
+                [{"session_id": row["id"], "seq": seq, "payload": item} for seq, item in enumerate(items)],
+            )
+    for field in legacy:
+        if sqlite3.sqlite_version_info >= (3, 35, 0):
+            conn.execute(text(f'ALTER TABLE sessions DROP COLUMN "{field}"'))
+        else:
+            conn.execute(text(f'UPDATE sessions SET "{field}" = NULL'))
+
+
+def build_session_search_index(conn: Connection) -> None:
+    """Index the titles, artifacts and messages of existing sessions."""
+    conn.execute(text("DELETE FROM session_search_docs"))
+    conn.execute(text(_INSERT_DOCS + _TITLE_DOCS.format(row="sessions", source="FROM sessions")))
+    conn.execute(text(_INSERT_DOCS + _ARTIFACT_DOCS.format(row="sessions", source="sessions, ")))
+    conn.execute(text(_INSERT_DOCS + _MESSAGE_DOCS.format(row="m", source="FROM session_messages AS m")))
+    conn.execute(text("INSERT INTO session_search (session_search) VALUES ('rebuild')"))
+
+
+def externalize_session_artifacts(conn: Connection) -> None:
+    """Move inline artifact content of existing sessions into ``artifact_blobs``."""
+    from core.models import externalize_artifact
+    from models.db_models import ArtifactBlobModel
+    from sqlalchemy.dialects.sqlite import insert
+
+    rows = conn.execute(text("SELECT id, artifacts FROM sessions")).mappings().all()
+    for row in rows:
+        refs, blobs = [], []
+        for artifact in _load_json(row["artifacts"]) or []:
+            ref, blob = externalize_artifact(artifact)
+            refs.append(ref)
+            if blob:
+                blobs.append(blob)
+        if not blobs:
+            continue
+        conn.execute(insert(ArtifactBlobModel).on_conflict_do_nothing(index_elements=["hash"]), blobs)
+        conn.execute(
+            text("UPDATE sessions SET artifacts = :artifacts WHERE id = :id"),
+            {"id": row["id"], "artifacts": json.dumps(refs)},
+        )
+
+
+# Columns stored with ``CompressedJSON``
+COMPRESSED_COLUMNS = [
+    ("sessions", "data"),
+    ("session_timeline", "payload"),
+    ("session_events", "payload"),
+]
+
+# Columns read by the search index triggers, compressed by older versions
+SEARCH_SOURCE_COLUMNS = [
+    ("artifact_blobs", "hash", "content"),
+    ("sessions", "id", "artifacts"),
+    ("session_messages", "rowid", "payload"),
+]
+
+
+def compress_large_values(conn: Connection) -> None:
+    """Compress large values written before column compression was introduced."""
+    if settings.JSON_COMPRESSION_THRESHOLD <= 0:
+        return
+    for table, column in COMPRESSED_COLUMNS:
+        conn.execute(
+            text(
+                f"UPDATE {table} SET {column} = json_deflate({column}) "
+                f"WHERE typeof({column}) = 'text' AND length(CAST({column} AS BLOB)) >= :threshold"
+            ),
+            {"threshold": settings.JSON_COMPRESSION_THRESHOLD},
+        )
+
+
+def decompress_search_sources(conn: Connection) -> None:
+    """Store the columns read by the search index triggers as plain text again,
+    then rebuild the index from them."""
+    for table, key, column in SEARCH_SOURCE_COLUMNS:
+        rows = conn.execute(
+            text(f"SELECT {key} AS key, {column} AS value FROM {table} WHERE typeof({column}) = 'blob'")
+        ).mappings().all()
+        for row in rows:
+            conn.execute(
+                text(f"UPDATE {table} SET {column} = :value WHERE {key} = :key"),
+                {"key": row["key"], "value": decompress_text(row["value"])},
+            )
+    build_session_search_index(conn)
+
+
+def consolidate_agent_storage(conn: Connection) -> None:
+    """Move the per-session ``session_{id}`` agno tables into agent storage."""
+    from core.agent_storage import consolidate_legacy_tables
+
+    consolidate_legacy_tables(conn)
+
+
+DATA_MIGRATIONS: List[Tuple[str, Callable[[Connection], None]]] = [
+    ("0001_backfill_session_summaries", backfill_session_summaries),
+    ("0002_split_session_json_arrays", split_session_json_arrays),
+    ("0003_build_session_search_index", build_session_search_index),
+    ("0004_externalize_session_artifacts", externalize_session_artifacts),
+    ("0005_compress_large_values", compress_large_values),
+    ("0006_consolidate_agent_storage", consolidate_agent_storage),
+    ("0007_decompress_search_sources", decompress_search_sources),
+]
+
+
+def apply_data_migrations(conn: Connection) -> None:
+    """Run every data migration that has not been applied yet, in order."""
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_migrations (name VARCHAR PRIMARY KEY, applied_date DATETIME)"
+    ))
+    applied = set(conn.execute(text("SELECT name FROM schema_migrations")).scalars())
+    for name, migration in DATA_MIGRATIONS:
+        if name in applied:
+            continue
+        migration(conn)
+        conn.execute(
+            text("INSERT INTO schema_migrations (name, applied_date) VALUES (:name, :applied_date)"),
+            {"name": name, "applied_date": datetime.utcnow()},
+        )
+        logger.info(f"Applied data migration {name}")
+
+
+def run_migrations(conn: Connection) -> None:
+    """Apply all schema migrations in order."""
+    add_missing_columns(conn)
+    create_missing_indexes(conn)
+    create_search_index(conn)
+    apply_data_migrations(conn)
@@ -1,5 +1,15 @@
 """Models module for database interactions."""
 
-from .db_models import Base, UserModel, SessionModel
+from .db_models import (
+    Base, UserModel, SessionModel,
+    SessionMessageModel, SessionTimelineModel, SessionEventModel, SESSION_ITEM_MODELS,
+    SessionSearchDocModel, ArtifactBlobModel,
+)
+from .types import CompressedJSON, CompressedText, JSONText, register_sqlite_functions
 
-__all__ = ["Base", "UserModel", "SessionModel"]
+__all__ = [
+    "Base", "UserModel", "SessionModel",
+    "SessionMessageModel", "SessionTimelineModel", "SessionEventModel", "SESSION_ITEM_MODELS",
+    "SessionSearchDocModel", "ArtifactBlobModel",
+    "CompressedJSON", "CompressedText", "JSONText", "register_sqlite_functions",
+]
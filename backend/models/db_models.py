@@ -1,8 +1,9 @@
 """Database models using SQLAlchemy for ORM."""
 
-from sqlalchemy import Column, String, Integer, Float, DateTime, Boolean, ForeignKey, JSON
+from sqlalchemy import Column, String, Text, Integer, Float, DateTime, Boolean, ForeignKey, Index
 from sqlalchemy.orm import relationship, declarative_base
 from datetime import datetime
+from .types import CompressedJSON, JSONText
 
 Base = declarative_base()
 
@@ -16,6 +17,8 @@ class UserModel(Base):
     first_name = Column(String, nullable=True)
     last_name = Column(String, nullable=True)
     is_active = Column(Boolean, default=True)
+    # Optimistic concurrency token, incremented on every write
+    version = Column(Integer, nullable=False, default=1)
     created_date = Column(DateTime, default=datetime.utcnow)
     updated_date = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -26,6 +29,11 @@ class UserModel(Base):
 class SessionModel(Base):
     """Session database model."""
     __tablename__ = "sessions"
+    __table_args__ = (
+        # Composite indexes backing keyset pagination on (sort column, id)
+        Index("ix_sessions_updated_date_id", "updated_date", "id"),
+        Index("ix_sessions_created_date_id", "created_date", "id"),
+    )
 
     id = Column(String, primary_key=True, unique=True, index=True)
     title = Column(String, nullable=True)
@@ -38,10 +46,134 @@ class SessionModel(Base):
     access_level = Column(String, default="public")
     user_id = Column(String, ForeignKey("users.id"))
     user = relationship("UserModel", back_populates="sessions")
-    messages = Column(JSON, default=list)
-    timeline = Column(JSON, default=list)
-    artifacts = Column(JSON, default=list)
-    event_history = Column(JSON, default=list)
-    data = Column(JSON, default=dict)
+    # Read by the search index triggers, so kept plain
+    artifacts = Column(JSONText, default=list)
+    data = Column(CompressedJSON, default=dict)
+    # Denormalized summary columns, maintained on every write
+    message_count = Column(Integer, default=0)
+    artifact_count = Column(Integer, default=0)
+    last_message_preview = Column(String, nullable=True)
+    has_chart = Column(Boolean, default=False)
+    # Optimistic concurrency token, incremented on every write
+    version = Column(Integer, nullable=False, default=1)
     created_date = Column(DateTime, default=datetime.utcnow)
     updated_date = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # Append-only child rows; loaded explicitly by the repository when needed
+    message_rows = relationship(
+        "SessionMessageModel", order_by="SessionMessageModel.seq",
+        cascade="all, delete-orphan", passive_deletes=True,
+    )
+    timeline_rows = relationship(
+        "SessionTimelineModel", order_by="SessionTimelineModel.seq",
+        cascade="all, delete-orphan", passive_deletes=True,
+    )
+    event_rows = relationship(
+        "SessionEventModel", order_by="SessionEventModel.seq",
+        cascade="all, delete-orphan", passive_deletes=True,
+    )
+
+    @property
+    def messages(self):
+        return [row.payload for row in self.message_rows]
+
+    @messages.setter
+    def messages(self, items):
+        _sync_rows(self.message_rows, SessionMessageModel, items)
+
+    @property
+    def timeline(self):
+        return [row.payload for row in self.timeline_rows]
+
+    @timeline.setter
+    def timeline(self, items):
+        _sync_rows(self.timeline_rows, SessionTimelineModel, items)
+
+    @property
+    def event_history(self):
+        return [row.payload for row in self.event_rows]
+
+    @event_history.setter
+    def event_history(self, items):
+        _sync_rows(self.event_rows, SessionEventModel, items)
+
+
+class SessionItemMixin:
+    """Ordered JSON item belonging to a session, keyed by ``(session_id, seq)``."""
+
+    session_id = Column(String, ForeignKey("sessions.id", ondelete="CASCADE"), primary_key=True)
+    seq = Column(Integer, primary_key=True)
+    payload = Column(JSONText, nullable=False)
+
+
+class SessionMessageModel(SessionItemMixin, Base):
+    """Conversation message of a session."""
+    __tablename__ = "session_messages"
+
+
+class SessionTimelineModel(SessionItemMixin, Base):
+    """Timeline step of a session."""
+    __tablename__ = "session_timeline"
+
+    payload = Column(CompressedJSON, nullable=False)
+
+
+class SessionEventModel(SessionItemMixin, Base):
+    """Streamed workflow event of a session."""
+    __tablename__ = "session_events"
+
+    payload = Column(CompressedJSON, nullable=False)
+
+
+class SessionSearchDocModel(Base):
+    """Searchable text of a session: its title, a message or an artifact.
+
+    Rows are maintained by SQLite triggers (see ``migrations.py``) and serve as
+    the external content of the ``session_search`` FTS5 index.
+    """
+    __tablename__ = "session_search_docs"
+    __table_args__ = (
+        Index("ix_session_search_docs_source", "session_id", "kind", "seq"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    session_id = Column(String, nullable=False)
+    kind = Column(String, nullable=False)  # "title", "message" or "artifact"
+    seq = Column(Integer, nullable=False, default=0)
+    content = Column(String, nullable=False)
+
+
+class ArtifactBlobModel(Base):
+    """Artifact content stored once and addressed by its SHA-256 hash."""
+    __tablename__ = "artifact_blobs"
+
+    hash = Column(String(64), primary_key=True)
+    # Read by the search index triggers, so kept plain
+    content = Column(Text, nullable=False)
+    size = Column(Integer, nullable=False)
+    media_type = Column(String, nullable=False, default="text/markdown")
+    created_date = Column(DateTime, default=datetime.utcnow)
+
+
+# Child item tables keyed by the Session field they back
+SESSION_ITEM_MODELS = {
+    "messages": SessionMessageModel,
+    "timeline": SessionTimelineModel,
+    "event_history": SessionEventModel,
+}
+
+
+def _sync_rows(rows, model_class, items):
+    """Make ``rows`` mirror ``items``, touching only rows whose payload changed.
+
+    Replacing an array that merely grew by a few items therefore costs a few
+    INSERTs instead of rewriting the whole history.
+    """
+    items = list(items or [])
+    for seq, item in enumerate(items):
+        if seq < len(rows):
+            if rows[seq].payload != item:
+                rows[seq].payload = item
+        else:
+            rows.append(model_class(seq=seq, payload=item))
+    del rows[len(items):]
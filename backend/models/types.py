@@ -0,0 +1,134 @@
+"""Custom column types."""
+
+import json
+import zlib
+from typing import Any, Optional, Union
+from sqlalchemy.types import Text, TypeDecorator
+from config.settings import settings
+
+# Compressed values are stored as BLOBs starting with this marker, so they
+# can never be mistaken for the JSON text of rows written before compression
+# was introduced
+COMPRESSED_PREFIX = b"\x00z"
+
+# Preset dictionary priming zlib with the structure of stored session items,
+# so that even small messages and streamed events compress. Values written
+# with it can only be read back with the very same bytes: never edit it, add
+# a new dictionary under a new marker instead.
+ZLIB_DICT = (
+    b'"metadata": {}}{"id": "", "type": "toolCall", "name": "", "toolType": "default", '
+    b'"status": "running", "status": "completed", "output": "", "input": "", "artifact_type": "", '
+    b'{"step": "", "title": "", "type": "chart", "type": "data", "content_hash": "", "size": '
+    b'{"id": "", "type": "user", "type": "assistant", "type": "system", "content": "", '
+    b'{"id": "", "type": "content_chunk", "content": "", "timestamp": "2025-01-01T00:00:00.000000"}'
+)
+
+
+def compress_text(value: str) -> Union[str, bytes]:
+    """Compress ``value`` with zlib if it is at least ``JSON_COMPRESSION_THRESHOLD`` bytes long.
+
+    The value is kept as plain text when compression would not make it smaller.
+    """
+    threshold = settings.JSON_COMPRESSION_THRESHOLD
+    data = value.encode("utf-8")
+    if threshold <= 0 or len(data) < threshold:
+        return value
+    compressor = zlib.compressobj(settings.JSON_COMPRESSION_LEVEL, zdict=ZLIB_DICT)
+    compressed = COMPRESSED_PREFIX + compressor.compress(data) + compressor.flush()
+    return compressed if len(compressed) < len(data) else value
+
+
+def decompress_text(value: Optional[Union[str, bytes]]) -> Optional[str]:
+    """Inverse of ``compress_text``; plain text is returned unchanged."""
+    if isinstance(value, (bytes, memoryview)):
+        value = bytes(value)
+        if value.startswith(COMPRESSED_PREFIX):
+            decompressor = zlib.decompressobj(zdict=ZLIB_DICT)
+            data = decompressor.decompress(value[len(COMPRESSED_PREFIX):]) + decompressor.flush()
+            return data.decode("utf-8")
+        return value.decode("utf-8")
+    return value
+
+
+class CompressedText(TypeDecorator):
+    """Text stored zlib-compressed above a size threshold.
+
+    Values below ``JSON_COMPRESSION_THRESHOLD`` bytes, and every row written
+    before compression was introduced, remain plain text.
+    """
+
+    impl = Text
+    cache_ok = True
+
+    def process_bind_param(self, value: Optional[str], dialect) -> Optional[Union[str, bytes]]:
+        return None if value is None else compress_text(value)
+
+    def process_result_value(self, value, dialect) -> Optional[str]:
+        return decompress_text(value)
+
+
+class JSONText(TypeDecorator):
+    """JSON stored as plain text.
+
+    For columns read by the search index triggers, which must work from any
+    SQLite client. Values compressed by older versions are still readable.
+    """
+
+    impl = Text
+    cache_ok = True
+
+    def process_bind_param(self, value: Any, dialect) -> Optional[str]:
+        return None if value is None else json.dumps(value)
+
+    def process_result_value(self, value, dialect) -> Any:
+        text = decompress_text(value)
+        return None if text is None else json.loads(text)
+
+
+class CompressedJSON(TypeDecorator):
+    """JSON stored as text, zlib-compressed above a size threshold.
+
+    SQL reading these columns with JSON1 functions must unwrap them with
+    ``json_inflate()``; see ``register_sqlite_functions``. Never use it for
+    columns read by triggers: the function only exists on app connections.
+    """
+
+    impl = Text
+    cache_ok = True
+
+    def process_bind_param(self, value: Any, dialect) -> Optional[Union[str, bytes]]:
+        if value is None:
+            return None
+        return compress_text(json.dumps(value))
+
+    def process_result_value(self, value, dialect) -> Any:
+        text = decompress_text(value)
+        return None if text is None else json.loads(text)
+
+
+def _deflate(value):
+    # Only text is compressed; NULLs and already compressed BLOBs pass through
+    return compress_text(value) if isinstance(value, str) else value
+
+
+def register_sqlite_functions(dbapi_connection, connection_record=None) -> None:
+    """Register the SQL functions that (de)compress ``Compressed*`` columns.
+
+    ``json_inflate(x)`` returns the plain text of a possibly compressed value
+    and ``json_deflate(x)`` compresses text above the threshold. Meant as a
+    ``connect`` event listener on SQLite engines.
+    """
+    dbapi_connection.create_function("json_inflate", 1, decompress_text, deterministic=True)
+    dbapi_connection.create_function("json_deflate", 1, _deflate)
+
+
+def enable_incremental_vacuum(dbapi_connection, connection_record=None) -> None:
+    """Create new SQLite databases with ``auto_vacuum = INCREMENTAL``.
+
+    Lets ``PRAGMA incremental_vacuum`` hand free pages back to the OS. A
+    no-op on existing databases, which keep their mode until a full
+    ``VACUUM``. Meant as a ``connect`` event listener on SQLite engines.
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    cursor.close()
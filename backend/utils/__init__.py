@@ -7,6 +7,8 @@ Salesforce client.
 
 # Direct imports from local modules
 from .salesforce_tools import query_salesforce, create_salesforce_record, update_salesforce_record, delete_salesforce_record, query_salesforce_sync, create_salesforce_record_sync, update_salesforce_record_sync, delete_salesforce_record_sync 
+from .salesforce_tools import describe_salesforce_object
+from .salesforce_tools import bulk_create_salesforce_records, bulk_update_salesforce_records, bulk_delete_salesforce_records, create_salesforce_record_graph
 from .viz_tools import query_salesforce_and_chart
 from .helper import parse_chart_result
 
@@ -20,6 +22,11 @@ __all__ = [
     "create_salesforce_record_sync",
     "update_salesforce_record_sync",
     "delete_salesforce_record_sync",
+    "describe_salesforce_object",
+    "bulk_create_salesforce_records",
+    "bulk_update_salesforce_records",
+    "bulk_delete_salesforce_records",
+    "create_salesforce_record_graph",
     "query_salesforce_and_chart",
     "parse_chart_result"
 ] 
\ No newline at end of file
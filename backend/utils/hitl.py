@@ -126,10 +126,11 @@ def salesforce_confirmation_hook(function_name: str, function_call: callable, ar
             live.start()
 
 
-def bulk_confirmation_hook(function_name: str, function_call: callable, arguments: Dict[str, Any]) -> Any:
+async def bulk_confirmation_hook(function_name: str, function_call: callable, arguments: Dict[str, Any]) -> Any:
     """
     Confirmation hook for bulk Salesforce operations.
-    Prompts user for confirmation before executing bulk create or update operations.
+    Prompts user for confirmation before executing bulk create, update or delete operations.
+    It is async, as the bulk tools are: agno passes it a coroutine function to await.
     
     Args:
         function_name: Name of the function being called
@@ -150,8 +151,11 @@ def bulk_confirmation_hook(function_name: str, function_call: callable, argument
     try:
         # Determine operation type
         operation_type = None
-        object_name = arguments.get('object_name', 'Unknown')
-        records = arguments.get('records', [])
+        records = arguments.get('records') or [{'Id': record_id} for record_id in arguments.get('record_ids', [])]
+        # Composite graphs span several objects, named in their records
+        object_name = arguments.get('object_name') or ", ".join(
+            dict.fromkeys(str(record.get('object_name', 'Unknown')) for record in records)
+        ) or 'Unknown'
         
         if 'create' in function_name.lower():
             operation_type = "BULK CREATE"
@@ -159,9 +163,12 @@ def bulk_confirmation_hook(function_name: str, function_call: callable, argument
         elif 'update' in function_name.lower():
             operation_type = "BULK UPDATE"
             operation_color = "yellow"
+        elif 'delete' in function_name.lower():
+            operation_type = "BULK DELETE"
+            operation_color = "red"
         else:
             # For unknown operations, proceed without confirmation
-            return function_call(**arguments)
+            return await function_call(**arguments)
         
         # Create confirmation display
         console.print("\n" + "="*60, style="bright_blue")
@@ -188,6 +195,8 @@ def bulk_confirmation_hook(function_name: str, function_call: callable, argument
         
         # Warning for bulk operations
         console.print(f"\n[yellow]⚠️  This will affect {len(records)} records![/yellow]")
+        if operation_type == "BULK DELETE":
+            console.print("\n[red]WARNING: This operation cannot be undone![/red]")
         
         # Prompt for confirmation
         console.print("\n" + "-"*60, style="dim")
@@ -207,7 +216,7 @@ def bulk_confirmation_hook(function_name: str, function_call: callable, argument
         console.print("-"*60 + "\n", style="dim")
         
         # Execute the function
-        result = function_call(**arguments)
+        result = await function_call(**arguments)
         
         # Show success message
         console.print(f"\n✨ {operation_type} operation completed successfully!", style="bold green")
@@ -1,11 +1,37 @@
 import asyncio
 import json
-from typing import Dict, Any, Optional, List
+import logging
+import re
+from dataclasses import replace
+from typing import AsyncIterator, Dict, Any, Optional, List
 from dataclasses import dataclass
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from settings import SALESFORCE_ORG, SFDX_DIR
+import httpx
+from config.settings import settings
+from .salesforce_bulk import BulkIngest
+from .salesforce_cache import SoqlCache, normalize_soql, soql_cache, soql_objects
+from .salesforce_concurrency import CallLimit, SingleFlight, salesforce_call_limit, salesforce_flights
+from .salesforce_metadata import OBJECT_LIST, MetadataCache, metadata_cache
+from .salesforce_rest import COLLECTION_SIZE, GRAPH_MAX_RECORDS, AsyncSalesforceRestTransport, SalesforceRestError, SalesforceRestUnavailable
+
+logger = logging.getLogger(__name__)
+
+# Failed records listed in the error of a multi-record write; all are in its data
+BULK_ERRORS_SHOWN = 10
+
+# Bulk API 2.0 operation of each write
+BULK_OPERATIONS = {'create': 'insert', 'update': 'update'}
+
+# Reference Ids of composite graph records, and references to them in field values
+GRAPH_REFERENCE_ID = re.compile(r'^[A-Za-z0-9_]+$')
+GRAPH_REFERENCE = re.compile(r'@\{(\w+)\.')
+
+
+class SalesforceQueryError(Exception):
+    """A streamed query failed"""
 
 
 @dataclass
@@ -20,21 +46,64 @@ class SalesforceResult:
 class AsyncSalesforceClient:
     """Async client for interacting with Salesforce CLI and executing SOQL queries"""
     
-    def __init__(self, org: str = SALESFORCE_ORG, working_dir: str = SFDX_DIR):
+    def __init__(
+        self,
+        org: str = SALESFORCE_ORG,
+        working_dir: str = SFDX_DIR,
+        transport: str = settings.SALESFORCE_TRANSPORT,
+        cache: Optional[SoqlCache] = soql_cache,
+        flights: SingleFlight = salesforce_flights,
+        call_limit: CallLimit = salesforce_call_limit,
+        bulk_threshold: int = settings.SALESFORCE_BULK_THRESHOLD,
+        metadata: Optional[MetadataCache] = metadata_cache,
+    ):
         self.org = org
         self.working_dir = working_dir
+        self.cache = cache
+        self.metadata = metadata
+        # Concurrent identical queries and describes share one call
+        self.flights = flights
+        self.call_limit = call_limit
+        self.bulk_threshold = bulk_threshold
+        # Calls go through the sf CLI when there is no REST transport or it is unavailable
+        self.rest = AsyncSalesforceRestTransport(org, working_dir) if transport == "rest" else None
+    
+    async def close(self):
+        """Close the pooled connections of the REST transport"""
+        if self.rest is not None:
+            await self.rest.aclose()
+    
+    async def _run_rest(self, operation: str, *args, envelope: bool = False) -> Optional[SalesforceResult]:
+        """Run an operation of the REST transport, or return None to have the caller use the CLI.
+        
+        With ``envelope``, data is wrapped like the CLI's ``--json`` output.
+        """
+        if self.rest is None:
+            return None
+        try:
+            async with self.call_limit.slot():
+                data = await getattr(self.rest, operation)(*args)
+        except SalesforceRestUnavailable as e:
+            logger.warning(f"Salesforce REST transport unavailable, using the sf CLI: {e}")
+            return None
+        except (SalesforceRestError, httpx.HTTPError) as e:
+            return SalesforceResult(success=False, error=str(e), raw_output=str(e))
+        if envelope:
+            data = {'status': 0, 'result': data}
+        return SalesforceResult(success=True, data=data)
     
     async def _run_command(self, command: str) -> SalesforceResult:
         """Execute a Salesforce CLI command asynchronously and return structured result"""
         try:
-            proc = await asyncio.create_subprocess_shell(
-                command,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE,
-                cwd=self.working_dir
-            )
-            
-            stdout, stderr = await proc.communicate()
+            async with self.call_limit.slot():
+                proc = await asyncio.create_subprocess_shell(
+                    command,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE,
+                    cwd=self.working_dir
+                )
+                
+                stdout, stderr = await proc.communicate()
             
             if proc.returncode == 0:
                 output = stdout.decode().strip()
@@ -65,7 +134,69 @@ class AsyncSalesforceClient:
             return output
     
     async def query(self, soql: str, format_output: bool = True) -> SalesforceResult:
+        """Execute a SOQL query against the Salesforce org, answering repeated queries from the cache"""
+        if not format_output:
+            return await self._query(soql, format_output)
+        def load():
+            return self._coalesced(('query', self.org, normalize_soql(soql)), lambda: self._query(soql))
+        
+        if self.cache is not None:
+            return await self.cache.get_or_load(self.org, soql, load)
+        return await load()
+    
+    async def _coalesced(self, key: tuple, call) -> SalesforceResult:
+        """Run ``call``, or wait for the identical call already in flight"""
+        # Each waiter gets its own result object around the shared data
+        return replace(await self.flights.do(key, call))
+    
+    async def iter_query(
+        self, soql: str, batch_size: int = settings.SALESFORCE_QUERY_BATCH_SIZE
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Yield the records of a SOQL query as their batches arrive, following queryMore
+        
+        Only one batch is held in memory, and the next one is requested when
+        the previous one has been consumed. Results are not cached. Raises
+        SalesforceQueryError when the query fails.
+        """
+        if self.rest is not None:
+            pages = self.rest.iter_pages(soql, batch_size)
+            started = False
+            try:
+                page = await self._next_page(pages)
+                while page is not None:
+                    started = True
+                    for record in page['records']:
+                        yield record
+                    page = await self._next_page(pages)
+                return
+            except SalesforceRestUnavailable as e:
+                if started:
+                    raise SalesforceQueryError(str(e)) from e
+                logger.warning(f"Salesforce REST transport unavailable, using the sf CLI: {e}")
+            except (SalesforceRestError, httpx.HTTPError) as e:
+                raise SalesforceQueryError(str(e)) from e
+            finally:
+                await pages.aclose()
+        
+        # The CLI has no cursor: every record is buffered before the first one is yielded
+        result = await self._query(soql)
+        if not result.success:
+            raise SalesforceQueryError(result.error)
+        for record in result.data:
+            yield record
+    
+    async def _next_page(self, pages: AsyncIterator[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Fetch the next page of a streamed query holding a call slot, or None after the last one"""
+        async with self.call_limit.slot():
+            return await anext(pages, None)
+    
+    async def _query(self, soql: str, format_output: bool = True) -> SalesforceResult:
         """Execute a SOQL query against the Salesforce org"""
+        if format_output:
+            result = await self._run_rest('query', soql)
+            if result is not None:
+                return result
+        
         # Escape quotes in the query
         escaped_query = soql.replace('"', '\\"')
         
@@ -89,14 +220,68 @@ class AsyncSalesforceClient:
         return result
     
     async def describe_object(self, object_name: str) -> SalesforceResult:
-        """Get metadata description for a Salesforce object"""
+        """Get metadata description for a Salesforce object, from the metadata cache when it has it"""
         command = f'sf sobject describe --sobject {object_name} --target-org {self.org} --json'
-        return await self._run_command(command)
+        return await self._metadata(object_name, f'sobjects/{object_name}/describe', lambda data: data, command)
     
     async def list_objects(self) -> SalesforceResult:
-        """List all available Salesforce objects"""
+        """List all available Salesforce objects, from the metadata cache when it has them"""
         command = f'sf sobject list --target-org {self.org} --json'
-        return await self._run_command(command)
+        return await self._metadata(
+            OBJECT_LIST, 'sobjects', lambda data: [sobject['name'] for sobject in data['sobjects']], command
+        )
+    
+    async def warm_metadata(self, object_names: List[str]) -> None:
+        """Load the sObject list and the describes of ``object_names`` into the metadata cache"""
+        results = await asyncio.gather(self.list_objects(), *(self.describe_object(name) for name in object_names))
+        failed = [name for name, result in zip(['sObject list', *object_names], results) if not result.success]
+        if failed:
+            logger.warning(f"Could not load Salesforce metadata of {', '.join(failed)}")
+    
+    async def api_version(self) -> str:
+        """API version of the org, which keys its cached metadata so an org upgrade invalidates it"""
+        if self.rest is not None:
+            try:
+                return (await self.rest.auth()).api_version
+            except SalesforceRestUnavailable:
+                pass
+        return settings.SALESFORCE_API_VERSION
+    
+    async def _metadata(self, name: str, path: str, parse, command: str) -> SalesforceResult:
+        """Metadata from the cache, revalidated in the background once stale, or fetched and cached"""
+        api_version = await self.api_version()
+        entry = self.metadata.get(self.org, api_version, name) if self.metadata is not None else None
+        key = ('metadata', self.org, name.lower())
+        def load():
+            return self._coalesced(key, lambda: self._load_metadata(name, path, parse, command, api_version, entry))
+        
+        if entry is None:
+            return await load()
+        if self.metadata.is_stale(entry):
+            self.metadata.revalidate(key, load)
+        return SalesforceResult(success=True, data={'status': 0, 'result': entry.data})
+    
+    async def _load_metadata(self, name: str, path: str, parse, command: str, api_version: str, entry) -> SalesforceResult:
+        """Fetch metadata, conditionally on the cached entry when there is one, and cache it"""
+        result = await self._run_rest('get_if_modified', path, entry.last_modified if entry else None)
+        if result is None:
+            result = await self._run_command(command)
+            if result.success and self.metadata is not None and isinstance(result.data, dict) and 'result' in result.data:
+                self.metadata.put(self.org, api_version, name, result.data['result'])
+            return result
+        if not result.success:
+            return result
+        
+        data, last_modified = result.data
+        if data is None:
+            # Not modified since the cached entry
+            self.metadata.touch(self.org, api_version, name)
+            data = entry.data
+        else:
+            data = parse(data)
+            if self.metadata is not None:
+                self.metadata.put(self.org, api_version, name, data, last_modified)
+        return SalesforceResult(success=True, data={'status': 0, 'result': data})
     
     async def get_org_info(self) -> SalesforceResult:
         """Get information about the current org"""
@@ -105,6 +290,17 @@ class AsyncSalesforceClient:
     
     async def create_record(self, object_name: str, data: Dict[str, Any]) -> SalesforceResult:
         """Create a new Salesforce record"""
+        result = await self._create_record(object_name, data)
+        self._invalidate(object_name)
+        return result
+    
+    async def _create_record(self, object_name: str, data: Dict[str, Any]) -> SalesforceResult:
+        result = await self._run_rest('create', object_name, data)
+        if result is not None:
+            if result.success:
+                result.data = {'id': result.data}
+            return result
+        
         # Convert data to JSON
         json_data = json.dumps(data)
         escaped_json = json_data.replace('"', '\\"')
@@ -124,6 +320,15 @@ class AsyncSalesforceClient:
     
     async def update_record(self, object_name: str, record_id: str, data: Dict[str, Any]) -> SalesforceResult:
         """Update an existing Salesforce record"""
+        result = await self._update_record(object_name, record_id, data)
+        self._invalidate(object_name)
+        return result
+    
+    async def _update_record(self, object_name: str, record_id: str, data: Dict[str, Any]) -> SalesforceResult:
+        result = await self._run_rest('update', object_name, record_id, data, envelope=True)
+        if result is not None:
+            return result
+        
         # Convert data to JSON
         json_data = json.dumps(data)
         escaped_json = json_data.replace('"', '\\"')
@@ -133,66 +338,188 @@ class AsyncSalesforceClient:
     
     async def delete_record(self, object_name: str, record_id: str) -> SalesforceResult:
         """Delete a Salesforce record"""
+        result = await self._delete_record(object_name, record_id)
+        self._invalidate(object_name)
+        return result
+    
+    async def _delete_record(self, object_name: str, record_id: str) -> SalesforceResult:
+        result = await self._run_rest('delete', object_name, record_id, envelope=True)
+        if result is not None:
+            return result
+        
         command = f'sf data delete record --sobject {object_name} --record-id {record_id} --target-org {self.org} --json'
         return await self._run_command(command)
     
+    def _invalidate(self, object_name: str):
+        """Drop cached queries of an sObject after writing to it, whether or not the write succeeded"""
+        if self.cache is not None:
+            self.cache.invalidate(object_name)
+        # Queries in flight may have read the sObject before the write: don't join them
+        name = object_name.lower()
+        self.flights.forget(lambda key: key[0] == 'query' and key[1] == self.org and name in soql_objects(key[2]))
+    
+    async def create_records(self, object_name: str, records: List[Dict[str, Any]]) -> SalesforceResult:
+        """Create records through sObject Collections, 200 per request and several requests at a time"""
+        return await self._write_records('create', object_name, records)
+    
+    async def update_records(self, object_name: str, records: List[Dict[str, Any]]) -> SalesforceResult:
+        """Update records given with their Id through sObject Collections, like create_records"""
+        return await self._write_records('update', object_name, records)
+    
+    async def delete_records(self, object_name: str, record_ids: List[str]) -> SalesforceResult:
+        """Delete records through sObject Collections, like create_records"""
+        return await self._write_records('delete', object_name, [{'Id': record_id} for record_id in record_ids])
+    
     async def bulk_create(self, object_name: str, records: List[Dict[str, Any]]) -> SalesforceResult:
-        """Bulk create multiple Salesforce records"""
-        # For now, we'll implement this as sequential creates
-        # In a production environment, you would use the Bulk API
-        successful_count = 0
-        failed_count = 0
-        errors = []
-        
-        for record in records:
-            result = await self.create_record(object_name, record)
-            if result.success:
-                successful_count += 1
-            else:
-                failed_count += 1
-                errors.append(result.error)
+        """Create many records: through Bulk API 2.0 jobs above ``bulk_threshold`` records, else like create_records"""
+        return await self._write_records('create', object_name, records, bulk=True)
+    
+    async def bulk_update(self, object_name: str, records: List[Dict[str, Any]]) -> SalesforceResult:
+        """Update many records given with their Id, like bulk_create"""
+        return await self._write_records('update', object_name, records, bulk=True)
+    
+    async def _write_records(
+        self, operation: str, object_name: str, records: List[Dict[str, Any]], bulk: bool = False
+    ) -> SalesforceResult:
+        """Create, update or delete records, reporting the outcome of each one"""
+        results: List[Optional[Dict[str, Any]]] = [None] * len(records)
+        if operation != 'create':
+            for i, record in enumerate(records):
+                if not record.get('Id'):
+                    results[i] = {'id': None, 'success': False, 'error': "Record missing 'Id' field"}
+        positions = [i for i, result in enumerate(results) if result is None]
+        try:
+            written = None
+            if bulk and self.rest is not None and len(positions) > self.bulk_threshold:
+                try:
+                    written = await BulkIngest(self.rest, self.call_limit).run(
+                        object_name, BULK_OPERATIONS[operation], [records[i] for i in positions]
+                    )
+                except SalesforceRestUnavailable as e:
+                    logger.warning(f"Salesforce REST transport unavailable, using the sf CLI: {e}")
+            if written is None:
+                # Collection requests run concurrently, up to the call limit
+                chunks = await asyncio.gather(*(
+                    self._write_collection(operation, object_name, [records[i] for i in positions[start:start + COLLECTION_SIZE]])
+                    for start in range(0, len(positions), COLLECTION_SIZE)
+                ))
+                written = [result for chunk in chunks for result in chunk]
+            for i, result in zip(positions, written):
+                results[i] = result
+        finally:
+            # Collections and ingest jobs don't go through create_record and the like
+            self._invalidate(object_name)
         
+        errors = [f"Record {i + 1}: {result['error']}" for i, result in enumerate(results) if not result['success']]
+        error = None
+        if errors:
+            error = '; '.join(errors[:BULK_ERRORS_SHOWN])
+            if len(errors) > BULK_ERRORS_SHOWN:
+                error += f" (and {len(errors) - BULK_ERRORS_SHOWN} more)"
         return SalesforceResult(
-            success=failed_count == 0,
+            success=not errors,
             data={
-                'successful_count': successful_count,
-                'failed_count': failed_count,
-                'errors': errors
+                'successful_count': len(results) - len(errors),
+                'failed_count': len(errors),
+                'errors': errors,
+                'results': results
             },
-            error='; '.join(errors) if errors else None
+            error=error
         )
     
-    async def bulk_update(self, object_name: str, records: List[Dict[str, Any]]) -> SalesforceResult:
-        """Bulk update multiple Salesforce records"""
-        # For now, we'll implement this as sequential updates
-        # In a production environment, you would use the Bulk API
-        successful_count = 0
-        failed_count = 0
-        errors = []
+    async def _write_collection(self, operation: str, object_name: str, records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Write up to COLLECTION_SIZE records in one request, or one call each over the CLI"""
+        if operation == 'delete':
+            result = await self._run_rest('delete_many', [record['Id'] for record in records])
+        else:
+            result = await self._run_rest(f'{operation}_many', object_name, records)
+        if result is None:
+            return await asyncio.gather(*(self._write_record(operation, object_name, record) for record in records))
+        if not result.success:
+            return [{'id': record.get('Id'), 'success': False, 'error': result.error} for record in records]
+        return [
+            {
+                'id': outcome.get('id') or record.get('Id'),
+                'success': bool(outcome.get('success')),
+                'error': '; '.join(
+                    f"{error.get('statusCode')}: {error.get('message')}" for error in outcome.get('errors') or []
+                ) or None,
+            }
+            for record, outcome in zip(records, result.data)
+        ]
+    
+    async def _write_record(self, operation: str, object_name: str, record: Dict[str, Any]) -> Dict[str, Any]:
+        if operation == 'create':
+            result = await self._create_record(object_name, record)
+            record_id = result.data.get('id') if result.success and isinstance(result.data, dict) else None
+        elif operation == 'update':
+            data = {field: value for field, value in record.items() if field != 'Id'}
+            result = await self._update_record(object_name, record['Id'], data)
+            record_id = record['Id']
+        else:
+            result = await self._delete_record(object_name, record['Id'])
+            record_id = record['Id']
+        return {'id': record_id, 'success': result.success, 'error': result.error}
+    
+    async def create_record_graph(self, records: List[Dict[str, Any]]) -> SalesforceResult:
+        """Create related records of several sObjects in one all-or-nothing composite graph request
         
-        for record in records:
-            if 'Id' not in record:
-                failed_count += 1
-                errors.append("Record missing 'Id' field")
-                continue
-            
-            record_id = record.pop('Id')
-            result = await self.update_record(object_name, record_id, record)
-            if result.success:
-                successful_count += 1
-            else:
-                failed_count += 1
-                errors.append(result.error)
+        Each record is ``{'object_name', 'reference_id', 'data'}``, and a value
+        of ``data`` can be the Id of an earlier record as ``'@{reference_id.id}'``.
+        Either every record is created, and data lists them with their Id, or
+        none is. Needs the REST transport: the CLI could not roll back.
+        """
+        error = self._graph_error(records)
+        if error:
+            return SalesforceResult(success=False, error=error)
+        try:
+            result = await self._run_rest('create_graph', records)
+        finally:
+            for object_name in {record['object_name'] for record in records}:
+                self._invalidate(object_name)
+        if result is None:
+            return SalesforceResult(success=False, error="Composite graphs need the Salesforce REST API, which is unavailable")
+        if not result.success:
+            return result
         
-        return SalesforceResult(
-            success=failed_count == 0,
-            data={
-                'successful_count': successful_count,
-                'failed_count': failed_count,
-                'errors': errors
-            },
-            error='; '.join(errors) if errors else None
-        )
+        responses = result.data['graphResponse']['compositeResponse']
+        if result.data.get('isSuccessful'):
+            ids = {response['referenceId']: response['body']['id'] for response in responses}
+            created = [
+                {'reference_id': record['reference_id'], 'object_name': record['object_name'], 'id': ids.get(record['reference_id'])}
+                for record in records
+            ]
+            return SalesforceResult(success=True, data={'records': created})
+        # Records after the one that failed only report that the graph was rolled back
+        errors = [
+            f"{response['referenceId']}: {error.get('errorCode')}: {error.get('message')}"
+            for response in responses if isinstance(response.get('body'), list)
+            for error in response['body'] if error.get('errorCode') != 'PROCESSING_HALTED'
+        ]
+        return SalesforceResult(success=False, data={'records': []}, error='; '.join(errors) or 'The graph was rolled back')
+    
+    @staticmethod
+    def _graph_error(records: List[Dict[str, Any]]) -> Optional[str]:
+        """Why a composite graph would be rejected, or None"""
+        if not records:
+            return "The graph has no records"
+        if len(records) > GRAPH_MAX_RECORDS:
+            return f"A graph takes at most {GRAPH_MAX_RECORDS} records, not {len(records)}"
+        seen = set()
+        for i, record in enumerate(records):
+            reference_id = record.get('reference_id')
+            if not record.get('object_name') or not isinstance(record.get('data'), dict):
+                return f"Record {i + 1} needs an object_name and a data dictionary"
+            if not isinstance(reference_id, str) or not GRAPH_REFERENCE_ID.match(reference_id):
+                return f"Record {i + 1} needs a reference_id of letters, digits and underscores"
+            if reference_id in seen:
+                return f"Reference id {reference_id} is used twice"
+            for value in record['data'].values():
+                for reference in GRAPH_REFERENCE.findall(value) if isinstance(value, str) else []:
+                    if reference not in seen:
+                        return f"Record {reference_id} refers to {reference}, which is not an earlier record of the graph"
+            seen.add(reference_id)
+        return None
     
     def format_query_result(self, result: SalesforceResult) -> str:
         """Format query result for display"""
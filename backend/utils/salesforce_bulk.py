@@ -0,0 +1,235 @@
+"""Bulk API 2.0 ingest jobs for creating and updating many records.
+
+Bulk writes used to create or update records one call at a time: a CLI
+process or a REST round trip each, so 10k records took hours. ``BulkIngest``
+sends them as CSV in ingest jobs instead:
+
+1. create a job for the sObject and operation (``POST jobs/ingest``);
+2. upload the records (``PUT jobs/ingest/{id}/batches``) and close the job;
+3. poll its state with exponential backoff until Salesforce processed it;
+4. read the successful and failed records back and match them to the input.
+
+Result rows echo the uploaded row, but not its position: updates are
+matched by Id, inserts by their uploaded values, identical rows in upload
+order. Rows Salesforce echoed differently are matched to the remaining
+records by order, when they account for all of them.
+
+A job whose upload or polling fails, or that outlasts
+``SALESFORCE_BULK_TIMEOUT_SECONDS``, is aborted, so it is not left open on
+the org. Once a job exists its results are read whatever happened, since
+it may have written records.
+
+Records are split into jobs of at most ``MAX_UPLOAD_BYTES`` of CSV, the size
+of one upload. Salesforce splits a job into batches it processes in
+parallel, so jobs run one after another.
+"""
+
+import asyncio
+import csv
+import io
+import logging
+import time
+from collections import defaultdict, deque
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import httpx
+
+from config.settings import settings
+from .salesforce_concurrency import CallLimit, salesforce_call_limit
+from .salesforce_rest import AsyncSalesforceRestTransport, SalesforceRestUnavailable
+
+logger = logging.getLogger(__name__)
+
+# Raw CSV per job; an upload may be 150 MB once base64-encoded
+MAX_UPLOAD_BYTES = 100 * 1024 * 1024
+
+# Job states are polled after this long at first, then backing off up to the maximum
+POLL_INITIAL_SECONDS = 0.5
+POLL_MAX_SECONDS = 10.0
+POLL_BACKOFF = 1.5
+
+FINAL_STATES = {"JobComplete", "Failed", "Aborted"}
+
+# An empty CSV value leaves a field unchanged; this one sets it to null
+NULL_VALUE = "#N/A"
+
+def csv_value(value: Any) -> str:
+    if value is None:
+        return NULL_VALUE
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+
+def csv_row(record: Dict[str, Any], fields: List[str]) -> List[str]:
+    """CSV values of a record; fields it does not have are left empty."""
+    return [csv_value(record[field]) if field in record else "" for field in fields]
+
+
+def csv_chunks(
+    records: Iterable[Tuple[int, Dict[str, Any]]], fields: List[str], max_bytes: int = MAX_UPLOAD_BYTES
+) -> Iterator[Tuple[List[int], bytes]]:
+    """Split ``(position, record)`` pairs into CSV documents of at most ``max_bytes``.
+
+    Yields the positions of the records in each document, and the document.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+
+    def line(values: List[str]) -> bytes:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerow(values)
+        return buffer.getvalue().encode()
+
+    header = line(fields)
+    positions, lines, size = [], [header], len(header)
+    for position, record in records:
+        row = line(csv_row(record, fields))
+        if positions and size + len(row) > max_bytes:
+            yield positions, b"".join(lines)
+            positions, lines, size = [], [header], len(header)
+        positions.append(position)
+        lines.append(row)
+        size += len(row)
+    if positions:
+        yield positions, b"".join(lines)
+
+
+def match_results(keys: Dict[int, Tuple[str, ...]], row_keys: List[Tuple[str, ...]]) -> List[Optional[int]]:
+    """Position of the record each result row belongs to, ``None`` if unknown.
+
+    ``keys`` maps the positions of a job's records, in upload order, to their
+    key values, and ``row_keys`` gives the same values read from each result
+    row. Rows not matched by key are matched by order to the remaining
+    records, but only when they are exactly as many.
+    """
+    pending: Dict[Tuple[str, ...], Deque[int]] = defaultdict(deque)
+    for position, key in keys.items():
+        pending[key].append(position)
+    matched = [pending[key].popleft() if pending.get(key) else None for key in row_keys]
+    unmatched_rows = [i for i, position in enumerate(matched) if position is None]
+    unmatched = sorted(position for positions in pending.values() for position in positions)
+    if len(unmatched_rows) == len(unmatched):
+        for i, position in zip(unmatched_rows, unmatched):
+            matched[i] = position
+    return matched
+
+
+class BulkIngest:
+    """Inserts or updates records of an org through Bulk API 2.0 ingest jobs."""
+
+    def __init__(
+        self,
+        rest: AsyncSalesforceRestTransport,
+        call_limit: CallLimit = salesforce_call_limit,
+        timeout_seconds: float = settings.SALESFORCE_BULK_TIMEOUT_SECONDS,
+        max_upload_bytes: int = MAX_UPLOAD_BYTES,
+    ):
+        self.rest = rest
+        self.call_limit = call_limit
+        self.timeout_seconds = timeout_seconds
+        self.max_upload_bytes = max_upload_bytes
+
+    async def run(self, object_name: str, operation: str, records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """``{id, success, error}`` of each record, in order, after ``operation`` (``insert`` or ``update``).
+
+        Raises ``SalesforceRestUnavailable`` if the org could not be reached
+        before the first job was created, when nothing has been written.
+        Any other error is reported in the results of the records it affected.
+        """
+        fields = list(dict.fromkeys(field for record in records for field in record if field != "attributes"))
+        key_fields = ["Id"] if operation == "update" else fields
+        results: List[Optional[Dict[str, Any]]] = [None] * len(records)
+        created_job = False
+        for positions, data in csv_chunks(enumerate(records), fields, self.max_upload_bytes):
+            try:
+                job_id = await self._create_job(object_name, operation)
+            except Exception as e:
+                if isinstance(e, SalesforceRestUnavailable) and not created_job:
+                    raise
+                job, successful, failed = {"errorMessage": f"Creating a job failed: {e}"}, [], []
+            else:
+                created_job = True
+                job, successful, failed = await self._process(job_id, data)
+
+            keys = {position: tuple(csv_row(records[position], key_fields)) for position in positions}
+            rows = [(row, True) for row in successful] + [(row, False) for row in failed]
+            matched = match_results(keys, [tuple(row.get(field, "") for field in key_fields) for row, _ in rows])
+            for position, (row, success) in zip(matched, rows):
+                if position is not None:
+                    results[position] = {
+                        "id": row.get("sf__Id") or None,
+                        "success": success,
+                        "error": None if success else row.get("sf__Error"),
+                    }
+            error = job.get("errorMessage") or f"Not processed: job ended in state {job.get('state')}"
+            for position in positions:
+                if results[position] is None:
+                    results[position] = {"id": None, "success": False, "error": error}
+        return results
+
+    async def _request(self, method: str, path: str, **kwargs) -> httpx.Response:
+        async with self.call_limit.slot():
+            return await self.rest.request(method, path, **kwargs)
+
+    async def _create_job(self, object_name: str, operation: str) -> str:
+        job = (await self._request("POST", "jobs/ingest", json={
+            "object": object_name, "operation": operation, "contentType": "CSV", "lineEnding": "LF",
+        })).json()
+        logger.info(f"Created Bulk API {operation} job {job['id']} for {object_name}")
+        return job["id"]
+
+    async def _process(self, job_id: str, data: bytes) -> Tuple[Dict[str, Any], List[Dict[str, str]], List[Dict[str, str]]]:
+        """Upload the records of a job and wait for it; returns the job and its successful and failed rows.
+
+        Request errors end up in the job's ``errorMessage`` rather than raised.
+        """
+        try:
+            await self._request("PUT", f"jobs/ingest/{job_id}/batches", content=data, headers={"Content-Type": "text/csv"})
+            await self._request("PATCH", f"jobs/ingest/{job_id}", json={"state": "UploadComplete"})
+        except Exception as e:
+            # Nothing is processed before the upload is complete
+            await self._abort(job_id)
+            return {"errorMessage": f"Uploading to job {job_id} failed: {e}"}, [], []
+        try:
+            job = await self._wait(job_id)
+        except Exception as e:
+            await self._abort(job_id)
+            job = {"errorMessage": f"Waiting for job {job_id} failed: {e}"}
+        # Records processed before a failure or an abort keep their results
+        try:
+            return job, await self._results(job_id, "successfulResults"), await self._results(job_id, "failedResults")
+        except Exception as e:
+            return {"errorMessage": f"Reading the results of job {job_id} failed: {e}"}, [], []
+
+    async def _wait(self, job_id: str) -> Dict[str, Any]:
+        deadline = time.monotonic() + self.timeout_seconds
+        delay = POLL_INITIAL_SECONDS
+        while True:
+            await asyncio.sleep(delay)
+            job = await self._job(job_id)
+            if job["state"] in FINAL_STATES:
+                return job
+            if time.monotonic() >= deadline:
+                await self._abort(job_id)
+                # The job may have finished before the abort
+                job = await self._job(job_id)
+                if job["state"] != "JobComplete":
+                    job["errorMessage"] = f"Job {job_id} did not finish within {self.timeout_seconds:g} seconds and was aborted"
+                return job
+            delay = min(delay * POLL_BACKOFF, POLL_MAX_SECONDS)
+
+    async def _job(self, job_id: str) -> Dict[str, Any]:
+        return (await self._request("GET", f"jobs/ingest/{job_id}")).json()
+
+    async def _abort(self, job_id: str) -> None:
+        """Abort a job, if it is still open or in progress."""
+        try:
+            await self._request("PATCH", f"jobs/ingest/{job_id}", json={"state": "Aborted"})
+        except Exception as e:
+            logger.warning(f"Aborting Bulk API job {job_id} failed: {e}")
+
+    async def _results(self, job_id: str, kind: str) -> List[Dict[str, str]]:
+        response = await self._request("GET", f"jobs/ingest/{job_id}/{kind}/")
+        return list(csv.DictReader(io.StringIO(response.text)))
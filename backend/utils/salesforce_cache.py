@@ -0,0 +1,271 @@
+"""In-process cache of SOQL query results.
+
+The agents' tools and the ``/*/names`` routes run the same SOQL against the
+org over and over. ``SoqlCache`` keeps successful results keyed by org and
+normalized SOQL, for ``SOQL_CACHE_TTL_SECONDS`` or the TTL configured for
+the queried sObject. For ``SOQL_CACHE_STALE_SECONDS`` after that, the
+cached result is still returned while a single background refresh runs.
+Writes through the clients invalidate every query of the written sObject.
+Writes made outside this process are picked up when the TTL expires.
+Queries with subqueries are not cached: a child relationship like
+``(SELECT Id FROM Contacts)`` does not name the sObject it reads.
+
+Cached results are shared: callers must not modify their records.
+"""
+
+import asyncio
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field, replace
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, Optional, Tuple
+
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+_LITERAL = re.compile(r"('(?:[^'\\]|\\.)*')")
+_WHITESPACE = re.compile(r"\s+")
+_FROM = re.compile(r"\bFROM\s+(\w+)", re.IGNORECASE)
+_RELATIONSHIP = re.compile(r"\b([A-Za-z]\w*)\.[A-Za-z]")
+_SUBQUERY = re.compile(r"\(\s*SELECT\b", re.IGNORECASE)
+
+
+def normalize_soql(soql: str) -> str:
+    """``soql`` with whitespace outside string literals collapsed, as the cache key."""
+    parts = _LITERAL.split(soql.strip().rstrip(";").strip())
+    return "".join(part if i % 2 else _WHITESPACE.sub(" ", part) for i, part in enumerate(parts))
+
+
+def soql_objects(soql: str) -> FrozenSet[str]:
+    """Lower-cased names of the sObjects ``soql`` reads.
+
+    That is the objects after ``FROM``, and the parents reached through
+    relationship fields like ``Account.Name`` or ``Parent__r.Name``. A
+    relationship whose name differs from its object's, like ``Owner``, is
+    not matched and relies on the TTL.
+    """
+    soql = "".join(_LITERAL.split(soql)[::2])
+    names = set(_FROM.findall(soql))
+    for name in _RELATIONSHIP.findall(soql):
+        names.add(name[:-3] + "__c" if name.endswith("__r") else name)
+    return frozenset(name.lower() for name in names)
+
+
+def is_cacheable(soql: str) -> bool:
+    """Whether the sObjects ``soql`` reads are known, which is not the case with subqueries."""
+    return _SUBQUERY.search("".join(_LITERAL.split(soql)[::2])) is None
+
+
+@dataclass
+class _Entry:
+    result: Any
+    objects: FrozenSet[str]
+    expires: float
+    stale_until: float
+
+
+@dataclass
+class SoqlCacheMetrics:
+    """Counters describing how effective the cache is, in total and per sObject."""
+    hits: int = 0
+    stale_hits: int = 0  # expired results served while refreshing
+    misses: int = 0
+    bypasses: int = 0  # queries not cached, see ``is_cacheable``
+    refreshes: int = 0
+    failed_refreshes: int = 0
+    invalidations: int = 0
+    evictions: int = 0
+    by_object: Dict[str, Dict[str, int]] = field(default_factory=dict)
+
+    def record(self, kind: str, objects: FrozenSet[str]) -> None:
+        setattr(self, kind, getattr(self, kind) + 1)
+        for name in objects:
+            counters = self.by_object.setdefault(name, {"hits": 0, "stale_hits": 0, "misses": 0})
+            counters[kind] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.stale_hits) / lookups, 4) if lookups else 0,
+            "bypasses": self.bypasses,
+            "refreshes": self.refreshes,
+            "failed_refreshes": self.failed_refreshes,
+            "invalidations": self.invalidations,
+            "evictions": self.evictions,
+            "by_object": {name: dict(counters) for name, counters in sorted(self.by_object.items())},
+        }
+
+
+class SoqlCache:
+    """Bounded LRU cache of query results with per-sObject TTLs and stale-while-revalidate.
+
+    Shared by the sync and async clients, so it is guarded by a lock rather
+    than relying on the event loop. Only successful results are cached. A
+    load that was running when one of its sObjects got invalidated is
+    returned to its caller but not stored.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = settings.SOQL_CACHE_SIZE,
+        ttl_seconds: float = settings.SOQL_CACHE_TTL_SECONDS,
+        object_ttl_seconds: Optional[Dict[str, float]] = None,
+        stale_seconds: float = settings.SOQL_CACHE_STALE_SECONDS,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        object_ttl_seconds = settings.SOQL_CACHE_OBJECT_TTL_SECONDS if object_ttl_seconds is None else object_ttl_seconds
+        self.object_ttls = {name.lower(): ttl for name, ttl in object_ttl_seconds.items()}
+        self.stale = stale_seconds
+        self.metrics = SoqlCacheMetrics()
+
+        self._entries: "OrderedDict[Tuple[str, str], _Entry]" = OrderedDict()
+        self._generations: Dict[str, int] = {}  # sObject -> invalidation count
+        self._refreshing: set = set()
+        self._tasks: set = set()  # background refreshes, referenced until done
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def ttl_for(self, objects: FrozenSet[str]) -> float:
+        """TTL of a query reading ``objects``: the shortest of theirs."""
+        return min((self.object_ttls.get(name, self.ttl) for name in objects), default=self.ttl)
+
+    async def get_or_load(self, org: str, soql: str, load: Callable[[], Awaitable[Any]]) -> Any:
+        """Return the cached result of ``soql``, loading it on a miss.
+
+        An expired result still within the stale window is returned at once,
+        and reloaded in a background task. Queries that are not cacheable
+        are always loaded.
+        """
+        if not self._cacheable(soql):
+            return await load()
+        key, objects = (org, normalize_soql(soql)), soql_objects(soql)
+        cached, fresh = self._lookup(key, objects)
+        if cached is not None:
+            if not fresh and self._start_refresh(key):
+                task = asyncio.create_task(self._refresh(key, objects, load))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+            return replace(cached)
+        generation = self._generation(objects)
+        result = await load()
+        self._store(key, objects, result, generation)
+        return result
+
+    def get_or_load_sync(self, org: str, soql: str, load: Callable[[], Any]) -> Any:
+        """Synchronous ``get_or_load``; refreshes run in a background thread."""
+        if not self._cacheable(soql):
+            return load()
+        key, objects = (org, normalize_soql(soql)), soql_objects(soql)
+        cached, fresh = self._lookup(key, objects)
+        if cached is not None:
+            if not fresh and self._start_refresh(key):
+                threading.Thread(target=self._refresh_sync, args=(key, objects, load), daemon=True).start()
+            return replace(cached)
+        generation = self._generation(objects)
+        result = load()
+        self._store(key, objects, result, generation)
+        return result
+
+    def invalidate(self, object_name: str) -> None:
+        """Forget every query reading ``object_name``, including loads in progress."""
+        name = object_name.lower()
+        with self._lock:
+            self._generations[name] = self._generations.get(name, 0) + 1
+            keys = [key for key, entry in self._entries.items() if name in entry.objects]
+            for key in keys:
+                del self._entries[key]
+            self.metrics.invalidations += len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def _cacheable(self, soql: str) -> bool:
+        if is_cacheable(soql):
+            return True
+        with self._lock:
+            self.metrics.bypasses += 1
+        return False
+
+    def _lookup(self, key: Tuple[str, str], objects: FrozenSet[str]) -> Tuple[Optional[Any], bool]:
+        """The cached result of ``key`` if any, and whether it is fresh."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.stale_until < now:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.metrics.record("misses", objects)
+                return None, False
+            self._entries.move_to_end(key)
+            fresh = entry.expires >= now
+            self.metrics.record("hits" if fresh else "stale_hits", objects)
+            return entry.result, fresh
+
+    def _generation(self, objects: FrozenSet[str]) -> Tuple[int, ...]:
+        with self._lock:
+            return tuple(self._generations.get(name, 0) for name in sorted(objects))
+
+    def _store(self, key: Tuple[str, str], objects: FrozenSet[str], result: Any, generation: Tuple[int, ...]) -> None:
+        if not getattr(result, "success", False):
+            return
+        now = time.monotonic()
+        expires = now + self.ttl_for(objects)
+        with self._lock:
+            if tuple(self._generations.get(name, 0) for name in sorted(objects)) != generation:
+                return  # an sObject it reads was written meanwhile
+            self._entries.pop(key, None)
+            self._entries[key] = _Entry(result, objects, expires, expires + self.stale)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.metrics.evictions += 1
+
+    def _start_refresh(self, key: Tuple[str, str]) -> bool:
+        with self._lock:
+            if key in self._refreshing:
+                return False
+            self._refreshing.add(key)
+            return True
+
+    def _refreshed(self, key: Tuple[str, str], result: Any) -> None:
+        with self._lock:
+            self._refreshing.discard(key)
+            self.metrics.refreshes += 1
+            if not getattr(result, "success", False):
+                self.metrics.failed_refreshes += 1
+
+    async def _refresh(self, key: Tuple[str, str], objects: FrozenSet[str], load: Callable[[], Awaitable[Any]]) -> None:
+        generation = self._generation(objects)
+        result = None
+        try:
+            result = await load()
+            self._store(key, objects, result, generation)
+        except Exception as e:
+            logger.warning(f"Refreshing cached SOQL result failed: {e}")
+        finally:
+            self._refreshed(key, result)
+
+    def _refresh_sync(self, key: Tuple[str, str], objects: FrozenSet[str], load: Callable[[], Any]) -> None:
+        generation = self._generation(objects)
+        result = None
+        try:
+            result = load()
+            self._store(key, objects, result, generation)
+        except Exception as e:
+            logger.warning(f"Refreshing cached SOQL result failed: {e}")
+        finally:
+            self._refreshed(key, result)
+
+
+# Process-wide cache used by the Salesforce clients; ``None`` when disabled
+soql_cache: Optional[SoqlCache] = SoqlCache() if settings.SOQL_CACHE_SIZE > 0 else None
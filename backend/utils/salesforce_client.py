@@ -1,11 +1,19 @@
 import subprocess
 import json
+import logging
 from typing import Dict, Any, Optional, List
 from dataclasses import dataclass
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from settings import SALESFORCE_ORG, SFDX_DIR
+import httpx
+from config.settings import settings
+from .salesforce_cache import SoqlCache, soql_cache
+from .salesforce_metadata import OBJECT_LIST, MetadataCache, metadata_cache
+from .salesforce_rest import SalesforceRestError, SalesforceRestTransport, SalesforceRestUnavailable
+
+logger = logging.getLogger(__name__)
 
 
 @dataclass
@@ -20,9 +28,43 @@ class SalesforceResult:
 class SalesforceClient:
     """Client for interacting with Salesforce CLI and executing SOQL queries"""
     
-    def __init__(self, org: str = SALESFORCE_ORG, working_dir: str = SFDX_DIR):
+    def __init__(
+        self,
+        org: str = SALESFORCE_ORG,
+        working_dir: str = SFDX_DIR,
+        transport: str = settings.SALESFORCE_TRANSPORT,
+        cache: Optional[SoqlCache] = soql_cache,
+        metadata: Optional[MetadataCache] = metadata_cache,
+    ):
         self.org = org
         self.working_dir = working_dir
+        self.cache = cache
+        self.metadata = metadata
+        # Calls go through the sf CLI when there is no REST transport or it is unavailable
+        self.rest = SalesforceRestTransport(org, working_dir) if transport == "rest" else None
+    
+    def close(self):
+        """Close the pooled connections of the REST transport"""
+        if self.rest is not None:
+            self.rest.close()
+    
+    def _run_rest(self, operation: str, *args, envelope: bool = False) -> Optional[SalesforceResult]:
+        """Run an operation of the REST transport, or return None to have the caller use the CLI.
+        
+        With ``envelope``, data is wrapped like the CLI's ``--json`` output.
+        """
+        if self.rest is None:
+            return None
+        try:
+            data = getattr(self.rest, operation)(*args)
+        except SalesforceRestUnavailable as e:
+            logger.warning(f"Salesforce REST transport unavailable, using the sf CLI: {e}")
+            return None
+        except (SalesforceRestError, httpx.HTTPError) as e:
+            return SalesforceResult(success=False, error=str(e), raw_output=str(e))
+        if envelope:
+            data = {'status': 0, 'result': data}
+        return SalesforceResult(success=True, data=data)
     
     def _run_command(self, command: str) -> SalesforceResult:
         """Execute a Salesforce CLI command and return structured result"""
@@ -62,7 +104,18 @@ class SalesforceClient:
             return output
     
     def query(self, soql: str, format_output: bool = True) -> SalesforceResult:
+        """Execute a SOQL query against the Salesforce org, answering repeated queries from the cache"""
+        if format_output and self.cache is not None:
+            return self.cache.get_or_load_sync(self.org, soql, lambda: self._query(soql))
+        return self._query(soql, format_output)
+    
+    def _query(self, soql: str, format_output: bool = True) -> SalesforceResult:
         """Execute a SOQL query against the Salesforce org"""
+        if format_output:
+            result = self._run_rest('query', soql)
+            if result is not None:
+                return result
+        
         # Escape quotes in the query
         escaped_query = soql.replace('"', '\\"')
         
@@ -86,14 +139,53 @@ class SalesforceClient:
         return result
     
     def describe_object(self, object_name: str) -> SalesforceResult:
-        """Get metadata description for a Salesforce object"""
+        """Get metadata description for a Salesforce object, from the metadata cache when it has it"""
         command = f'sf sobject describe --sobject {object_name} --target-org {self.org} --json'
-        return self._run_command(command)
+        return self._metadata(object_name, f'sobjects/{object_name}/describe', lambda data: data, command)
     
     def list_objects(self) -> SalesforceResult:
-        """List all available Salesforce objects"""
+        """List all available Salesforce objects, from the metadata cache when it has them"""
         command = f'sf sobject list --target-org {self.org} --json'
-        return self._run_command(command)
+        return self._metadata(
+            OBJECT_LIST, 'sobjects', lambda data: [sobject['name'] for sobject in data['sobjects']], command
+        )
+    
+    @property
+    def api_version(self) -> str:
+        """API version of the org, which keys its cached metadata so an org upgrade invalidates it"""
+        if self.rest is not None:
+            try:
+                return self.rest.auth().api_version
+            except SalesforceRestUnavailable:
+                pass
+        return settings.SALESFORCE_API_VERSION
+    
+    def _metadata(self, name: str, path: str, parse, command: str) -> SalesforceResult:
+        """Metadata from the cache, or fetched and cached; stale entries are revalidated before returning"""
+        api_version = self.api_version
+        entry = self.metadata.get(self.org, api_version, name) if self.metadata is not None else None
+        if entry is not None and not self.metadata.is_stale(entry):
+            return SalesforceResult(success=True, data={'status': 0, 'result': entry.data})
+        
+        result = self._run_rest('get_if_modified', path, entry.last_modified if entry else None)
+        if result is None:
+            result = self._run_command(command)
+            if result.success and self.metadata is not None and isinstance(result.data, dict) and 'result' in result.data:
+                self.metadata.put(self.org, api_version, name, result.data['result'])
+            return result
+        if not result.success:
+            return result
+        
+        data, last_modified = result.data
+        if data is None:
+            # Not modified since the cached entry
+            self.metadata.touch(self.org, api_version, name)
+            data = entry.data
+        else:
+            data = parse(data)
+            if self.metadata is not None:
+                self.metadata.put(self.org, api_version, name, data, last_modified)
+        return SalesforceResult(success=True, data={'status': 0, 'result': data})
     
     def get_org_info(self) -> SalesforceResult:
         """Get information about the current org"""
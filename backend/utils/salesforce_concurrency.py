@@ -0,0 +1,94 @@
+"""Coalescing and concurrency limiting of Salesforce calls.
+
+When the app loads, several users ask for the same names lists at once.
+``SingleFlight`` makes concurrent identical queries and describes share
+one call, and ``CallLimit`` caps the calls running at the same time
+(``SALESFORCE_MAX_CONCURRENT_CALLS``), so a burst cannot fork hundreds of
+CLI processes or open hundreds of connections.
+"""
+
+import asyncio
+import weakref
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, Optional
+
+from config.settings import settings
+
+
+class SingleFlight:
+    """Concurrent calls with the same key share one execution.
+
+    The call runs in its own task: a caller that is cancelled does not
+    cancel it for the others.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.coalesced = 0
+        self._flights: Dict[Hashable, asyncio.Task] = {}
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+    async def do(self, key: Hashable, call: Callable[[], Awaitable[Any]]) -> Any:
+        """Return the result of ``call()``, or of the identical call already running."""
+        task = self._flights.get(key)
+        if task is not None and task.get_loop() is asyncio.get_running_loop():
+            self.coalesced += 1
+        else:
+            self.calls += 1
+            task = self._flights[key] = asyncio.create_task(call())
+            task.add_done_callback(lambda done: self._finished(key, done))
+        return await asyncio.shield(task)
+
+    def forget(self, predicate: Callable[[Hashable], bool]) -> None:
+        """Have the next calls with a key matching ``predicate`` start over instead of joining."""
+        for key in [key for key in self._flights if predicate(key)]:
+            del self._flights[key]
+
+    def _finished(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._flights.get(key) is task:
+            del self._flights[key]
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"calls": self.calls, "coalesced": self.coalesced, "in_flight": len(self._flights)}
+
+
+class CallLimit:
+    """At most ``limit`` calls at a time in each event loop; 0 means unlimited."""
+
+    def __init__(self, limit: int = settings.SALESFORCE_MAX_CONCURRENT_CALLS):
+        self.limit = limit
+        self.queued = 0  # calls that had to wait for a slot
+        self._semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def _semaphore(self) -> Optional[asyncio.Semaphore]:
+        if self.limit <= 0:
+            return None
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.limit)
+        return semaphore
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Hold one of the ``limit`` slots, waiting for one to be free."""
+        semaphore = self._semaphore()
+        if semaphore is None:
+            yield
+            return
+        if semaphore.locked():
+            self.queued += 1
+        async with semaphore:
+            yield
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"max_concurrent_calls": self.limit, "queued": self.queued}
+
+
+# Process-wide instances shared by the async clients
+salesforce_flights = SingleFlight()
+salesforce_call_limit = CallLimit()
@@ -0,0 +1,196 @@
+"""Persistent cache of sObject describes and of the org's sObject list.
+
+Each describe took a REST call or an ``sf`` process, and the agents look
+the same schemas up again in every run. ``MetadataCache`` keeps them in a
+SQLite file (``SALESFORCE_METADATA_DB``), keyed by org, API version and
+sObject, so they survive restarts. The ones in use are also kept in memory,
+where a lookup takes microseconds.
+
+An entry older than ``SALESFORCE_METADATA_TTL_SECONDS`` is still served
+while the client revalidates it in the background. The REST transport sends
+``If-Modified-Since``, so an unchanged schema costs a ``304`` and no
+download; over the CLI it is fetched again.
+
+Cached metadata is shared: callers must not modify it.
+"""
+
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Set, Tuple
+
+import orjson
+
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Name under which the list of the org's sObjects is kept
+OBJECT_LIST = "*"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sobject_metadata (
+    org TEXT NOT NULL,
+    api_version TEXT NOT NULL,
+    name TEXT NOT NULL,
+    data BLOB NOT NULL,
+    last_modified TEXT,
+    fetched_at REAL NOT NULL,
+    PRIMARY KEY (org, api_version, name)
+)
+"""
+
+
+@dataclass
+class MetadataEntry:
+    data: Any
+    last_modified: Optional[str]  # ``Last-Modified`` of the REST response, sent back as ``If-Modified-Since``
+    fetched_at: float  # when it was fetched or last revalidated (epoch seconds)
+
+
+@dataclass
+class MetadataCacheMetrics:
+    """Counters describing how schema lookups were answered."""
+    hits: int = 0
+    stale_hits: int = 0  # served while revalidating
+    misses: int = 0
+    disk_loads: int = 0  # found in the file, not yet in memory
+    revalidations: int = 0
+    not_modified: int = 0  # revalidations answered with 304
+    failed_revalidations: int = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "disk_loads": self.disk_loads,
+            "revalidations": self.revalidations,
+            "not_modified": self.not_modified,
+            "failed_revalidations": self.failed_revalidations,
+        }
+
+
+class MetadataCache:
+    """sObject describes by org, API version and sObject, in memory and in a SQLite file.
+
+    Thread-safe, so the sync and async clients share it. The file is opened
+    on first use.
+    """
+
+    def __init__(
+        self,
+        path: str = settings.SALESFORCE_METADATA_DB,
+        ttl_seconds: float = settings.SALESFORCE_METADATA_TTL_SECONDS,
+    ):
+        self.path = path
+        self.ttl = ttl_seconds
+        self.metrics = MetadataCacheMetrics()
+        self._entries: Dict[Tuple[str, str, str], MetadataEntry] = {}
+        self._db: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._revalidating: Set[Hashable] = set()
+        self._tasks: Set[asyncio.Task] = set()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode = WAL")
+            self._db.execute(_SCHEMA)
+        return self._db
+
+    @staticmethod
+    def _key(org: str, api_version: str, name: str) -> Tuple[str, str, str]:
+        # sObject names are case-insensitive
+        return org, api_version, name.lower()
+
+    def get(self, org: str, api_version: str, name: str) -> Optional[MetadataEntry]:
+        """Cached metadata of an sObject (or ``OBJECT_LIST``), stale or not, or ``None``."""
+        key = self._key(org, api_version, name)
+        entry = self._entries.get(key)
+        if entry is None:
+            with self._lock:
+                entry = self._entries.get(key) or self._load(key)
+        if entry is None:
+            self.metrics.misses += 1
+        elif self.is_stale(entry):
+            self.metrics.stale_hits += 1
+        else:
+            self.metrics.hits += 1
+        return entry
+
+    def _load(self, key: Tuple[str, str, str]) -> Optional[MetadataEntry]:
+        row = self._connection().execute(
+            "SELECT data, last_modified, fetched_at FROM sobject_metadata WHERE org = ? AND api_version = ? AND name = ?",
+            key,
+        ).fetchone()
+        if row is None:
+            return None
+        self.metrics.disk_loads += 1
+        entry = self._entries[key] = MetadataEntry(orjson.loads(zlib.decompress(row[0])), row[1], row[2])
+        return entry
+
+    def put(self, org: str, api_version: str, name: str, data: Any, last_modified: Optional[str] = None) -> None:
+        key = self._key(org, api_version, name)
+        entry = MetadataEntry(data, last_modified, time.time())
+        with self._lock:
+            self._entries[key] = entry
+            self._connection().execute(
+                "INSERT OR REPLACE INTO sobject_metadata VALUES (?, ?, ?, ?, ?, ?)",
+                (*key, zlib.compress(orjson.dumps(data)), last_modified, entry.fetched_at),
+            )
+
+    def touch(self, org: str, api_version: str, name: str) -> None:
+        """Mark an entry as fresh again, after the org reported it unchanged."""
+        key = self._key(org, api_version, name)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            entry.fetched_at = time.time()
+            self._connection().execute(
+                "UPDATE sobject_metadata SET fetched_at = ? WHERE org = ? AND api_version = ? AND name = ?",
+                (entry.fetched_at, *key),
+            )
+        self.metrics.not_modified += 1
+
+    def is_stale(self, entry: MetadataEntry) -> bool:
+        return time.time() - entry.fetched_at >= self.ttl
+
+    def revalidate(self, key: Hashable, load: Callable[[], Awaitable[Any]]) -> None:
+        """Run ``load`` in the background, unless a revalidation of ``key`` is already running."""
+        if key in self._revalidating:
+            return
+        self._revalidating.add(key)
+        self.metrics.revalidations += 1
+        task = asyncio.create_task(self._revalidate(key, load))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _revalidate(self, key: Hashable, load: Callable[[], Awaitable[Any]]) -> None:
+        try:
+            result = await load()
+            if not result.success:
+                self.metrics.failed_revalidations += 1
+                logger.warning(f"Revalidating cached Salesforce metadata {key} failed: {result.error}")
+        except Exception as e:
+            self.metrics.failed_revalidations += 1
+            logger.warning(f"Revalidating cached Salesforce metadata {key} failed: {e}")
+        finally:
+            self._revalidating.discard(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._connection().execute("DELETE FROM sobject_metadata")
+
+
+# Process-wide cache shared by the clients; ``None`` when disabled
+metadata_cache: Optional[MetadataCache] = MetadataCache() if settings.SALESFORCE_METADATA_TTL_SECONDS > 0 else None
@@ -0,0 +1,465 @@
+"""Direct transport to the Salesforce REST API.
+
+Every call through the ``sf`` CLI starts a shell and a Node.js process, and
+authenticates before any network I/O: about a second per query, describe
+or DML call. The REST transports resolve the org's instance URL and access
+token once, from ``SALESFORCE_INSTANCE_URL`` and ``SALESFORCE_ACCESS_TOKEN``
+or else ``sf org display``, then call the REST API over a pooled (HTTP/2
+when ``h2`` is installed) connection. A token rejected with 401 is resolved
+again and the request retried once.
+
+``SalesforceRestUnavailable`` means the request was never sent, because the
+org could not be authenticated or reached: the clients then fall back to
+the CLI.
+"""
+
+import asyncio
+import json
+import logging
+import subprocess
+import threading
+import time
+from dataclasses import dataclass, replace
+from importlib.util import find_spec
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+import httpx
+
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# HTTP/2 needs the optional ``h2`` package (``httpx[http2]``)
+HTTP2_AVAILABLE = find_spec("h2") is not None
+
+# After a failed authentication, calls go to the CLI for this long before the next attempt
+AUTH_RETRY_SECONDS = 60
+
+ORG_DISPLAY_COMMAND = "sf org display --target-org {org} --json"
+
+# Lists the API versions an org supports
+VERSIONS_PATH = "/services/data/"
+
+# Records per sObject Collections request
+COLLECTION_SIZE = 200
+
+# Records per composite graph
+GRAPH_MAX_RECORDS = 500
+
+
+class SalesforceRestError(Exception):
+    """Error response of the Salesforce REST API."""
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class SalesforceRestUnavailable(Exception):
+    """The org could not be authenticated or reached; the request was not sent."""
+
+
+@dataclass(frozen=True)
+class SalesforceAuth:
+    """Instance URL and access token of an org."""
+    instance_url: str
+    access_token: str
+    api_version: str
+
+    @property
+    def data_path(self) -> str:
+        return f"/services/data/v{self.api_version}"
+
+
+def auth_from_org_display(output: str, api_version: str = settings.SALESFORCE_API_VERSION) -> SalesforceAuth:
+    """Parse the JSON output of ``sf org display``."""
+    try:
+        result = json.loads(output)["result"]
+        return SalesforceAuth(
+            instance_url=result["instanceUrl"].rstrip("/"),
+            access_token=result["accessToken"],
+            api_version=result.get("apiVersion") or api_version,
+        )
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        raise SalesforceRestUnavailable(f"Unexpected output of sf org display: {e!r}")
+
+
+def error_message(response: httpx.Response) -> str:
+    """Message of a REST API error response, from its ``[{errorCode, message}]`` body."""
+    try:
+        body = response.json()
+    except ValueError:
+        return response.text or f"HTTP {response.status_code}"
+    if isinstance(body, dict):
+        body = [body]
+    if isinstance(body, list):
+        errors = [
+            f"{error.get('errorCode') or error.get('error')}: {error.get('message') or error.get('error_description')}"
+            for error in body if isinstance(error, dict)
+        ]
+        if errors:
+            return "; ".join(errors)
+    return response.text
+
+
+class _RestTransport:
+    """Configuration and request building shared by both transports."""
+
+    def __init__(
+        self,
+        org: str,
+        working_dir: str,
+        instance_url: Optional[str] = settings.SALESFORCE_INSTANCE_URL,
+        access_token: Optional[str] = settings.SALESFORCE_ACCESS_TOKEN,
+        api_version: str = settings.SALESFORCE_API_VERSION,
+        http2: bool = settings.SALESFORCE_HTTP2,
+        max_connections: int = settings.SALESFORCE_MAX_CONNECTIONS,
+        timeout_seconds: float = settings.SALESFORCE_TIMEOUT_SECONDS,
+    ):
+        self.org = org
+        self.working_dir = working_dir
+        self.instance_url = instance_url
+        self.access_token = access_token
+        self.api_version = api_version
+        self.http2 = http2 and HTTP2_AVAILABLE
+        self.max_connections = max_connections
+        self.timeout_seconds = timeout_seconds
+
+        self._auth: Optional[SalesforceAuth] = None
+        self._auth_failed_at: Optional[float] = None
+
+    def _client_options(self) -> Dict[str, Any]:
+        return {
+            "http2": self.http2,
+            "timeout": self.timeout_seconds,
+            "limits": httpx.Limits(
+                max_connections=self.max_connections, max_keepalive_connections=self.max_connections
+            ),
+        }
+
+    def _static_auth(self) -> Optional[SalesforceAuth]:
+        if self.instance_url and self.access_token:
+            return SalesforceAuth(self.instance_url.rstrip("/"), self.access_token, self.api_version)
+        return None
+
+    def _check_auth_backoff(self) -> None:
+        if self._auth_failed_at is not None and time.monotonic() - self._auth_failed_at < AUTH_RETRY_SECONDS:
+            raise SalesforceRestUnavailable("Authentication failed recently")
+
+    def _auth_failed(self, error: Exception) -> SalesforceRestUnavailable:
+        self._auth = None
+        self._auth_failed_at = time.monotonic()
+        logger.warning(f"Could not authenticate to Salesforce org {self.org}: {error}")
+        return error if isinstance(error, SalesforceRestUnavailable) else SalesforceRestUnavailable(str(error))
+
+    @staticmethod
+    def _negotiated(auth: SalesforceAuth, response: httpx.Response) -> SalesforceAuth:
+        """``auth`` with the newest API version the org lists, or unchanged if it lists none."""
+        try:
+            versions = [item["version"] for item in response.json()] if not response.is_error else []
+            latest = max(versions, key=lambda version: tuple(int(part) for part in version.split(".")), default=None)
+        except (ValueError, KeyError, TypeError, AttributeError):
+            latest = None
+        return replace(auth, api_version=latest) if latest else auth
+
+    @staticmethod
+    def _request_args(auth: SalesforceAuth, path: str, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        # Paths returned by the API, like ``nextRecordsUrl``, are absolute
+        if not path.startswith("/services/"):
+            path = f"{auth.data_path}/{path.lstrip('/')}"
+        headers = {"Authorization": f"Bearer {auth.access_token}", **kwargs.pop("headers", {})}
+        return {"url": f"{auth.instance_url}{path}", "headers": headers, **kwargs}
+
+    @staticmethod
+    def _modified(response: httpx.Response, last_modified: Optional[str]) -> Tuple[Optional[Any], Optional[str]]:
+        if response.status_code == 304:
+            return None, last_modified
+        return response.json(), response.headers.get("Last-Modified")
+
+    @staticmethod
+    def _check(response: httpx.Response) -> httpx.Response:
+        if response.is_error:
+            raise SalesforceRestError(response.status_code, error_message(response))
+        return response
+
+
+class SalesforceRestTransport(_RestTransport):
+    """Salesforce REST API over a pooled, thread-safe ``httpx.Client``."""
+
+    def __init__(self, org: str, working_dir: str, **kwargs):
+        super().__init__(org, working_dir, **kwargs)
+        self._client: Optional[httpx.Client] = None
+        # Reentrant: negotiating the API version opens the client while resolving credentials
+        self._lock = threading.RLock()
+
+    @property
+    def client(self) -> httpx.Client:
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = httpx.Client(**self._client_options())
+        return self._client
+
+    def close(self) -> None:
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+    def auth(self, stale: Optional[SalesforceAuth] = None) -> SalesforceAuth:
+        """The org's credentials, resolved again if they are still ``stale``."""
+        with self._lock:
+            if self._auth is None or self._auth is stale:
+                self._check_auth_backoff()
+                try:
+                    static = self._static_auth()
+                    self._auth = self._negotiate(static) if static else self._org_display()
+                except Exception as e:
+                    raise self._auth_failed(e)
+            return self._auth
+
+    def _negotiate(self, auth: SalesforceAuth) -> SalesforceAuth:
+        """Use the org's newest API version with configured credentials; ``sf org display`` reports it."""
+        try:
+            return self._negotiated(auth, self.client.get(**self._request_args(auth, VERSIONS_PATH, {})))
+        except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+            raise SalesforceRestUnavailable(f"Cannot reach {auth.instance_url}: {e}") from e
+
+    def _org_display(self) -> SalesforceAuth:
+        result = subprocess.run(
+            ORG_DISPLAY_COMMAND.format(org=self.org),
+            shell=True,
+            cwd=self.working_dir,
+            capture_output=True,
+            text=True,
+        )
+        if result.returncode != 0:
+            raise SalesforceRestUnavailable(f"sf org display failed: {result.stderr.strip() or result.stdout.strip()}")
+        return auth_from_org_display(result.stdout, self.api_version)
+
+    def request(self, method: str, path: str, **kwargs) -> httpx.Response:
+        """Send a request, refreshing the access token once on 401."""
+        auth = self.auth()
+        response = self._send(auth, method, path, dict(kwargs))
+        if response.status_code == 401 and not self._static_auth():
+            auth = self.auth(stale=auth)
+            response = self._send(auth, method, path, dict(kwargs))
+        return self._check(response)
+
+    def _send(self, auth: SalesforceAuth, method: str, path: str, kwargs: Dict[str, Any]) -> httpx.Response:
+        try:
+            return self.client.request(method, **self._request_args(auth, path, kwargs))
+        except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+            raise SalesforceRestUnavailable(f"Cannot reach {auth.instance_url}: {e}") from e
+
+    def query(self, soql: str) -> List[Dict[str, Any]]:
+        """Records matching ``soql``, following ``nextRecordsUrl`` like ``sf data query``."""
+        page = self.request("GET", "query", params={"q": soql}).json()
+        records = page["records"]
+        while not page.get("done", True):
+            page = self.request("GET", page["nextRecordsUrl"]).json()
+            records.extend(page["records"])
+        return records
+
+    def describe(self, object_name: str) -> Dict[str, Any]:
+        return self.request("GET", f"sobjects/{object_name}/describe").json()
+
+    def get_if_modified(self, path: str, last_modified: Optional[str] = None) -> Tuple[Optional[Any], Optional[str]]:
+        """JSON at ``path`` and its ``Last-Modified``, or ``None`` if unchanged since ``last_modified``."""
+        headers = {"If-Modified-Since": last_modified} if last_modified else {}
+        return self._modified(self.request("GET", path, headers=headers), last_modified)
+
+    def list_objects(self) -> List[str]:
+        return [sobject["name"] for sobject in self.request("GET", "sobjects").json()["sobjects"]]
+
+    def create(self, object_name: str, data: Dict[str, Any]) -> str:
+        return self.request("POST", f"sobjects/{object_name}", json=data).json()["id"]
+
+    def update(self, object_name: str, record_id: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        self.request("PATCH", f"sobjects/{object_name}/{record_id}", json=data)
+        return {"id": record_id, "success": True}
+
+    def delete(self, object_name: str, record_id: str) -> Dict[str, Any]:
+        self.request("DELETE", f"sobjects/{object_name}/{record_id}")
+        return {"id": record_id, "success": True}
+
+
+class AsyncSalesforceRestTransport(_RestTransport):
+    """Salesforce REST API over a pooled ``httpx.AsyncClient``.
+
+    Pooled connections belong to an event loop: a new client is opened when
+    the transport is used from another loop, and the previous one closed.
+    """
+
+    def __init__(self, org: str, working_dir: str, **kwargs):
+        super().__init__(org, working_dir, **kwargs)
+        self._client: Optional[httpx.AsyncClient] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._closing: set = set()  # closes of replaced clients, referenced until done
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            if self._client is not None:
+                self._close_replaced(self._client, self._loop)
+            self._client = httpx.AsyncClient(**self._client_options())
+            self._lock = asyncio.Lock()
+            self._loop = loop
+        return self._client
+
+    def _close_replaced(self, client: httpx.AsyncClient, loop: asyncio.AbstractEventLoop) -> None:
+        """Close a client of another event loop: on that loop while it runs, else on this one."""
+        if loop.is_running():
+            asyncio.run_coroutine_threadsafe(self._aclose_client(client), loop)
+            return
+        task = asyncio.get_running_loop().create_task(self._aclose_client(client))
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    async def _aclose_client(self, client: httpx.AsyncClient) -> None:
+        try:
+            await client.aclose()
+        except Exception as e:
+            # Connections of a closed loop cannot be shut down cleanly any more
+            logger.debug(f"Closing a replaced Salesforce REST client failed: {e!r}")
+
+    def _loop_lock(self) -> asyncio.Lock:
+        self.client  # opens the client and lock of the running loop
+        return self._lock
+
+    async def aclose(self) -> None:
+        """Close the pooled connections; the transport opens new ones if used again."""
+        client, loop, self._client = self._client, self._loop, None
+        if client is not None:
+            if loop is asyncio.get_running_loop():
+                await self._aclose_client(client)
+            else:
+                self._close_replaced(client, loop)
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(task for task in self._closing if task.get_loop() is loop))
+
+    async def auth(self, stale: Optional[SalesforceAuth] = None) -> SalesforceAuth:
+        """The org's credentials, resolved again if they are still ``stale``."""
+        async with self._loop_lock():
+            if self._auth is None or self._auth is stale:
+                self._check_auth_backoff()
+                try:
+                    static = self._static_auth()
+                    self._auth = await self._negotiate(static) if static else await self._org_display()
+                except Exception as e:
+                    raise self._auth_failed(e)
+            return self._auth
+
+    async def _negotiate(self, auth: SalesforceAuth) -> SalesforceAuth:
+        """Use the org's newest API version with configured credentials; ``sf org display`` reports it."""
+        try:
+            return self._negotiated(auth, await self.client.get(**self._request_args(auth, VERSIONS_PATH, {})))
+        except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+            raise SalesforceRestUnavailable(f"Cannot reach {auth.instance_url}: {e}") from e
+
+    async def _org_display(self) -> SalesforceAuth:
+        proc = await asyncio.create_subprocess_shell(
+            ORG_DISPLAY_COMMAND.format(org=self.org),
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            cwd=self.working_dir,
+        )
+        stdout, stderr = await proc.communicate()
+        if proc.returncode != 0:
+            raise SalesforceRestUnavailable(
+                f"sf org display failed: {stderr.decode().strip() or stdout.decode().strip()}"
+            )
+        return auth_from_org_display(stdout.decode(), self.api_version)
+
+    async def request(self, method: str, path: str, **kwargs) -> httpx.Response:
+        """Send a request, refreshing the access token once on 401."""
+        auth = await self.auth()
+        response = await self._send(auth, method, path, dict(kwargs))
+        if response.status_code == 401 and not self._static_auth():
+            auth = await self.auth(stale=auth)
+            response = await self._send(auth, method, path, dict(kwargs))
+        return self._check(response)
+
+    async def _send(self, auth: SalesforceAuth, method: str, path: str, kwargs: Dict[str, Any]) -> httpx.Response:
+        try:
+            return await self.client.request(method, **self._request_args(auth, path, kwargs))
+        except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+            raise SalesforceRestUnavailable(f"Cannot reach {auth.instance_url}: {e}") from e
+
+    async def query(self, soql: str) -> List[Dict[str, Any]]:
+        """Records matching ``soql``, following ``nextRecordsUrl`` like ``sf data query``."""
+        records = []
+        async for page in self.iter_pages(soql):
+            records.extend(page["records"])
+        return records
+
+    async def iter_pages(self, soql: str, batch_size: Optional[int] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Result pages of ``soql``, each fetched when the previous one has been consumed.
+
+        ``batch_size`` (200 to 2000) is a hint: Salesforce may return smaller pages.
+        """
+        headers = {"Sforce-Query-Options": f"batchSize={batch_size}"} if batch_size else {}
+        page = (await self.request("GET", "query", params={"q": soql}, headers=headers)).json()
+        yield page
+        while not page.get("done", True):
+            page = (await self.request("GET", page["nextRecordsUrl"], headers=headers)).json()
+            yield page
+
+    async def describe(self, object_name: str) -> Dict[str, Any]:
+        return (await self.request("GET", f"sobjects/{object_name}/describe")).json()
+
+    async def get_if_modified(self, path: str, last_modified: Optional[str] = None) -> Tuple[Optional[Any], Optional[str]]:
+        """JSON at ``path`` and its ``Last-Modified``, or ``None`` if unchanged since ``last_modified``."""
+        headers = {"If-Modified-Since": last_modified} if last_modified else {}
+        return self._modified(await self.request("GET", path, headers=headers), last_modified)
+
+    async def list_objects(self) -> List[str]:
+        return [sobject["name"] for sobject in (await self.request("GET", "sobjects")).json()["sobjects"]]
+
+    async def create(self, object_name: str, data: Dict[str, Any]) -> str:
+        return (await self.request("POST", f"sobjects/{object_name}", json=data)).json()["id"]
+
+    async def update(self, object_name: str, record_id: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        await self.request("PATCH", f"sobjects/{object_name}/{record_id}", json=data)
+        return {"id": record_id, "success": True}
+
+    async def delete(self, object_name: str, record_id: str) -> Dict[str, Any]:
+        await self.request("DELETE", f"sobjects/{object_name}/{record_id}")
+        return {"id": record_id, "success": True}
+
+    async def create_many(self, object_name: str, records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Create up to ``COLLECTION_SIZE`` records in one request; ``{id, success, errors}`` of each, in order."""
+        return await self._collection("POST", object_name, records)
+
+    async def update_many(self, object_name: str, records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Update up to ``COLLECTION_SIZE`` records given with their Id in one request."""
+        return await self._collection("PATCH", object_name, records)
+
+    async def delete_many(self, record_ids: List[str]) -> List[Dict[str, Any]]:
+        """Delete up to ``COLLECTION_SIZE`` records, of any sObjects, in one request."""
+        params = {"ids": ",".join(record_ids), "allOrNone": "false"}
+        return (await self.request("DELETE", "composite/sobjects", params=params)).json()
+
+    async def create_graph(self, records: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Create ``{object_name, reference_id, data}`` records in one all-or-nothing composite graph.
+
+        Returns the graph's ``isSuccessful`` and ``graphResponse``, which has
+        the ``{referenceId, httpStatusCode, body}`` of each record.
+        """
+        data_path = (await self.auth()).data_path
+        graph = {"graphId": "graph", "compositeRequest": [
+            {
+                "method": "POST",
+                "url": f"{data_path}/sobjects/{record['object_name']}",
+                "referenceId": record["reference_id"],
+                "body": record["data"],
+            }
+            for record in records
+        ]}
+        return (await self.request("POST", "composite/graph", json={"graphs": [graph]})).json()["graphs"][0]
+
+    async def _collection(self, method: str, object_name: str, records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        # Without allOrNone, every record succeeds or fails on its own
+        body = {"allOrNone": False, "records": [{"attributes": {"type": object_name}, **record} for record in records]}
+        return (await self.request(method, "composite/sobjects", json=body)).json()
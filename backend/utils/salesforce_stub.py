@@ -0,0 +1,484 @@
+"""Local stand-in for the Salesforce REST API, for tests and benchmarks.
+
+``SalesforceStub`` serves the endpoints the REST transport uses from
+in-memory records, on a local port and in a background thread:
+
+    with SalesforceStub({"Account": [{"Name": "Acme"}]}) as stub:
+        client = AsyncSalesforceClient()
+        client.rest = AsyncSalesforceRestTransport("stub", ".", **stub.transport_options())
+
+SOQL support is limited to ``SELECT fields FROM object``, optionally with
+comparisons of a field with a literal joined by ``AND``, and ``LIMIT``.
+Records get a ``SystemModstamp`` when they are created or updated. sObject
+Collections requests take up to 200 records. Bulk API 2.0 insert and update
+jobs are processed when their upload is complete, and reported
+``InProgress`` to the first status poll. Updates and deletes of unknown Ids
+fail. Composite graphs are rolled back when a Contact has no ``LastName``.
+Describes and the sObject list carry ``Last-Modified`` and answer
+``If-Modified-Since`` with 304 until ``modify_schema()`` is called.
+``rotate_token()`` invalidates the access token, as an expired session
+does, to exercise refresh on 401. To run it on its own:
+
+    cd backend && python -m utils.salesforce_stub --port 8765 --accounts 500
+"""
+
+import argparse
+import csv
+import io
+import json
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+_SOQL = re.compile(
+    r"^\s*SELECT\s+(?P<fields>.+?)\s+FROM\s+(?P<object>\w+)"
+    r"(?:\s+WHERE\s+(?P<where>.+?))?(?:\s+ORDER\s+BY\s+.+?)?(?:\s+LIMIT\s+(?P<limit>\d+))?\s*$",
+    re.IGNORECASE | re.DOTALL,
+)
+_CONDITION = re.compile(r"^\s*(\w+)\s*(=|!=|<=|>=|<|>)\s*(?:'((?:[^'\\]|\\.)*)'|([\w.:+-]+))\s*$")
+_DATETIME = re.compile(r"^\d{4}-\d{2}-\d{2}T")
+_COMPARE = {
+    "=": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+    "<": lambda a, b: a < b,
+    "<=": lambda a, b: a <= b,
+    ">": lambda a, b: a > b,
+    ">=": lambda a, b: a >= b,
+}
+
+
+def _comparable(value: Any) -> Any:
+    """Datetimes and numbers compare as such, everything else as text."""
+    if isinstance(value, str) and _DATETIME.match(value):
+        return datetime.fromisoformat(value)
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return str(value)
+
+
+def _modstamp() -> str:
+    now = datetime.now(timezone.utc)
+    return now.strftime("%Y-%m-%dT%H:%M:%S.") + f"{now.microsecond // 1000:03d}+0000"
+
+
+class StubError(Exception):
+    def __init__(self, status: int, error_code: str, message: str):
+        super().__init__(message)
+        self.status = status
+        self.error_code = error_code
+
+
+class SalesforceStub:
+    """In-memory Salesforce org served over HTTP on ``127.0.0.1``."""
+
+    def __init__(
+        self,
+        records: Optional[Dict[str, List[Dict[str, Any]]]] = None,
+        port: int = 0,
+        api_version: str = "61.0",
+        batch_size: int = 2000,
+        latency_seconds: float = 0.0,
+    ):
+        self.api_version = api_version
+        self.batch_size = batch_size
+        self.latency = latency_seconds
+        self.access_token = uuid.uuid4().hex
+        self.requests: List[Tuple[str, str]] = []
+        self.objects: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._cursors: Dict[str, Tuple[List[Dict[str, Any]], int]] = {}  # locator -> (records, page size)
+        self.jobs: Dict[str, Dict[str, Any]] = {}  # Bulk API ingest jobs by id
+        self.schema_modified = int(time.time())
+        self._lock = threading.Lock()
+        for object_name, rows in (records or {}).items():
+            self.objects[object_name] = {}
+            for row in rows:
+                self._insert(object_name, row)
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def data_path(self) -> str:
+        return f"/services/data/v{self.api_version}"
+
+    def transport_options(self) -> Dict[str, Any]:
+        """Keyword arguments pointing a REST transport at the stub."""
+        return {"instance_url": self.url, "access_token": self.access_token, "api_version": self.api_version}
+
+    def org_display(self) -> str:
+        """What ``sf org display --json`` prints for the stub org."""
+        return json.dumps({"status": 0, "result": {
+            "instanceUrl": self.url, "accessToken": self.access_token, "apiVersion": self.api_version,
+        }})
+
+    def modify_schema(self) -> None:
+        """Have describes and the sObject list report a change."""
+        self.schema_modified = max(int(time.time()), self.schema_modified + 1)
+
+    @property
+    def schema_last_modified(self) -> str:
+        return formatdate(self.schema_modified, usegmt=True)
+
+    def _schema_unchanged(self, headers: Dict[str, str]) -> bool:
+        since = headers.get("If-Modified-Since")
+        return since is not None and parsedate_to_datetime(since).timestamp() >= self.schema_modified
+
+    def rotate_token(self) -> str:
+        """Expire the current access token and issue a new one."""
+        self.access_token = uuid.uuid4().hex
+        return self.access_token
+
+    def start(self) -> "SalesforceStub":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "SalesforceStub":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    # Records
+
+    def _insert(self, object_name: str, values: Dict[str, Any]) -> str:
+        record_id = values.get("Id") or self._new_id(object_name)
+        self.objects.setdefault(object_name, {})[record_id] = {
+            "attributes": {"type": object_name, "url": f"{self.data_path}/sobjects/{object_name}/{record_id}"},
+            "SystemModstamp": _modstamp(),
+            **values,
+            "Id": record_id,
+        }
+        return record_id
+
+    def _new_id(self, object_name: str) -> str:
+        return (object_name[:3].upper() + uuid.uuid4().hex.upper())[:18]
+
+    def _record(self, object_name: str, record_id: str) -> Dict[str, Any]:
+        record = self.objects.get(object_name, {}).get(record_id)
+        if record is None:
+            raise StubError(404, "NOT_FOUND", f"The requested resource does not exist: {object_name} {record_id}")
+        return record
+
+    # Endpoints
+
+    def handle(
+        self, method: str, path: str, query: Dict[str, List[str]], body: Any, headers: Optional[Dict[str, str]] = None
+    ) -> Tuple[int, Any]:
+        """Route one request; returns the status and the JSON body, or CSV text."""
+        options = dict(
+            option.strip().split("=", 1)
+            for option in (headers or {}).get("Sforce-Query-Options", "").split(",") if "=" in option
+        )
+        if path.rstrip("/") == "/services/data" and method == "GET":
+            return 200, self._versions()
+        if not path.startswith(self.data_path + "/"):
+            raise StubError(404, "NOT_FOUND", f"Unknown path {path}")
+        parts = path[len(self.data_path) + 1:].strip("/").split("/")
+        with self._lock:
+            if parts == ["query"] and method == "GET":
+                return 200, self._query(query["q"][0], int(options.get("batchSize", self.batch_size)))
+            if parts[0] == "query" and len(parts) == 2 and method == "GET":
+                return 200, self._query_more(parts[1])
+            if parts == ["sobjects"] and method == "GET":
+                if self._schema_unchanged(headers or {}):
+                    return 304, None
+                return 200, {"sobjects": [{"name": name} for name in sorted(self.objects)]}
+            if parts[0] == "sobjects" and len(parts) == 3 and parts[2] == "describe" and method == "GET":
+                if self._schema_unchanged(headers or {}) and parts[1] in self.objects:
+                    return 304, None
+                return 200, self._describe(parts[1])
+            if parts[0] == "sobjects" and len(parts) == 2 and method == "POST":
+                return 201, {"id": self._insert(parts[1], body), "success": True, "errors": []}
+            if parts[0] == "sobjects" and len(parts) == 3:
+                record = self._record(parts[1], parts[2])
+                if method == "GET":
+                    return 200, record
+                if method == "PATCH":
+                    record.update({key: value for key, value in body.items() if key not in ("Id", "attributes")})
+                    record["SystemModstamp"] = _modstamp()
+                    return 204, None
+                if method == "DELETE":
+                    del self.objects[parts[1]][parts[2]]
+                    return 204, None
+            if parts == ["composite", "graph"] and method == "POST":
+                return 200, {"graphs": [self._graph(graph) for graph in body["graphs"]]}
+            if parts == ["composite", "sobjects"]:
+                return 200, self._collection(method, query, body)
+            if parts[:2] == ["jobs", "ingest"]:
+                return self._ingest(method, parts[2:], body)
+        raise StubError(404, "NOT_FOUND", f"Unsupported request {method} {path}")
+
+    def _versions(self) -> List[Dict[str, str]]:
+        """API versions of the org, the oldest first, up to the one the stub serves."""
+        major = int(self.api_version.split(".")[0])
+        return [
+            {"version": f"{version}.0", "label": f"Release {version}", "url": f"/services/data/v{version}.0"}
+            for version in range(major - 2, major + 1)
+        ]
+
+    def _query(self, soql: str, batch_size: int) -> Dict[str, Any]:
+        match = _SOQL.match(soql)
+        if match is None:
+            raise StubError(400, "MALFORMED_QUERY", f"Unsupported query: {soql}")
+        fields = [field.strip() for field in match["fields"].split(",")]
+        conditions = []
+        for condition in re.split(r"\s+AND\s+", match["where"] or "", flags=re.IGNORECASE):
+            if not condition:
+                continue
+            parsed = _CONDITION.match(condition)
+            if parsed is None:
+                raise StubError(400, "MALFORMED_QUERY", f"Unsupported condition: {condition}")
+            field, operator, text, literal = parsed.groups()
+            conditions.append((field, _COMPARE[operator], _comparable(text if literal is None else literal)))
+        rows = [
+            record for record in self.objects.get(match["object"], {}).values()
+            if all(
+                record.get(field) is not None and compare(_comparable(record[field]), value)
+                for field, compare, value in conditions
+            )
+        ]
+        if match["limit"]:
+            rows = rows[:int(match["limit"])]
+        records = [
+            {"attributes": record["attributes"], **{field: record.get(field) for field in fields}}
+            for record in rows
+        ]
+        cursor = uuid.uuid4().hex
+        self._cursors[cursor] = (records, batch_size)
+        return self._page(cursor, 0)
+
+    def _query_more(self, locator: str) -> Dict[str, Any]:
+        cursor, _, offset = locator.rpartition("-")
+        if cursor not in self._cursors:
+            raise StubError(400, "INVALID_QUERY_LOCATOR", "invalid query locator")
+        return self._page(cursor, int(offset))
+
+    def _page(self, cursor: str, offset: int) -> Dict[str, Any]:
+        records, batch_size = self._cursors[cursor]
+        end = offset + batch_size
+        page = {"totalSize": len(records), "done": end >= len(records), "records": records[offset:end]}
+        if page["done"]:
+            del self._cursors[cursor]
+        else:
+            page["nextRecordsUrl"] = f"{self.data_path}/query/{cursor}-{end}"
+        return page
+
+    def _collection(self, method: str, query: Dict[str, List[str]], body: Any) -> List[Dict[str, Any]]:
+        if method == "DELETE":
+            records = [{"Id": record_id} for record_id in query["ids"][0].split(",")]
+        else:
+            records = body["records"]
+        if len(records) > 200:
+            raise StubError(400, "EXCEEDED_ID_LIMIT", "record limit reached. cannot submit more than 200 records into this call")
+        outcomes = []
+        for record in records:
+            values = {key: value for key, value in record.items() if key != "attributes"}
+            if method == "POST":
+                outcomes.append({"id": self._insert(record["attributes"]["type"], values), "success": True, "errors": []})
+                continue
+            object_name = next((name for name, rows in self.objects.items() if values["Id"] in rows), None)
+            if object_name is None:
+                outcomes.append({"success": False, "errors": [
+                    {"statusCode": "ENTITY_IS_DELETED", "message": "entity is deleted", "fields": []}
+                ]})
+            elif method == "PATCH":
+                self.objects[object_name][values["Id"]].update(values, SystemModstamp=_modstamp())
+                outcomes.append({"id": values["Id"], "success": True, "errors": []})
+            else:
+                del self.objects[object_name][values["Id"]]
+                outcomes.append({"id": values["Id"], "success": True, "errors": []})
+        return outcomes
+
+    def _graph(self, graph: Dict[str, Any]) -> Dict[str, Any]:
+        ids: Dict[str, str] = {}
+        responses = []
+        failed = False
+        for request in graph["compositeRequest"]:
+            reference_id = request["referenceId"]
+            if failed:
+                responses.append({"body": [{
+                    "errorCode": "PROCESSING_HALTED",
+                    "message": "The transaction was rolled back since another operation in the same transaction failed.",
+                }], "httpHeaders": {}, "httpStatusCode": 400, "referenceId": reference_id})
+                continue
+            object_name = request["url"].rstrip("/").rsplit("/", 1)[1]
+            values = {
+                key: re.sub(r"@\{(\w+)\.id\}", lambda match: ids.get(match[1], match[0]), value)
+                if isinstance(value, str) else value
+                for key, value in request["body"].items()
+            }
+            if object_name == "Contact" and not values.get("LastName"):
+                failed = True
+                responses.append({"body": [{
+                    "errorCode": "REQUIRED_FIELD_MISSING", "message": "Required fields are missing: [LastName]",
+                }], "httpHeaders": {}, "httpStatusCode": 400, "referenceId": reference_id})
+                continue
+            ids[reference_id] = self._insert(object_name, values)
+            responses.append({
+                "body": {"id": ids[reference_id], "success": True, "errors": []},
+                "httpHeaders": {"Location": f"{self.data_path}/sobjects/{object_name}/{ids[reference_id]}"},
+                "httpStatusCode": 201,
+                "referenceId": reference_id,
+            })
+        if failed:
+            for record_id in ids.values():
+                for rows in self.objects.values():
+                    rows.pop(record_id, None)
+            # Records created before the failure are rolled back too
+            for response in responses:
+                if response["httpStatusCode"] == 201:
+                    response.update(body=[{
+                        "errorCode": "PROCESSING_HALTED",
+                        "message": "The transaction was rolled back since another operation in the same transaction failed.",
+                    }], httpHeaders={}, httpStatusCode=400)
+        return {"graphId": graph["graphId"], "graphResponse": {"compositeResponse": responses}, "isSuccessful": not failed}
+
+    def _ingest(self, method: str, parts: List[str], body: Any) -> Tuple[int, Any]:
+        if not parts and method == "POST":
+            job_id = "750" + uuid.uuid4().hex[:15].upper()
+            self.jobs[job_id] = {
+                "id": job_id, "object": body["object"], "operation": body["operation"], "state": "Open",
+                "polls": 0, "data": "", "successful": [], "failed": [],
+            }
+            return 200, self._job_info(self.jobs[job_id])
+        job = self.jobs.get(parts[0]) if parts else None
+        if job is None:
+            raise StubError(404, "NOT_FOUND", f"Unknown job {parts[0] if parts else ''}")
+        if parts[1:] == ["batches"] and method == "PUT":
+            if job["state"] != "Open":
+                raise StubError(400, "INVALIDJOBSTATE", f"Job {job['id']} is not open")
+            job["data"] += body
+            return 201, None
+        if len(parts) == 1 and method == "PATCH":
+            if job["state"] in ("JobComplete", "Failed", "Aborted"):
+                raise StubError(400, "INVALIDJOBSTATE", f"Job {job['id']} is already {job['state']}")
+            job["state"] = body["state"]
+            return 200, self._job_info(job)
+        if len(parts) == 1 and method == "GET":
+            if job["state"] == "UploadComplete":
+                job["state"] = "InProgress"
+            elif job["state"] == "InProgress":
+                self._process_job(job)
+            return 200, self._job_info(job)
+        if parts[1:] in (["successfulResults"], ["failedResults"]) and method == "GET":
+            rows = job["successful"] if parts[1] == "successfulResults" else job["failed"]
+            columns = ["sf__Id", "sf__Created" if parts[1] == "successfulResults" else "sf__Error"]
+            buffer = io.StringIO()
+            writer = csv.DictWriter(buffer, columns + job.get("fields", []), lineterminator="\n")
+            writer.writeheader()
+            writer.writerows(rows)
+            return 200, buffer.getvalue()
+        raise StubError(404, "NOT_FOUND", f"Unsupported request {method} jobs/ingest/{'/'.join(parts)}")
+
+    def _process_job(self, job: Dict[str, Any]) -> None:
+        reader = csv.DictReader(io.StringIO(job["data"]))
+        job["fields"] = list(reader.fieldnames or [])
+        for row in reader:
+            values = {field: None if value == "#N/A" else value for field, value in row.items() if value != ""}
+            if job["operation"] == "insert":
+                record_id = self._insert(job["object"], values)
+                job["successful"].append({"sf__Id": record_id, "sf__Created": "true", **row})
+                continue
+            record = self.objects.get(job["object"], {}).get(values.get("Id"))
+            if record is None:
+                job["failed"].append({
+                    "sf__Id": "", "sf__Error": "INVALID_CROSS_REFERENCE_KEY:invalid cross reference id:--", **row,
+                })
+                continue
+            record.update(values)
+            record["SystemModstamp"] = _modstamp()
+            job["successful"].append({"sf__Id": record["Id"], "sf__Created": "false", **row})
+        job["state"] = "JobComplete"
+
+    @staticmethod
+    def _job_info(job: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "id": job["id"], "object": job["object"], "operation": job["operation"], "state": job["state"],
+            "numberRecordsProcessed": len(job["successful"]) + len(job["failed"]),
+            "numberRecordsFailed": len(job["failed"]),
+        }
+
+    def _describe(self, object_name: str) -> Dict[str, Any]:
+        if object_name not in self.objects:
+            raise StubError(404, "NOT_FOUND", f"The requested resource does not exist: {object_name}")
+        names = dict.fromkeys(["Id"])
+        for record in self.objects[object_name].values():
+            names.update(dict.fromkeys(key for key in record if key != "attributes"))
+        return {
+            "name": object_name,
+            "fields": [{"name": name, "type": "id" if name == "Id" else "string"} for name in names],
+        }
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, so clients can pool connections
+            disable_nagle_algorithm = True  # headers and body go out in separate writes
+
+            def _dispatch(self):
+                split = urlsplit(self.path)
+                stub.requests.append((self.command, split.path))
+                if stub.latency:
+                    time.sleep(stub.latency)
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else None
+                if body is not None:
+                    is_csv = self.headers.get("Content-Type", "").startswith("text/csv")
+                    body = body.decode() if is_csv else json.loads(body)
+                if self.headers.get("Authorization") != f"Bearer {stub.access_token}":
+                    status, payload = 401, [{"errorCode": "INVALID_SESSION_ID", "message": "Session expired or invalid"}]
+                else:
+                    try:
+                        status, payload = stub.handle(
+                            self.command, split.path, parse_qs(split.query), body, dict(self.headers)
+                        )
+                    except StubError as e:
+                        status, payload = e.status, [{"errorCode": e.error_code, "message": str(e)}]
+                if isinstance(payload, str):
+                    data, content_type = payload.encode(), "text/csv"
+                else:
+                    data, content_type = b"" if payload is None else json.dumps(payload).encode(), "application/json"
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                if self.command == "GET" and (split.path.endswith("/describe") or split.path.endswith("/sobjects")):
+                    self.send_header("Last-Modified", stub.schema_last_modified)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = do_POST = do_PATCH = do_PUT = do_DELETE = _dispatch
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--accounts", type=int, default=100)
+    args = parser.parse_args()
+    accounts = [{"Name": f"Account {i}", "Industry": "Technology"} for i in range(args.accounts)]
+    stub = SalesforceStub({"Account": accounts, "Contact": [], "Opportunity": []}, port=args.port)
+    print(f"SALESFORCE_INSTANCE_URL={stub.url}")
+    print(f"SALESFORCE_ACCESS_TOKEN={stub.access_token}")
+    stub._server.serve_forever()
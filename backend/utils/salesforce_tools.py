@@ -32,6 +32,46 @@ async def query_salesforce(query: str, format_data: bool = True) -> str:
     else:
         return result
     
+@tool
+async def describe_salesforce_object(object_name: str) -> str:
+    """
+    Describe the fields of a Salesforce object: API names, labels, types, referenced objects and picklist values.
+    Answered from a local schema cache, so use it rather than other ways of describing objects.
+    
+    Args:
+        object_name (str): API name of the Salesforce object (e.g., 'Account', 'Opportunity', 'Invoice__c')
+        
+    Returns:
+        str: The object's fields, one per line
+    """
+    result = await default_async_client.describe_object(object_name)
+    
+    if not result.success:
+        return f"❌ Failed to describe {object_name}: {result.error}"
+    return _describe_summary(result.data.get('result') or {})
+
+
+# Picklist values listed per field
+PICKLIST_VALUES_SHOWN = 20
+
+
+def _describe_summary(describe: Dict[str, Any]) -> str:
+    """Fields of an sObject describe, one line each"""
+    label = describe.get('label')
+    lines = [f"**{describe.get('name')}**" + (f" ({label})" if label else ""), ""]
+    for field in describe.get('fields', []):
+        details = [field.get('type', '')]
+        if field.get('referenceTo'):
+            details.append(f"references {', '.join(field['referenceTo'])}")
+        values = [value['value'] for value in field.get('picklistValues') or [] if value.get('active', True)]
+        if values:
+            shown = ', '.join(values[:PICKLIST_VALUES_SHOWN])
+            details.append(f"values: {shown}, …" if len(values) > PICKLIST_VALUES_SHOWN else f"values: {shown}")
+        label = f": {field['label']}" if field.get('label') else ""
+        lines.append(f"- {field.get('name')}{label} ({'; '.join(details)})")
+    return "\n".join(lines)
+
+
 def query_salesforce_sync(query: str, format_data: bool = True) -> str:
     """
     Execute SOQL queries against Salesforce org to retrieve data.
@@ -174,10 +214,21 @@ def delete_salesforce_record_sync(object_name: str, record_id: str) -> str:
         return f"❌ Failed to delete {object_name} record {record_id}: {result.error}"
 
 
+def _bulk_summary(action: str, result) -> str:
+    """Counts of a bulk write, with the first failures when some records failed"""
+    successful = result.data.get('successful_count', 0)
+    failed = result.data.get('failed_count', 0)
+    if result.success:
+        return f"✅ Bulk {action} completed: {successful} succeeded, {failed} failed"
+    if not successful:
+        return f"❌ Bulk {action} failed: {result.error}"
+    return f"⚠️ Bulk {action} completed: {successful} succeeded, {failed} failed: {result.error}"
+
+
 @tool(tool_hooks=[bulk_confirmation_hook])
 async def bulk_update_salesforce_records(object_name: str, records: list[Dict[str, Any]]) -> str:
     """
-    Bulk update multiple Salesforce records.
+    Bulk update multiple Salesforce records. Use it instead of updating records one by one.
     
     Args:
         object_name (str): Name of the Salesforce object (e.g., 'Account', 'Contact')
@@ -187,19 +238,13 @@ async def bulk_update_salesforce_records(object_name: str, records: list[Dict[st
         str: Bulk update results
     """
     result = await default_async_client.bulk_update(object_name, records)
-    
-    if result.success:
-        successful = result.data.get('successful_count', 0)
-        failed = result.data.get('failed_count', 0)
-        return f"✅ Bulk update completed: {successful} succeeded, {failed} failed"
-    else:
-        return f"❌ Bulk update failed: {result.error}"
+    return _bulk_summary("update", result)
 
 
 @tool(tool_hooks=[bulk_confirmation_hook])
 async def bulk_create_salesforce_records(object_name: str, records: list[Dict[str, Any]]) -> str:
     """
-    Bulk create multiple Salesforce records.
+    Bulk create multiple Salesforce records. Use it instead of creating records one by one.
     
     Args:
         object_name (str): Name of the Salesforce object (e.g., 'Account', 'Contact')
@@ -209,21 +254,60 @@ async def bulk_create_salesforce_records(object_name: str, records: list[Dict[st
         str: Bulk creation results
     """
     result = await default_async_client.bulk_create(object_name, records)
+    return _bulk_summary("create", result)
+
+
+@tool(tool_hooks=[bulk_confirmation_hook])
+async def bulk_delete_salesforce_records(object_name: str, record_ids: list[str]) -> str:
+    """
+    Bulk delete multiple Salesforce records. Use it instead of deleting records one by one.
+    
+    Args:
+        object_name (str): Name of the Salesforce object (e.g., 'Account', 'Contact')
+        record_ids (list[str]): The IDs of the records to delete
+        
+    Returns:
+        str: Bulk deletion results
+    """
+    result = await default_async_client.delete_records(object_name, record_ids)
+    return _bulk_summary("delete", result)
+
+
+@tool(tool_hooks=[bulk_confirmation_hook])
+async def create_salesforce_record_graph(records: list[Dict[str, Any]]) -> str:
+    """
+    Create related records of several objects in one call, e.g. an Account with its Contacts and an Opportunity.
+    Either every record is created or none is. Use it instead of creating the records one by one.
+    
+    Args:
+        records (list[Dict[str, Any]]): Records to create in order, each a dictionary with
+            'object_name' (e.g. 'Account'), 'reference_id' (a unique name of letters, digits and
+            underscores, e.g. 'acme') and 'data' (field names and values). A field can take the Id
+            of an earlier record as '@{reference_id.id}', e.g. {"AccountId": "@{acme.id}"}.
+        
+    Returns:
+        str: The created records with their IDs, or why none was created
+    """
+    result = await default_async_client.create_record_graph(records)
     
     if result.success:
-        successful = result.data.get('successful_count', 0)
-        failed = result.data.get('failed_count', 0)
-        return f"✅ Bulk create completed: {successful} succeeded, {failed} failed"
+        created = "\n".join(
+            f"- {record['object_name']} {record['reference_id']}: {record['id']}" for record in result.data['records']
+        )
+        return f"✅ Created {len(result.data['records'])} records:\n{created}"
     else:
-        return f"❌ Bulk create failed: {result.error}"
+        return f"❌ No record was created: {result.error}"
 
 
 # Export available tools for the agent
 SALESFORCE_TOOLS = [
     query_salesforce,
+    describe_salesforce_object,
     update_salesforce_record,
     create_salesforce_record,
     delete_salesforce_record,
     bulk_update_salesforce_records,
-    bulk_create_salesforce_records
+    bulk_create_salesforce_records,
+    bulk_delete_salesforce_records,
+    create_salesforce_record_graph
 ] 
\ No newline at end of file
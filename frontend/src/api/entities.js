@@ -25,6 +25,13 @@ export const Session = {
     return await apiCall(url, options);
   },
 
+  async search(q, limit = 20, offset = 0) {
+    const params = new URLSearchParams({ q, limit, offset });
+    const url = `${API_ENDPOINTS.SESSIONS}/search?${params.toString()}`;
+    const options = getRequestOptions('GET');
+    return await apiCall(url, options);
+  },
+
   async get(id) {
     const url = `${API_ENDPOINTS.SESSIONS}/${id}`;
     const options = getRequestOptions('GET');
@@ -37,6 +44,12 @@ export const Session = {
     return await apiCall(url, options);
   },
 
+  async patch(id, delta) {
+    const url = `${API_ENDPOINTS.SESSIONS}/${id}`;
+    const options = getRequestOptions('PATCH', delta);
+    return await apiCall(url, options);
+  },
+
   async delete(id) {
     const url = `${API_ENDPOINTS.SESSIONS}/${id}`;
     const options = getRequestOptions('DELETE');
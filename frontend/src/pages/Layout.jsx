@@ -83,6 +83,7 @@ export default function Layout({ children, currentPageName, onSessionsUpdate })
   });
   const [sessions, setSessions] = useState([]);
   const [searchTerm, setSearchTerm] = useState("");
+  const [searchResults, setSearchResults] = useState(null);
   const [isShareOpen, setIsShareOpen] = useState(false);
   const { user, logout } = useAuth();
   const { theme, setTheme } = useTheme();
@@ -117,7 +118,27 @@ export default function Layout({ children, currentPageName, onSessionsUpdate })
     setSessions(sessionData);
   };
 
-  const filteredSessions = sessions.filter(session =>
+  // Full-text search on the server once the user pauses typing
+  useEffect(() => {
+    const term = searchTerm.trim();
+    if (term.length < 2) {
+      setSearchResults(null);
+      return;
+    }
+    // Replies for an older term, or arriving after the box was cleared, are ignored
+    let cancelled = false;
+    const timer = setTimeout(() => {
+      Session.search(term)
+        .then(results => { if (!cancelled) setSearchResults(results); })
+        .catch(() => { if (!cancelled) setSearchResults(null); });
+    }, 250);
+    return () => {
+      cancelled = true;
+      clearTimeout(timer);
+    };
+  }, [searchTerm]);
+
+  const filteredSessions = searchResults || sessions.filter(session =>
     (session.title?.toLowerCase().includes(searchTerm.toLowerCase()) || false) ||
     (session.context_entity?.toLowerCase().includes(searchTerm.toLowerCase()) || false)
   );
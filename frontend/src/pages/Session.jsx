@@ -218,28 +218,15 @@ export default function Session() {
           ? [singleArtifact]
           : [];
 
-      // Update session with new data
-      // Use a callback to get the latest conversation history
-      setConversationHistory(prev => {
-        const updatedMessages = [...prev];
-        
-        // Persist event history and messages
-        const updateData = {
-          messages: updatedMessages,
-          artifacts: [...(session.artifacts || []), ...newArtifacts],
-          timeline,
-          event_history: accumulatedEvents,
-          status: 'completed'
-        };
-
-        // Update session asynchronously
-        SessionAPI.update(sessionId, updateData).then(() => {
-          // Update local state after successful persist
-          setSession(currentSession => ({ ...(currentSession || {}), ...updateData }));
-        });
-
-        return updatedMessages;
-      });
+      // The backend persists messages, artifacts and events while the run
+      // streams, so only local state needs to catch up here.
+      setSession(currentSession => ({
+        ...(currentSession || {}),
+        artifacts: [...(session.artifacts || []), ...newArtifacts],
+        timeline,
+        event_history: accumulatedEvents,
+        status: 'completed'
+      }));
 
     } catch (error) {
       console.error('Error running workflow:', error);
@@ -253,23 +240,17 @@ export default function Session() {
         timestamp: new Date().toISOString()
       };
       
-      // Use callback to get latest state and update
-      setConversationHistory(prev => {
-        const updatedMessages = [...prev, errorMessage];
-        
-        const updateData = {
-          messages: updatedMessages,
-          status: 'failed'
-        };
-
-        // Update session asynchronously
-        SessionAPI.update(sessionId, updateData).then(() => {
-          setSession(currentSession => ({ ...(currentSession || {}), ...updateData }));
+      setConversationHistory(prev => [...prev, errorMessage]);
+
+      // Append the error without re-sending the whole conversation
+      SessionAPI.patch(sessionId, {
+        append: { messages: [errorMessage] },
+        merge: { status: 'failed' }
+      })
+        .then(() => {
+          setSession(currentSession => ({ ...(currentSession || {}), status: 'failed' }));
         });
 
-        return updatedMessages;
-      });
-
     } finally {
       setIsSessionRunning(false);
     }